@@ -0,0 +1,92 @@
+"""
+end-to-end export of the sample model (attempts/IGNI-22/cm_drown1.mdb) through FbxFileExportJob with the glb backend
+(igni/gltf.py), the native fbx writer (igni/fbxbinary.py) and, if the fbx python sdk is installed, the sdk backend
+
+usage: python benchmarks/export_benchmark.py [repeats]
+
+each repeat converts from a freshly opened file and writes into a temporary directory; texture export tasks and
+metadata go to in-process queues of a stand-in application reference instead of worker processes. the native writer
+is measured without compression and with 1 and 4 compression threads, every variant writes its own file so the
+sizes can be compared
+"""
+
+import importlib.util
+import os
+import queue
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_MODEL = os.path.join(ROOT, 'attempts', 'IGNI-22', 'cm_drown1.mdb')
+
+# variant -> (output format, fbx writer backend, compression threads)
+VARIANTS = {
+    'glb': ('glb', 'sdk', 0),
+    'fbx-native-raw': ('fbx', 'native', 0),
+    'fbx-native-1': ('fbx', 'native', 1),
+    'fbx-native-4': ('fbx', 'native', 4),
+    'fbx-sdk': ('fbx', 'sdk', 0)
+}
+
+
+def set_up_application_reference():
+    from igni import app
+    reference = app.IgniApplicationReference()
+    reference._logging_queue = queue.Queue()
+    reference._application_events_queue = queue.Queue()
+    reference._persistence_events_queue = queue.Queue()
+    app._Application = reference
+    return reference
+
+
+def export(variant: str, destination: str) -> float:
+    from igni.mdb2fbx import FbxFileExportJob
+    from igni.resources import File, Resource, ResourceTypes, Directory
+    from igni.settings import Settings
+
+    output_format, backend, threads = VARIANTS[variant]
+    destination = os.path.join(destination, variant)
+    os.makedirs(destination, exist_ok=True)
+
+    job = FbxFileExportJob(Resource(File(SAMPLE_MODEL), ResourceTypes.MDB),
+                           Directory(destination),
+                           Directory(destination),
+                           Settings({'output-format': output_format,
+                                     'fbx-writer': {'backend': backend, 'compression-threads': threads}}))
+    start = time.perf_counter()
+    job.convert_and_export()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    start = time.perf_counter()
+    import igni.mdb2fbx
+    import_time = time.perf_counter() - start
+
+    variants = list(VARIANTS)
+    if importlib.util.find_spec('fbx') is None:
+        print('fbx python sdk not installed, only the sdk-free backends are measured')
+        variants.remove('fbx-sdk')
+
+    set_up_application_reference()
+
+    results = {}
+    sizes = {}
+    with tempfile.TemporaryDirectory() as destination:
+        for variant in variants:
+            results[variant] = min(export(variant, destination) for _ in range(repeats))
+            variant_destination = os.path.join(destination, variant)
+            sizes[variant] = sum(os.path.getsize(os.path.join(variant_destination, name))
+                                 for name in os.listdir(variant_destination))
+
+    print('import of the export module: {:.1f} ms'.format(import_time * 1000.0))
+    print('{:<16} {:>12} {:>12}'.format('variant', 'export (ms)', 'size (bytes)'))
+    for variant, seconds in results.items():
+        print('{:<16} {:>12.3f} {:>12}'.format(variant, seconds * 1000.0, sizes[variant]))
+    if 'fbx-sdk' in results:
+        print('native fbx writer is {:.1f}x faster than the sdk'.format(results['fbx-sdk'] / results['fbx-native-4']))
@@ -0,0 +1,149 @@
+"""
+timing breakdown of fbx mesh construction for the meshes of the sample model (attempts/IGNI-22/cm_drown1.mdb),
+per-element construction as FbxFileExportJob._build_fbx_mesh did it before against igni/fbxmesh.FbxMeshBuilder
+
+usage: python benchmarks/fbx_mesh_benchmark.py [repeats]
+
+the array preparation stages (coordinate transform, uv flip) run everywhere, the sdk stages (control points,
+polygons, uvs) only if the fbx python sdk is installed
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)
+
+from igni.mdb import Mdb
+from igni.mdbio import open_mdb
+from igni.mdbutil import node_table, Trimesh
+from igni.coordinates import CoordinateSystemService, flip_uvs
+
+try:
+    import fbx
+    from igni.fbxmesh import FbxMeshBuilder
+except ImportError:
+    fbx = None
+
+SAMPLE_MODEL = os.path.join(ROOT, 'attempts', 'IGNI-22', 'cm_drown1.mdb')
+
+
+def load_meshes():
+    mdb = open_mdb(SAMPLE_MODEL)
+    return [Trimesh(node.node_data) for node in node_table(mdb).nodes_of_type(Mdb.NodeType.trimesh,
+                                                                             Mdb.NodeType.skin)]
+
+
+# --- per element, as before
+
+def prepare_per_element(coord_service, trimesh, flip):
+    control_points = [coord_service.location(vertex) for vertex in trimesh.vertices.tolist()]
+    uv_sets = {}
+    for uv_set_name, uvs in trimesh.uv_sets.items():
+        uv_sets[uv_set_name] = [(u, 1 - v) if flip else (u, v) for u, v in uvs.tolist()]
+    return control_points, trimesh.faces.tolist(), uv_sets
+
+
+def fill_per_element(fbx_mesh, control_points, faces, uv_sets, timings):
+
+    start = time.perf_counter()
+    fbx_mesh.InitControlPoints(len(control_points))
+    for i, vertex in enumerate(control_points):
+        fbx_mesh.SetControlPointAt(fbx.FbxVector4(vertex[0], vertex[1], vertex[2], 0.0), i)
+    timings['control_points'] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    for face in faces:
+        fbx_mesh.BeginPolygon()
+        for vertex_index in face:
+            fbx_mesh.AddPolygon(vertex_index)
+        fbx_mesh.EndPolygon()
+    timings['polygons'] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    for uv_set_name, uvs in uv_sets.items():
+        uv_element = fbx_mesh.CreateElementUV(uv_set_name)
+        uv_element.SetMappingMode(fbx.FbxLayerElementUV.eByControlPoint)
+        uv_element.SetReferenceMode(fbx.FbxLayerElement.eDirect)
+        for uv_coord in uvs:
+            uv_element.GetDirectArray().Add(fbx.FbxVector2(uv_coord[0], uv_coord[1]))
+    timings['uvs'] += time.perf_counter() - start
+
+
+# --- bulk
+
+def prepare_bulk(coord_service, trimesh, flip):
+    uv_sets = trimesh.uv_sets
+    if flip:
+        uv_sets = {uv_set_name: flip_uvs(uvs) for uv_set_name, uvs in uv_sets.items()}
+    return coord_service.transform_points(trimesh.vertices), trimesh.faces, uv_sets
+
+
+def run(meshes, repeats):
+    """
+    :return: method -> stage -> best seconds over all meshes
+    """
+
+    coord_service = CoordinateSystemService()
+    results = {}
+
+    for method, prepare in (('per_element', prepare_per_element), ('bulk', prepare_bulk)):
+
+        best = {}
+        for _ in range(repeats):
+            timings = {'prepare': 0.0, 'control_points': 0.0, 'polygons': 0.0, 'uvs': 0.0}
+
+            if fbx is not None:
+                manager = fbx.FbxManager.Create()
+                scene = fbx.FbxScene.Create(manager, '')
+                builder = FbxMeshBuilder()
+
+            for trimesh in meshes:
+                start = time.perf_counter()
+                control_points, faces, uv_sets = prepare(coord_service, trimesh, True)
+                timings['prepare'] += time.perf_counter() - start
+
+                if fbx is None:
+                    continue
+                fbx_mesh = fbx.FbxMesh.Create(scene, '')
+                if method == 'bulk':
+                    builder.build(fbx_mesh, control_points, faces, uv_sets)
+                else:
+                    fill_per_element(fbx_mesh, control_points, faces, uv_sets, timings)
+
+            if fbx is not None:
+                if method == 'bulk':
+                    timings.update(builder.timings)
+                manager.Destroy()
+
+            for stage, seconds in timings.items():
+                best[stage] = min(best.get(stage, seconds), seconds)
+
+        results[method] = best
+
+    return results
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    meshes = load_meshes()
+    print('{} meshes, {} vertices, {} faces'.format(len(meshes),
+                                                   sum(trimesh.vertex_count for trimesh in meshes),
+                                                   sum(trimesh.face_count for trimesh in meshes)))
+    if fbx is None:
+        print('fbx python sdk not installed, only the array preparation is measured')
+
+    results = run(meshes, repeats)
+    stages = ['prepare'] + ([] if fbx is None else ['control_points', 'polygons', 'uvs'])
+
+    print('{:<16} {:>18} {:>12} {:>10}'.format('stage', 'per element (ms)', 'bulk (ms)', 'speedup'))
+    for stage in stages + ['total']:
+        if stage == 'total':
+            per_element = sum(results['per_element'][s] for s in stages)
+            bulk = sum(results['bulk'][s] for s in stages)
+        else:
+            per_element, bulk = results['per_element'][stage], results['bulk'][stage]
+        print('{:<16} {:>18.3f} {:>12.3f} {:>9.1f}x'.format(stage, per_element * 1000.0, bulk * 1000.0,
+                                                           per_element / bulk if bulk > 0 else float('inf')))
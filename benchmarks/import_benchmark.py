@@ -0,0 +1,77 @@
+"""
+import time report: what a fresh interpreter (like a ProcessPoolExecutor worker) pays to import the igni modules
+tasks are unpickled from, summarised from python -X importtime
+
+usage: python benchmarks/import_benchmark.py [module ...]
+
+for every module it prints the cumulative import time, whether one of the heavy optional dependencies got loaded
+and the slowest top-level packages; every module is imported in its own interpreter, best of 3 runs
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+MODULES = [
+    'igni.app',
+    'igni.mdb2fbx',
+    'igni.batch',
+    'igni.textures',
+    'igni.gltf',
+    'igni.fbxbinary'
+]
+
+# dependencies that should only be loaded by the code paths that use them
+HEAVY_DEPENDENCIES = ['fbx', 'scipy', 'pandas', 'wand']
+
+RUNS = 3
+TOP_PACKAGES = 5
+
+
+def import_times(module: str) -> dict:
+    """
+    :return: imported module name -> (self, cumulative) import time in microseconds, for one fresh interpreter
+    """
+
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                             cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise Exception('could not import {}: {}'.format(module, process.stderr.strip().splitlines()[-1]))
+
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def report(module: str):
+    runs = [import_times(module) for _ in range(RUNS)]
+    best = min(runs, key=lambda times: times[module][1])
+
+    heavy = [dependency for dependency in HEAVY_DEPENDENCIES if dependency in best]
+
+    # self times summed per top-level package, so a package is charged for all of its submodules
+    packages = {}
+    for name, (own, _) in best.items():
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + own
+    top_level = sorted(((microseconds, package) for package, microseconds in packages.items()
+                        if package != module.split('.')[0]), reverse=True)
+
+    print('{:<16} {:>8.1f} ms   heavy: {}'.format(module, best[module][1] / 1000.0,
+                                                 ', '.join(heavy) if len(heavy) > 0 else 'none'))
+    for microseconds, name in top_level[:TOP_PACKAGES]:
+        print('    {:<24} {:>8.1f} ms'.format(name, microseconds / 1000.0))
+
+
+if __name__ == '__main__':
+    for module in (sys.argv[1:] if len(sys.argv) > 1 else MODULES):
+        try:
+            report(module)
+        except Exception as e:
+            print('{:<16} {}'.format(module, e))
@@ -0,0 +1,239 @@
+"""
+benchmarks the mdb parser (igni/mdb.py and the helpers in igni/mdbio.py, igni/mdbutil.py) on the sample model and
+animation shipped in attempts/IGNI-22 and compares the results against a stored baseline
+
+usage: python benchmarks/parser_benchmark.py [--update-baseline] [--baseline <path>]
+
+for every stage it reports the best wall time over a number of repeats, the bytes and blocks allocated
+(tracemalloc, results kept alive) and the number of gc-tracked objects created; only the allocation and object
+numbers, which are deterministic, fail the comparison. wall times depend on the machine and its load, they are
+reported next to the baseline scaled by a calibration loop timed in the same process (how much slower or faster
+this run executes plain python than the run that wrote the baseline), for information only
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)
+
+from igni.mdb import Mdb
+from igni.mdbio import open_mdb, scan_header, read_array, deref_all
+from igni.mdbutil import node_table, animation_node_properties, iter_animations, NodeProperties
+
+SAMPLE_MODEL = os.path.join(ROOT, 'attempts', 'IGNI-22', 'cm_drown1.mdb')
+SAMPLE_ANIMATION = os.path.join(ROOT, 'attempts', 'IGNI-22', 'cs_drown.mba')
+BASELINE = os.path.join(ROOT, 'benchmarks', 'parser_baseline.json')
+
+REPEATS = 20
+
+# allowed relative increase before a stage counts as a regression, wall time is not gated
+TOLERANCE = {
+    'allocated_bytes': 0.1,
+    'allocated_blocks': 0.1,
+    'objects': 0.1
+}
+
+CALIBRATION_ITERATIONS = 200000
+
+
+def calibrate() -> float:
+    """
+    best wall time of a fixed pure python loop, the yardstick the stage wall times are scaled by
+    """
+    def loop():
+        total = 0
+        for i in range(CALIBRATION_ITERATIONS):
+            total += i % 7
+        return total
+
+    wall_times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        loop()
+        wall_times.append(time.perf_counter() - start)
+    return min(wall_times)
+
+
+# --- stages, each gets a freshly loaded file (prepared outside of the measurement) and returns what it decoded
+
+def prepare_file(file_path):
+    return lambda: file_path
+
+
+def prepare_model(file_path):
+    return lambda: open_mdb(file_path)
+
+
+def prepare_node_table(file_path):
+    def prepare():
+        mdb = open_mdb(file_path)
+        node_table(mdb)
+        return mdb
+    return prepare
+
+
+def read_header(file_path):
+    return open_mdb(file_path).header
+
+
+def decode_node_tree(mdb):
+    return node_table(mdb)
+
+
+def materialise_geometry_arrays(mdb):
+    arrays = []
+    for node in node_table(mdb).nodes_of_type(Mdb.NodeType.trimesh, Mdb.NodeType.skin):
+        trimesh = node.node_data
+        for array_ptr in [trimesh.vertices, trimesh.normals, trimesh.tangents, trimesh.binormals,
+                          trimesh.faces] + trimesh.uvs:
+            arrays.append(read_array(array_ptr))
+    return arrays
+
+
+def materialise_geometry_objects(mdb):
+    objects = []
+    for node in node_table(mdb).nodes_of_type(Mdb.NodeType.trimesh, Mdb.NodeType.skin):
+        trimesh = node.node_data
+        for array_ptr in [trimesh.vertices, trimesh.normals, trimesh.tangents, trimesh.binormals,
+                          trimesh.faces] + trimesh.uvs:
+            objects.append(array_ptr.data)
+    return objects
+
+
+def decode_controllers(mdb):
+    return [NodeProperties.from_node(node) for node in node_table(mdb).nodes]
+
+
+def decode_animations(mdb):
+    return [animation_node_properties(animation) for animation in deref_all(mdb.animations.animation_array_pointer)]
+
+
+def stream_animations(mdb):
+    # only the last animation is kept alive, as a consumer converting one clip at a time would
+    node_properties = None
+    for animation in iter_animations(mdb):
+        node_properties = animation.node_properties
+    return node_properties
+
+
+STAGES = [
+    ('header_read', prepare_file(SAMPLE_MODEL), read_header),
+    ('header_scan', prepare_file(SAMPLE_MODEL), scan_header),
+    ('node_tree_decode', prepare_model(SAMPLE_MODEL), decode_node_tree),
+    ('geometry_arrays', prepare_node_table(SAMPLE_MODEL), materialise_geometry_arrays),
+    ('geometry_objects', prepare_node_table(SAMPLE_MODEL), materialise_geometry_objects),
+    ('controller_decode', prepare_node_table(SAMPLE_MODEL), decode_controllers),
+    ('animation_decode', prepare_model(SAMPLE_ANIMATION), decode_animations),
+    ('animation_stream', prepare_model(SAMPLE_ANIMATION), stream_animations)
+]
+
+
+def measure(prepare, stage):
+
+    wall_times = []
+    for _ in range(REPEATS):
+        argument = prepare()
+        start = time.perf_counter()
+        stage(argument)
+        wall_times.append(time.perf_counter() - start)
+
+    argument = prepare()
+    gc.collect()
+    objects_before = len(gc.get_objects())
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+    result = stage(argument)
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    objects_after = len(gc.get_objects())
+
+    allocations = snapshot_after.compare_to(snapshot_before, 'filename')
+    del result
+
+    return {
+        'wall_time_s': min(wall_times),
+        'allocated_bytes': max(sum(statistic.size_diff for statistic in allocations), 0),
+        'allocated_blocks': max(sum(statistic.count_diff for statistic in allocations), 0),
+        'objects': objects_after - objects_before
+    }
+
+
+def compare(results, baseline):
+    """
+    :return: list of regression descriptions
+    """
+    regressions = []
+    for stage_name, measurements in results['stages'].items():
+        if stage_name not in baseline.get('stages', {}):
+            continue
+        for measurement, tolerance in TOLERANCE.items():
+            value = measurements[measurement]
+            reference = baseline['stages'][stage_name].get(measurement, None)
+            if reference is None or reference <= 0:
+                continue
+            if value > reference * (1.0 + tolerance):
+                regressions.append('{}: {} went from {} to {} (+{:.0%})'.format(
+                    stage_name, measurement, reference, value, value / reference - 1.0))
+    return regressions
+
+
+def print_results(results, baseline):
+    # the baseline wall times as this run would have measured them
+    speed = results['calibration_s'] / baseline['calibration_s'] if 'calibration_s' in baseline else None
+
+    print('calibration loop {:.3f} ms{}'.format(
+        results['calibration_s'] * 1000.0,
+        '' if speed is None else ' (baseline {:.3f} ms)'.format(baseline['calibration_s'] * 1000.0)))
+    print('{:<20} {:>14} {:>16} {:>16} {:>10}'.format('stage', 'wall time (ms)', 'allocated bytes',
+                                                      'allocated blocks', 'objects'))
+    for stage_name, measurements in results['stages'].items():
+        reference = baseline.get('stages', {}).get(stage_name, {})
+        print('{:<20} {:>14.3f} {:>16} {:>16} {:>10}{}'.format(
+            stage_name,
+            measurements['wall_time_s'] * 1000.0,
+            measurements['allocated_bytes'],
+            measurements['allocated_blocks'],
+            measurements['objects'],
+            '' if len(reference) == 0 or speed is None else '   (calibrated baseline {:.3f} ms, {:+.0%})'.format(
+                reference['wall_time_s'] * speed * 1000.0,
+                measurements['wall_time_s'] / (reference['wall_time_s'] * speed) - 1.0)))
+
+
+def run(stages=STAGES):
+    return {
+        'calibration_s': calibrate(),
+        'stages': {stage_name: measure(prepare, stage) for stage_name, prepare, stage in stages}
+    }
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+
+    baseline_path = BASELINE
+    if '--baseline' in args:
+        baseline_path = args[args.index('--baseline') + 1]
+
+    results = run()
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+
+    print_results(results, baseline)
+
+    if '--update-baseline' in args:
+        with open(baseline_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('baseline written to {}'.format(baseline_path))
+        sys.exit(0)
+
+    regressions = compare(results, baseline)
+    for regression in regressions:
+        print('REGRESSION ' + regression)
+    sys.exit(1 if len(regressions) > 0 else 0)
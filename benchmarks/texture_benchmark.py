@@ -0,0 +1,130 @@
+"""
+texture conversion throughput of igni/textureio.py in megapixels per second
+
+usage: python benchmarks/texture_benchmark.py [repeats]
+
+the inputs are synthetic dds files (random dxt1, dxt5 and 32 bit uncompressed blocks, so every block mode and
+palette index occurs) and the sample bitmap attempts/what_about_the_normals.bmp; every input is decoded and encoded
+to png (up filter, compression level 6) and jpg (quality 90) from memory, best of the repeats
+
+then the png settings (texture-conversion.png in the export settings) are compared by throughput and size on the
+sample bitmap, and a batch of bitmap to png conversions is run through TextureBatchJob with 1 and more threads
+"""
+
+import os
+import queue
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+import numpy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)
+
+from igni import textureio
+
+SAMPLE_BITMAP = os.path.join(ROOT, 'attempts', 'what_about_the_normals.bmp')
+
+SIZES = [256, 1024, 2048]
+
+PNG_COMPRESSION_LEVELS = [1, 6, 9]
+
+BATCH_TEXTURES = 16
+BATCH_THREADS = [1, 2, 4]
+
+
+def dds_file(size: int, four_cc: bytes, random: numpy.random.Generator) -> bytes:
+    """
+    a size x size dds file with random contents
+    """
+    if four_cc == b'DXT1':
+        payload, pixel_format = (size // 4) ** 2 * 8, struct.pack('<II4s5I', 32, 0x4, four_cc, 0, 0, 0, 0, 0)
+    elif four_cc == b'DXT5':
+        payload, pixel_format = (size // 4) ** 2 * 16, struct.pack('<II4s5I', 32, 0x4, four_cc, 0, 0, 0, 0, 0)
+    else:
+        payload, pixel_format = size * size * 4, struct.pack('<II4s5I', 32, 0x41, b'\x00' * 4, 32,
+                                                             0xff0000, 0xff00, 0xff, 0xff000000)
+    header = struct.pack('<7I', 124, 0x1007, size, size, 0, 0, 1) + b'\x00' * 44 + pixel_format + \
+        struct.pack('<4I', 0x1000, 0, 0, 0) + b'\x00' * 4
+    return b'DDS ' + header + random.integers(0, 256, payload, dtype=numpy.uint8).tobytes()
+
+
+def best_of(repeats: int, function) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(name: str, data: bytes, reader, repeats: int):
+    pixels = reader(data)
+    megapixels = pixels.shape[0] * pixels.shape[1] / 1e6
+
+    decode = best_of(repeats, lambda: reader(data))
+    png = best_of(repeats, lambda: textureio.encode_png(pixels, 6, 'up'))
+    jpg = best_of(repeats, lambda: textureio.encode_jpg(pixels, 90))
+
+    print('{:<28} {:>6.2f} MP   decode {:>8.1f} MP/s   png {:>7.1f} MP/s   jpg {:>7.1f} MP/s'.format(
+        name, megapixels, megapixels / decode, megapixels / png, megapixels / jpg))
+
+
+def report_png_settings(pixels: numpy.ndarray, repeats: int):
+    megapixels = pixels.shape[0] * pixels.shape[1] / 1e6
+    for filter_type in textureio.PNG_FILTERS:
+        for level in PNG_COMPRESSION_LEVELS:
+            size = len(textureio.encode_png(pixels, level, filter_type))
+            seconds = best_of(repeats, lambda: textureio.encode_png(pixels, level, filter_type))
+            print('png {:<8} level {}   {:>7.1f} MP/s   {:>9} bytes'.format(filter_type, level, megapixels / seconds, size))
+
+
+def report_batch(bitmap: str, repeats: int):
+    from igni import app
+    from igni.resources import File, Directory
+    from igni.textures import TextureConverterJob, TextureBatchJob
+
+    # logging of the jobs goes to an in-process queue instead of the application
+    reference = app.IgniApplicationReference()
+    reference._logging_queue = queue.Queue()
+    app._Application = reference
+
+    with tempfile.TemporaryDirectory() as directory:
+        sources = []
+        for i in range(BATCH_TEXTURES):
+            sources.append(os.path.join(directory, 'texture{}.bmp'.format(i)))
+            shutil.copy(bitmap, sources[-1])
+
+        for threads in BATCH_THREADS:
+            def convert():
+                destination = os.path.join(directory, 'out')
+                shutil.rmtree(destination, ignore_errors=True)
+                os.makedirs(destination)
+                jobs = [TextureConverterJob().input(File(source)).target_fname(os.path.basename(source)[:-4]).
+                        target_format('png').target_dir(Directory(destination)) for source in sources]
+                TextureBatchJob(jobs, threads).run()
+
+            seconds = best_of(repeats, convert)
+            print('batch of {} bmp -> png, {} thread(s)   {:>6.2f} s   {:>7.1f} textures/s'.format(
+                BATCH_TEXTURES, threads, seconds, BATCH_TEXTURES / seconds))
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    random = numpy.random.default_rng(0)
+
+    for size in SIZES:
+        for four_cc in (b'DXT1', b'DXT5', b'BGRA'):
+            report('{} {}x{}'.format(four_cc.decode().lower(), size, size), dds_file(size, four_cc, random),
+                   textureio.read_dds, repeats)
+
+    if os.path.exists(SAMPLE_BITMAP):
+        with open(SAMPLE_BITMAP, 'rb') as f:
+            report(os.path.basename(SAMPLE_BITMAP), f.read(), textureio.read_bmp, repeats)
+        print()
+        report_png_settings(textureio.read_texture(SAMPLE_BITMAP), repeats)
+        print()
+        report_batch(SAMPLE_BITMAP, repeats)
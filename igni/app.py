@@ -5,17 +5,30 @@ from .settings import Settings
 import logging
 import sqlite3
 from threading import Thread
-import pandas
 from .resources import ResourceManager, Directory
+from .modelcache import install_model_cache
+from .sharedmodel import release_shared_model, detach_shared_model
+from .textureclaims import TextureClaimRegistry, create_texture_claims, set_texture_claims
+from functools import partial
 import os.path
 import time
 import math
 from datetime import datetime
 
 
+# annotation
+def picklable(fun):
+    return fun
+
+
 class PersistenceTask:
 
-    def __init__(self, table_name: str, dataset: pandas.DataFrame):
+    """
+    rows to append to a table of the export meta database; the dataset is a list of row dicts or a pandas
+    dataframe, lists are turned into a dataframe by the persistence loop so tasks don't need to import pandas
+    """
+
+    def __init__(self, table_name: str, dataset):
         self.table_name = table_name
         self.dataset = dataset
 
@@ -40,7 +53,7 @@ class IgniApplicationReference:
     def submit_persistence_task(self, task: PersistenceTask):
         self._persistence_events_queue.put(task)
 
-    def persist_data(self, table_name: str, dataset: pandas.DataFrame):
+    def persist_data(self, table_name: str, dataset):
         self.submit_persistence_task(PersistenceTask(table_name, dataset))
 
 
@@ -50,13 +63,17 @@ _Application: IgniApplicationReference = None
 def _set_up_app_reference_for_child_process(logging_queue: Queue,
                                             application_events_queue: Queue,
                                             application_db_events_queue: Queue,
-                                            resource_manager: ResourceManager):
+                                            resource_manager: ResourceManager,
+                                            model_cache_settings: Settings = None,
+                                            texture_claims: TextureClaimRegistry = None):
     global _Application
     _Application = IgniApplicationReference()
     _Application._logging_queue = logging_queue
     _Application._application_events_queue = application_events_queue
     _Application._persistence_events_queue = application_db_events_queue
     _Application.resource_manager = ResourceManager.from_picklable_in_memory_copy(resource_manager)
+    install_model_cache(model_cache_settings)
+    set_texture_claims(texture_claims)
 
 
 def Application():
@@ -73,17 +90,23 @@ class IgniApplication:
                      logging_queue,
                      application_events_queue,
                      application_db_events_queue,
-                     resource_manager):
+                     resource_manager,
+                     model_cache_settings=None,
+                     texture_claims=None):
             self.logging_queue = logging_queue
             self.application_events_queue = application_events_queue
             self.application_db_events_queue = application_db_events_queue
             self.resource_manager = resource_manager
+            self.model_cache_settings = model_cache_settings
+            self.texture_claims = texture_claims
 
         def __call__(self):
             _set_up_app_reference_for_child_process(self.logging_queue,
                                                     self.application_events_queue,
                                                     self.application_db_events_queue,
-                                                    self.resource_manager)
+                                                    self.resource_manager,
+                                                    self.model_cache_settings,
+                                                    self.texture_claims)
 
     def __init__(self, application_settings: Settings):
 
@@ -109,6 +132,7 @@ class IgniApplication:
         self._initiation_time = time.time()
 
         self.resource_manager = None
+        self.texture_claims: TextureClaimRegistry = None            # texture conversions claimed in this run
 
         self._initialize()
 
@@ -154,6 +178,8 @@ class IgniApplication:
                                    application_shutdown_queue: Queue,
                                    conn_path: str):
 
+        import pandas  # only the application process writes the export meta database
+
         now = datetime.now()
         db_name = 'export_meta_' + str(now.year) + str(now.month) + str(now.day) + '_' + str(now.hour) \
                   + str(now.minute) + '.db'
@@ -167,7 +193,10 @@ class IgniApplication:
 
             if not persistence_tasks_queue.empty():
                 persistence_event = persistence_tasks_queue.get()
-                persistence_event.dataset.to_sql(
+                dataset = persistence_event.dataset
+                if not isinstance(dataset, pandas.DataFrame):
+                    dataset = pandas.DataFrame(dataset)
+                dataset.to_sql(
                     persistence_event.table_name,
                     conn,
                     if_exists='append',
@@ -183,9 +212,10 @@ class IgniApplication:
         already_executed_tasks = set()
 
         # TODO custom callbacks
-        def _task_execution_callback(future):
+        def _task_execution_callback(task, future):
             if future.exception():
                 app.logger.error(future.exception())
+            app._release_shared_models(task)
             app._running_tasks.remove(future)
 
         application_events_queue = app._application_events_queue
@@ -204,7 +234,7 @@ class IgniApplication:
                     already_executed_tasks.add(application_event.execution_id)
 
                 future = task_executor.submit(application_event)
-                future.add_done_callback(_task_execution_callback)
+                future.add_done_callback(partial(_task_execution_callback, application_event))
                 app._running_tasks.append(future)
 
 
@@ -245,6 +275,21 @@ class IgniApplication:
         self.logger.info('initializing resource manager...')
         self.resource_manager = ResourceManager(Directory(self._application_settings['witcher-data']))
 
+        # texture names with more than one candidate file are reported once here instead of by every task
+        from .textures import ResourceManagerTextureLocatorService
+        texture_names = self.resource_manager.texture_name_index(
+            ResourceManagerTextureLocatorService.POSSIBLE_TEXTURE_EXTENSIONS)
+        if len(texture_names.ambiguous_names) > 0:
+            self.logger.warning('{} texture names have more than one candidate file, the first by path is used: '
+                                '{}'.format(len(texture_names.ambiguous_names), ', '.join(texture_names.ambiguous_names)))
+
+        # optional, caches decoded models across runs (see modelcache.py)
+        install_model_cache(self._application_settings.get('model-cache', default=None))
+
+        # every texture is converted once per run, by the first task that claims it (see textureclaims.py)
+        self.texture_claims = create_texture_claims(self._application_settings['db-path'])
+        set_texture_claims(self.texture_claims)
+
     def start(self):
 
         # initialize application context in child processes
@@ -252,7 +297,9 @@ class IgniApplication:
             self._logging_queue,
             self._application_events_queue,
             self._application_db_events_queue,
-            self.resource_manager.get_picklable_in_memory_copy()
+            self.resource_manager.get_picklable_in_memory_copy(),
+            self._application_settings.get('model-cache', default=None),
+            self.texture_claims
         )
 
         self.logger.info('starting processes and task executor...')
@@ -297,6 +344,10 @@ class IgniApplication:
             math.floor(elapsed_time/60.0),
             round(elapsed_time % 60, 3)
         ))
+        self.logger.info('{} texture conversions claimed'.format(self.texture_claims.claim_count()))
+        duplicates, saved_bytes, saved_seconds = self.texture_claims.savings()
+        self.logger.info('{} textures with duplicate content linked, saved {} bytes and {} seconds of '
+                         'conversion'.format(duplicates, saved_bytes, round(saved_seconds, 3)))
 
         self._task_executor.shutdown(wait=True)  # TODO reliable shutdown so that no tasks are lost?
         self._application_shutdown_queue.put('()')  # sending shutdown 'event'
@@ -315,6 +366,8 @@ class IgniApplication:
                 print(e)
                 break
 
+        self.texture_claims.remove()  # the claims only hold for this run
+
         return
 
     def submit_task(self, task):
@@ -326,14 +379,27 @@ class IgniApplication:
     def submit_persistence_task(self, task):
         self.application_reference.submit_persistence_task(task)
 
-    def persist_data(self, table_name: str, dataset: pandas.DataFrame):
+    def persist_data(self, table_name: str, dataset):
         self.application_reference.persist_data(table_name, dataset)
 
     def execute_task(self, task):
         """
         blocking task execution
         """
-        task()  # TODO
+        try:
+            task()  # TODO
+        finally:
+            self._release_shared_models(task)
+
+    def _release_shared_models(self, task):
+        """
+        frees the shared memory segments of the models a finished task consumed (see sharedmodel.py)
+        """
+        for descriptor in task.shared_models:
+            try:
+                release_shared_model(descriptor)
+            except Exception as e:
+                self.logger.error('could not release shared model {}: {}'.format(descriptor, e))
 
 
 _IGNI_APPLICATION: IgniApplication = None
@@ -350,6 +416,14 @@ class IgniApplicationEntity:
 
         self._logger = None
         self._execution_id = None
+        self._shared_models = []
+
+    @property
+    def shared_models(self) -> list:
+        """
+        descriptors of the shared models (see sharedmodel.py) released by the application once this task is done
+        """
+        return self._shared_models
 
     @property
     def logger(self):
@@ -371,8 +445,16 @@ class IgniApplicationEntity:
         self._execution_id = id_
         return self
 
+    def releases(self, shared_model_descriptor):
+        self._shared_models.append(shared_model_descriptor)
+        return self
+
     def __call__(self):
-        self.run()
+        try:
+            self.run()
+        finally:
+            for descriptor in self._shared_models:
+                detach_shared_model(descriptor)
 
 
 def start_new_application(application_settings: Settings=None):
@@ -0,0 +1,132 @@
+from .mdb import Mdb
+from .mdbutil import Material, NodeTable, node_table
+from .resources import Resource, ResourceTypes, ResourceManager
+from .sharedmodel import SharedModelDescriptor, open_shared_model
+from .app import Application
+
+'''
+state of the conversion of one source file, shared by everything that converts it (task dispatcher, export job,
+texture handler) so the file is read and decoded once per run
+'''
+
+
+class ConversionContext:
+
+    """
+    the model of a source file (parsed on first use, from shared memory if a shared model is set), its node table,
+    the materials of its mesh nodes and the material (.mat) files they point to, each read once
+
+    material files are looked up with the resource manager given, or the one of the application; problems that
+    don't stop the conversion are collected in errors
+
+    a context pickled with a task keeps the material files it has read and its shared model and leaves the decoded
+    model and materials behind; the receiving process maps the shared model (the task dispatcher publishes the model
+    it decoded) and reads the materials from it, it only decodes the source file if no shared model is set or the
+    shared model can't be mapped
+
+    textures_dispatched is set by the task dispatcher once it has submitted the texture conversions of the materials
+    and recorded their metadata, the export job then leaves both to it
+    """
+
+    def __init__(self,
+                 source: Resource,
+                 resource_manager: ResourceManager = None,
+                 shared_model: SharedModelDescriptor = None):
+
+        self.source: Resource = source
+        self.resource_manager: ResourceManager = resource_manager
+        self.shared_model: SharedModelDescriptor = shared_model
+        self.errors = []
+        self.textures_dispatched = False
+
+        self._m_mdb = None
+        self._m_materials = None
+        self._m_materials_by_node = None
+        self._material_files = {}  # material file pointer -> lines, None if the file could not be found
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['resource_manager'] = None
+        state['_m_mdb'] = None
+        state['_m_materials'] = None
+        state['_m_materials_by_node'] = None
+        return state
+
+    @property
+    def mdb(self) -> Mdb:
+        if self._m_mdb is None:
+            if self.shared_model is not None:
+                try:
+                    self._m_mdb = open_shared_model(self.shared_model)
+                except Exception as e:
+                    self.errors.append('could not map the shared model, the source is decoded again: {}'.format(e))
+            if self._m_mdb is None:
+                self._m_mdb = self.source.get()
+        return self._m_mdb
+
+    @property
+    def node_table(self) -> NodeTable:
+        return node_table(self.mdb)
+
+    @property
+    def materials(self) -> dict:
+        """
+        node index -> material of every mesh node that has a non-empty one, with its material file read
+        """
+        if self._m_materials is None:
+            self._read_materials_()
+        return self._m_materials
+
+    def material_of(self, node: Mdb.Node) -> Material:
+        """
+        :return: the material of a node of this context's model, None if it has no (non-empty) material
+        """
+        if self._m_materials is None:
+            self._read_materials_()
+        return self._m_materials_by_node.get(id(node), None)
+
+    def _read_materials_(self):
+
+        table = self.node_table
+        materials = {}
+        for index in table.indices_of_type(Mdb.NodeType.trimesh, Mdb.NodeType.skin):
+            try:
+                material = Material.from_node(table.nodes[index])
+            except Exception as e:
+                self.errors.append('could not read material of {}: {}'.format(table.names[index], e))
+                continue
+
+            if len(material.material_file_pointer) > 0:
+                material_lines = self.material_file(material.material_file_pointer)
+                if material_lines is not None:
+                    try:
+                        material.read_material_lines(material_lines)
+                    except Exception as e:
+                        self.errors.append('could not read material file {}: {}'.format(
+                            material.material_file_pointer, e))
+
+            if not material.is_empty():
+                materials[index] = material
+
+        self._m_materials = materials
+        self._m_materials_by_node = {id(material.host_node): material for material in materials.values()}
+
+    def material_file(self, material_file_pointer: str) -> list:
+        """
+        :return: the lines of the material file a material points to, None if there is no such file
+        """
+
+        if material_file_pointer not in self._material_files:
+            resource_manager = self.resource_manager
+            if resource_manager is None:
+                resource_manager = Application().resource_manager
+
+            material_resource = resource_manager.get(material_file_pointer, ResourceTypes.MAT)
+            if material_resource is None:
+                self.errors.append('material is pointing to a material file {} but could locate none'.format(
+                    material_file_pointer))
+                self._material_files[material_file_pointer] = None
+            else:
+                self._material_files[material_file_pointer] = material_resource.get()
+
+        return self._material_files[material_file_pointer]
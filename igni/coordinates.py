@@ -0,0 +1,128 @@
+from .settings import Settings
+import numpy
+
+
+class CoordinateSystemService:
+
+    COORDINATE_SYSTEM_SETTINGS_DEFAULT_SETTINGS = Settings({
+        'source-unit': 'm',
+        'target-unit': 'cm',
+        'coordinate-system-mapping': {
+            'x': 'y',
+            'y': 'z',
+            'z': 'x'
+        }
+    })
+
+    COORDINATE_SYSTEM_SETTINGS_TEMPLATE = Settings({
+        'source-unit': {'m', 'cm'},
+        'target-unit': {'m', 'cm'},
+        'coordinate-system-mapping': {
+            'x': {'y', '-y', 'x', '-x', 'z', '-z'},
+            'y': {'y', '-y', 'x', '-x', 'z', '-z'},
+            'z': {'y', '-y', 'x', '-x', 'z', '-z'}
+        }
+    })
+
+    MEASUREMENT_UNIT_TO_CM = {
+        'm': 100.0,
+        'cm': 1.0
+    }
+
+    def __init__(self, settings: Settings = Settings()):
+        self.settings = Settings(self.COORDINATE_SYSTEM_SETTINGS_DEFAULT_SETTINGS)  # copy, the defaults are shared
+        self.settings.read_dict(settings).using_type_hint(self.COORDINATE_SYSTEM_SETTINGS_TEMPLATE)
+
+        self.multiplication_factor = self.MEASUREMENT_UNIT_TO_CM[self.settings['source-unit']] / \
+                                     self.MEASUREMENT_UNIT_TO_CM[self.settings['target-unit']]
+
+        self.coord_mapping = [(0, 1.0), (1, 1.0),
+                              (2, 1.0)]  # meaning: for zeroth index take zeroth member of input and multiply by 1.0
+        self.coord_names = {'x': 0, 'y': 1, 'z': 2}
+
+        for from_axis, to_axis in self.settings['coordinate-system-mapping'].items():
+            negation_factor = 1.0
+            if to_axis.startswith('-'):
+                negation_factor = -1.0
+            self.coord_mapping[self.coord_names[from_axis]] = (
+                self.coord_names[to_axis.replace('-', '')], negation_factor)
+
+        # the mapping compiled to a signed permutation matrix, output = matrix @ input
+        self.matrix = numpy.zeros((3, 3))
+        for to_index, (from_index, negation_factor) in enumerate(self.coord_mapping):
+            self.matrix[to_index, from_index] = negation_factor
+
+        # rows are transformed as rows @ matrix.T, scaled matrices are kept so that a transform is a single product
+        self._points_matrix = (self.matrix * self.multiplication_factor).T
+        self._directions_matrix = self.matrix.T
+        self._determinant = round(numpy.linalg.det(self.matrix))
+
+    @property
+    def flips_handedness(self) -> bool:
+        """
+        the mapping is a reflection, triangle winding has to be reversed to keep facing the same way
+        """
+        return self._determinant < 0
+
+    def transform_points(self, points) -> numpy.ndarray:
+        """
+        :param points: (N, 3) positions in the source coordinate system and unit
+        :return: (N, 3) float64 positions in the target coordinate system and unit
+        """
+        return numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3) @ self._points_matrix
+
+    def transform_directions(self, directions) -> numpy.ndarray:
+        """
+        :param directions: (N, 3) directions (normals, tangents...), only the axes change, no unit conversion
+        :return: (N, 3) float64 directions in the target coordinate system
+        """
+        return numpy.asarray(directions, dtype=numpy.float64).reshape(-1, 3) @ self._directions_matrix
+
+    def transform_quaternions(self, quaternions) -> numpy.ndarray:
+        """
+        conjugates rotations with the axis mapping (matrix @ rotation @ matrix.T), the rotation axis is mapped like a
+        direction and flipped if the mapping is a reflection, the angle (w) is kept
+        :param quaternions: (N, 4) quaternions as x, y, z, w
+        :return: (N, 4) float64 quaternions in the target coordinate system
+        """
+        if abs(self._determinant) != 1:
+            raise Exception('coordinate system mapping {} is not a permutation of axes'.format(self.coord_mapping))
+        quaternions = numpy.asarray(quaternions, dtype=numpy.float64).reshape(-1, 4)
+        transformed = numpy.empty_like(quaternions)
+        transformed[:, :3] = quaternions[:, :3] @ (self._directions_matrix * self._determinant)
+        transformed[:, 3] = quaternions[:, 3]
+        return transformed
+
+    def location(self, vector_xyz):
+        if len(vector_xyz) != 3:
+            raise Exception('illegal argument {} supplied'.format(vector_xyz))
+        return tuple(self.transform_points(vector_xyz)[0].tolist())
+
+    def rotation(self, vector_xyz):
+        if len(vector_xyz) != 3:
+            raise Exception('illegal argument {} supplied'.format(vector_xyz))
+        return tuple((numpy.abs(self._directions_matrix.T) @ numpy.asarray(vector_xyz, dtype=numpy.float64)).tolist())
+
+    def __str__(self):
+        return str(self.coord_mapping)
+
+
+def flip_uvs(uvs: numpy.ndarray) -> numpy.ndarray:
+    """
+    (u, v) -> (u, 1 - v) on a copy
+    """
+    flipped = numpy.array(uvs, dtype=numpy.float64)
+    flipped[:, 1] = 1.0 - flipped[:, 1]
+    return flipped
+
+
+def quaternions_to_euler(quaternions) -> numpy.ndarray:
+    """
+    :param quaternions: (N, 4) quaternions as x, y, z, w
+    :return: (N, 3) euler angles in degrees as the fbx LclRotation takes them, all converted in one call
+    """
+    quaternions = numpy.asarray(quaternions, dtype=numpy.float64).reshape(-1, 4)
+    if len(quaternions) == 0:
+        return numpy.zeros((0, 3))
+    from scipy.spatial.transform import Rotation
+    return Rotation.from_quat(quaternions).as_euler('yzx', degrees=True)
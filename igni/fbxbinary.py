@@ -0,0 +1,603 @@
+from .mdb import Mdb
+from .mdbutil import node_table, Trimesh, NodeTransforms, node_material
+from .coordinates import CoordinateSystemService, flip_uvs, quaternions_to_euler
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import struct
+import sys
+import zlib
+import numpy
+
+'''
+binary fbx (7.4) export without the fbx sdk
+
+FbxRecord is a node of the fbx document tree (name, typed properties, child records), FbxDocument serialises a list
+of top level records; array properties are numpy arrays written as is or zlib-compressed, compression runs for all
+arrays of a document at once in a thread pool (zlib releases the gil) before anything is written
+
+MdbFbxBuilder fills a document with the node hierarchy, meshes (control points, polygons, normals, tangents,
+binormals, uv sets), materials and texture references of an mdb, laid out as the fbx sdk export lays them out
+(node locations through the coordinate system service, rotations as euler angles, layer elements by control point)
+'''
+
+FBX_VERSION = 7400
+
+_HEADER = b'Kaydara FBX Binary  \x00\x1a\x00'
+_NULL_RECORD = b'\x00' * 13
+
+# file id, creation time and footer id have to match each other, these are the values the sdk reads back for files
+# written with a fixed creation time
+_FILE_ID = b'\x28\xb3\x2a\xeb\xb6\x24\xcc\xc2\xbf\xc8\xb0\x2a\xa9\x2b\xfc\xf1'
+_CREATION_TIME = '1970-01-01 10:00:00:000'
+_FOOT_ID = b'\xfa\xbc\xab\x09\xd0\xc8\xd4\x66\xb1\x76\xfb\x83\x1c\xf7\x26\x7e'
+_FOOT_MAGIC = b'\xf8\x5a\x8c\x6a\xde\xf5\xd9\x7e\xec\xe9\x0c\xe3\x75\x8f\x29\x0b'
+
+# records that always end with a null record, even without children
+_ALWAYS_NULL_TERMINATED = {b'AnimationStack', b'AnimationLayer'}
+
+# arrays smaller than this are not worth compressing (the sdk writes them raw as well)
+MIN_COMPRESSED_ARRAY_BYTES = 128
+
+_ARRAY_TYPE_CODES = {
+    numpy.dtype(numpy.float64): b'd',
+    numpy.dtype(numpy.float32): b'f',
+    numpy.dtype(numpy.int64): b'l',
+    numpy.dtype(numpy.int32): b'i',
+    numpy.dtype(numpy.bool_): b'b'
+}
+
+
+class Int64(int):
+
+    """
+    marks an integer property as 64 bit (L), plain ints are written as 32 bit (I)
+    """
+
+
+class FbxRecord:
+
+    def __init__(self, name: str, *properties):
+        self.name = name.encode('utf8')
+        self.properties = list(properties)
+        self.children = []
+
+    def add(self, name: str, *properties) -> 'FbxRecord':
+        child = FbxRecord(name, *properties)
+        self.children.append(child)
+        return child
+
+    def add_p(self, name: str, property_type: str, label: str, flags: str, *values) -> 'FbxRecord':
+        """
+        adds a 'P' record (an entry of Properties70)
+        """
+        return self.add('P', name, property_type, label, flags, *values)
+
+
+def object_name(name: str, object_class: str) -> str:
+    return name + '\x00\x01' + object_class
+
+
+class _EncodedArray:
+
+    def __init__(self, array: numpy.ndarray):
+        self.array = numpy.ascontiguousarray(array)
+        if self.array.dtype not in _ARRAY_TYPE_CODES:
+            raise Exception("can't write arrays of type {} to fbx".format(self.array.dtype))
+        self.type_code = _ARRAY_TYPE_CODES[self.array.dtype]
+        self.encoding = 0
+        self.payload = memoryview(self.array).cast('B') if self.array.size > 0 else b''
+
+    def compress(self, level: int):
+        if self.array.nbytes >= MIN_COMPRESSED_ARRAY_BYTES:
+            self.payload = zlib.compress(self.payload, level)
+            self.encoding = 1
+        return self
+
+
+class FbxDocument:
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, name: str, *properties) -> FbxRecord:
+        record = FbxRecord(name, *properties)
+        self.records.append(record)
+        return record
+
+    def _arrays_(self):
+        pending = list(self.records)
+        while len(pending) > 0:
+            record = pending.pop()
+            for i, value in enumerate(record.properties):
+                if isinstance(value, numpy.ndarray):
+                    record.properties[i] = _EncodedArray(value)
+                    yield record.properties[i]
+            pending.extend(record.children)
+
+    @staticmethod
+    def _encode_property_(value, chunks: list) -> int:
+        """
+        appends the encoded property to chunks
+        :return: encoded length
+        """
+
+        if isinstance(value, bool):
+            encoded = b'C' + (b'\x01' if value else b'\x00')
+        elif isinstance(value, Int64):
+            encoded = b'L' + struct.pack('<q', value)
+        elif isinstance(value, int):
+            encoded = b'I' + struct.pack('<i', value)
+        elif isinstance(value, float):
+            encoded = b'D' + struct.pack('<d', value)
+        elif isinstance(value, str):
+            data = value.encode('utf8')
+            encoded = b'S' + struct.pack('<I', len(data)) + data
+        elif isinstance(value, bytes):
+            encoded = b'R' + struct.pack('<I', len(value)) + value
+        elif isinstance(value, _EncodedArray):
+            header = value.type_code + struct.pack('<III', value.array.size, value.encoding, len(value.payload))
+            chunks.append(header)
+            chunks.append(value.payload)
+            return len(header) + len(value.payload)
+        else:
+            raise Exception("can't write property of type {} to fbx".format(type(value)))
+
+        chunks.append(encoded)
+        return len(encoded)
+
+    def _serialise_record_(self, record: FbxRecord, offset: int, chunks: list, is_last: bool) -> int:
+        """
+        appends the record and its children to chunks
+        :param offset: file offset of the record
+        :return: file offset after the record
+        """
+
+        header_index = len(chunks)
+        chunks.append(None)  # header, needs the end offset
+
+        property_length = 0
+        for value in record.properties:
+            property_length += self._encode_property_(value, chunks)
+
+        end_offset = offset + 13 + len(record.name) + property_length
+        if len(record.children) > 0:
+            for i, child in enumerate(record.children):
+                end_offset = self._serialise_record_(child, end_offset, chunks, i == len(record.children) - 1)
+            chunks.append(_NULL_RECORD)
+            end_offset += len(_NULL_RECORD)
+        elif (len(record.properties) == 0 and not is_last) or record.name in _ALWAYS_NULL_TERMINATED:
+            chunks.append(_NULL_RECORD)
+            end_offset += len(_NULL_RECORD)
+
+        chunks[header_index] = struct.pack('<IIIB', end_offset, len(record.properties), property_length,
+                                           len(record.name)) + record.name
+        return end_offset
+
+    def write(self, file_path: str, compression_threads: int = 4, compression_level: int = 1):
+        """
+        :param compression_threads: threads compressing the array properties, 0 to write arrays uncompressed
+        """
+
+        arrays = list(self._arrays_())
+        if compression_threads > 0 and len(arrays) > 0:
+            with ThreadPoolExecutor(max_workers=compression_threads) as executor:
+                list(executor.map(lambda array: array.compress(compression_level), arrays))
+
+        chunks = [_HEADER, struct.pack('<I', FBX_VERSION)]
+        offset = len(_HEADER) + 4
+        for i, record in enumerate(self.records):
+            offset = self._serialise_record_(record, offset, chunks, i == len(self.records) - 1)
+        chunks.append(_NULL_RECORD)
+        offset += len(_NULL_RECORD)
+
+        chunks.append(_FOOT_ID)
+        chunks.append(b'\x00' * 4)
+        offset += len(_FOOT_ID) + 4
+        padding = ((offset + 15) & ~15) - offset
+        chunks.append(b'\x00' * (padding if padding > 0 else 16))
+        chunks.append(struct.pack('<I', FBX_VERSION))
+        chunks.append(b'\x00' * 120)
+        chunks.append(_FOOT_MAGIC)
+
+        with open(file_path, 'wb') as f:
+            f.writelines(chunks)
+
+
+def read_fbx(file_path: str) -> list:
+    """
+    reads the records of a binary fbx file back as (name, properties, children) tuples, arrays as numpy arrays
+    """
+
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(_HEADER):
+        raise Exception('{} is not a binary fbx file'.format(file_path))
+    version, = struct.unpack_from('<I', data, len(_HEADER))
+    wide = version >= 7500
+    header_format, header_size = ('<QQQB', 25) if wide else ('<IIIB', 13)
+
+    array_dtypes = {code: dtype for dtype, code in _ARRAY_TYPE_CODES.items()}
+    scalar_formats = {b'C': '<?', b'Y': '<h', b'I': '<i', b'L': '<q', b'F': '<f', b'D': '<d'}
+
+    def read_record(offset):
+        end_offset, property_count, _, name_length = struct.unpack_from(header_format, data, offset)
+        if end_offset == 0:
+            return None, offset + header_size
+        offset += header_size
+        name = data[offset:offset + name_length].decode('utf8')
+        offset += name_length
+
+        properties = []
+        for _ in range(property_count):
+            code = data[offset:offset + 1]
+            offset += 1
+            if code in scalar_formats:
+                value, = struct.unpack_from(scalar_formats[code], data, offset)
+                offset += struct.calcsize(scalar_formats[code])
+            elif code in (b'S', b'R'):
+                length, = struct.unpack_from('<I', data, offset)
+                value = data[offset + 4:offset + 4 + length]
+                value = value.decode('utf8') if code == b'S' else value
+                offset += 4 + length
+            else:
+                count, encoding, length = struct.unpack_from('<III', data, offset)
+                payload = data[offset + 12:offset + 12 + length]
+                if encoding == 1:
+                    payload = zlib.decompress(payload)
+                value = numpy.frombuffer(payload, dtype=array_dtypes[code], count=count)
+                offset += 12 + length
+            properties.append(value)
+
+        children = []
+        while offset < end_offset:
+            child, offset = read_record(offset)
+            if child is not None:
+                children.append(child)
+        return (name, properties, children), end_offset
+
+    records = []
+    offset = len(_HEADER) + 4
+    while True:
+        record, offset = read_record(offset)
+        if record is None:
+            break
+        records.append(record)
+    return records
+
+
+class MdbFbxBuilder:
+
+    """
+    converts the node tree, meshes and materials of an mdb into an FbxDocument
+
+    same inputs as gltf.MdbGltfBuilder: node locations and vertex data go through the coordinate system service,
+    texture_path maps a texture name to the (relative) file name written into the file (None leaves the texture
+    out), on_material is called with every non-empty material before it is written, material_of replaces reading the
+    material of a node (e.g. ConversionContext.material_of, None for no material)
+
+    after build, nodes, meshes and materials list what was exported ((mdb node, Material) for materials), errors the
+    problems that did not stop the export
+    """
+
+    def __init__(self,
+                 coord_service: CoordinateSystemService,
+                 flip_uvs: bool = True,
+                 normals: bool = True,
+                 tangents: bool = True,
+                 binormals: bool = True,
+                 skip_names_containing=(),
+                 texture_path=None,
+                 on_material=None,
+                 material_of=None,
+                 creator: str = 'igni'):
+
+        self.coord_service = coord_service
+        self.flip_uvs = flip_uvs
+        self.normals = normals
+        self.tangents = tangents
+        self.binormals = binormals
+        self.skip_names_containing = list(skip_names_containing)
+        self.texture_path = texture_path
+        self.on_material = on_material
+        self.material_of = material_of
+        self.creator = creator
+
+        self.nodes = []
+        self.meshes = []
+        self.materials = []
+        self.errors = []
+
+        self._next_id = 1000000
+        self._objects: FbxRecord = None
+        self._connections: FbxRecord = None
+        self._object_counts = {}
+        self._material_ids = {}
+        self._texture_ids = {}
+
+    def _new_id_(self) -> Int64:
+        self._next_id += 1
+        return Int64(self._next_id)
+
+    def _add_object_(self, object_type: str, *properties) -> FbxRecord:
+        self._object_counts[object_type] = self._object_counts.get(object_type, 0) + 1
+        return self._objects.add(object_type, *properties)
+
+    def _connect_(self, child_id: Int64, parent_id: Int64, property_name: str = None):
+        if property_name is None:
+            self._connections.add('C', 'OO', child_id, parent_id)
+        else:
+            self._connections.add('C', 'OP', child_id, parent_id, property_name)
+
+    def build(self, mdb: Mdb) -> FbxDocument:
+
+        document = FbxDocument()
+        self._add_header_(document)
+
+        self._objects = FbxRecord('Objects')
+        self._connections = FbxRecord('Connections')
+
+        table = node_table(mdb)
+        # skipped nodes are not read
+        translations, rotations = self._node_transforms_(table, table.kept_indices(self.skip_names_containing))
+
+        pending = [(child, Int64(0)) for child in reversed(table.children_of(0))]
+        while len(pending) > 0:
+            index, parent_id = pending.pop()
+            node = table.nodes[index]
+
+            if any(word in table.names[index] for word in self.skip_names_containing):
+                continue  # with its children
+
+            model_id = self._add_model_(node, table.names[index], translations[index], rotations[index])
+            self._connect_(model_id, parent_id)
+            self.nodes.append(node)
+            pending.extend((child, model_id) for child in reversed(table.children_of(index)))
+
+        self._add_definitions_(document)
+        document.records.append(self._objects)
+        document.records.append(self._connections)
+        document.add('Takes').add('Current', '')
+
+        return document
+
+    def _add_header_(self, document: FbxDocument):
+
+        now = datetime.datetime.now()
+        header = document.add('FBXHeaderExtension')
+        header.add('FBXHeaderVersion', 1003)
+        header.add('FBXVersion', FBX_VERSION)
+        header.add('EncryptionType', 0)
+        timestamp = header.add('CreationTimeStamp')
+        timestamp.add('Version', 1000)
+        for field, value in (('Year', now.year), ('Month', now.month), ('Day', now.day), ('Hour', now.hour),
+                             ('Minute', now.minute), ('Second', now.second),
+                             ('Millisecond', now.microsecond // 1000)):
+            timestamp.add(field, value)
+        header.add('Creator', self.creator)
+
+        document.add('FileId', _FILE_ID)
+        document.add('CreationTime', _CREATION_TIME)
+        document.add('Creator', self.creator)
+
+        # y up, z front, x right, centimeters as the sdk writes a new scene
+        settings = document.add('GlobalSettings')
+        settings.add('Version', 1000)
+        properties = settings.add('Properties70')
+        for name, value in (('UpAxis', 1), ('UpAxisSign', 1), ('FrontAxis', 2), ('FrontAxisSign', 1),
+                            ('CoordAxis', 0), ('CoordAxisSign', 1), ('OriginalUpAxis', 1),
+                            ('OriginalUpAxisSign', 1)):
+            properties.add_p(name, 'int', 'Integer', '', value)
+        unit_scale = 100.0 if self.coord_service.settings['target-unit'] == 'm' else 1.0
+        properties.add_p('UnitScaleFactor', 'double', 'Number', '', unit_scale)
+        properties.add_p('OriginalUnitScaleFactor', 'double', 'Number', '', unit_scale)
+        properties.add_p('AmbientColor', 'ColorRGB', 'Color', '', 0.0, 0.0, 0.0)
+        properties.add_p('DefaultCamera', 'KString', '', '', 'Producer Perspective')
+        properties.add_p('TimeMode', 'enum', '', '', 11)
+        properties.add_p('TimeSpanStart', 'KTime', 'Time', '', Int64(0))
+        properties.add_p('TimeSpanStop', 'KTime', 'Time', '', Int64(46186158000))
+        properties.add_p('CustomFrameRate', 'double', 'Number', '', -1.0)
+
+        documents = document.add('Documents')
+        documents.add('Count', 1)
+        scene = documents.add('Document', self._new_id_(), '', 'Scene')
+        scene_properties = scene.add('Properties70')
+        scene_properties.add_p('SourceObject', 'object', '', '')
+        scene_properties.add_p('ActiveAnimStackName', 'KString', '', '', '')
+        scene.add('RootNode', Int64(0))
+
+        document.add('References')
+
+    def _add_definitions_(self, document: FbxDocument):
+        definitions = document.add('Definitions')
+        definitions.add('Version', 100)
+        definitions.add('Count', 1 + sum(self._object_counts.values()))
+        definitions.add('ObjectType', 'GlobalSettings').add('Count', 1)
+        for object_type, count in self._object_counts.items():
+            definitions.add('ObjectType', object_type).add('Count', count)
+
+    def _node_transforms_(self, table, indices):
+
+        transforms = NodeTransforms(table, indices)
+        for index, e in transforms.errors:
+            self.errors.append('could not read node properties of {}: {}'.format(table.names[index], e))
+        return transforms.locations(self.coord_service.transform_points), transforms.rotations(quaternions_to_euler)
+
+    def _add_model_(self, node: Mdb.Node, name: str, translation, rotation) -> Int64:
+
+        model_id = self._new_id_()
+
+        geometry_id = None
+        if node.node_type in {Mdb.NodeType.trimesh, Mdb.NodeType.skin}:
+            geometry_id = self._add_geometry_(node, name)
+            if geometry_id is not None:
+                self._connect_(geometry_id, model_id)
+                material_id = self._add_material_(node)
+                if material_id is not None:
+                    self._connect_(material_id, model_id)
+
+        model = self._add_object_('Model', model_id, object_name(name, 'Model'),
+                                  'Null' if geometry_id is None else 'Mesh')
+        model.add('Version', 232)
+        properties = model.add('Properties70')
+        if translation is not None:
+            properties.add_p('Lcl Translation', 'Lcl Translation', '', 'A', *[float(v) for v in translation])
+        if rotation is not None:
+            properties.add_p('Lcl Rotation', 'Lcl Rotation', '', 'A', *[float(v) for v in rotation])
+        properties.add_p('DefaultAttributeIndex', 'int', 'Integer', '', 0)
+        properties.add_p('InheritType', 'enum', '', '', 1)
+        model.add('Shading', True)
+        model.add('Culling', 'CullingOff')
+
+        return model_id
+
+    def _add_geometry_(self, node: Mdb.Node, name: str):
+
+        trimesh = Trimesh(node.node_data, node)
+        if trimesh.vertex_count == 0 or trimesh.face_count == 0:
+            return None
+
+        geometry_id = self._new_id_()
+        geometry = self._add_object_('Geometry', geometry_id, object_name(name, 'Geometry'), 'Mesh')
+        geometry.add('Properties70')
+        geometry.add('GeometryVersion', 124)
+
+        geometry.add('Vertices', self.coord_service.transform_points(trimesh.vertices).reshape(-1))
+
+        # the last index of every polygon is stored as -(index + 1)
+        polygon_vertices = trimesh.faces.astype(numpy.int32)
+        polygon_vertices[:, 2] = -polygon_vertices[:, 2] - 1
+        geometry.add('PolygonVertexIndex', polygon_vertices.reshape(-1))
+
+        layer_elements = []
+
+        def add_layer_element(element_type: str, version: int, data_name: str, data: numpy.ndarray,
+                              typed_index: int = 0, element_name: str = ''):
+            element = geometry.add(element_type, typed_index)
+            element.add('Version', version)
+            element.add('Name', element_name)
+            element.add('MappingInformationType', 'ByVertice')
+            element.add('ReferenceInformationType', 'Direct')
+            element.add(data_name, numpy.ascontiguousarray(data, dtype=numpy.float64).reshape(-1))
+            layer_elements.append((element_type, typed_index))
+
+        for enabled, array_ptr, element_type, data_name, stream in (
+                (self.normals, trimesh.trimesh.normals, 'LayerElementNormal', 'Normals', 'normals'),
+                (self.binormals, trimesh.trimesh.binormals, 'LayerElementBinormal', 'Binormals', 'binormals'),
+                (self.tangents, trimesh.trimesh.tangents, 'LayerElementTangent', 'Tangents', 'tangents')):
+            if not enabled or array_ptr.size == 0:
+                continue
+            if array_ptr.size != trimesh.vertex_count:
+                self.errors.append('not exporting {} of {}, mesh has {} vertices but {} {}'.format(
+                    stream, name, trimesh.vertex_count, array_ptr.size, stream))
+                continue
+            add_layer_element(element_type, 101, data_name,
+                              self.coord_service.transform_directions(getattr(trimesh, stream)))
+
+        for i, (uv_set_name, uvs) in enumerate(trimesh.uv_sets.items()):
+            add_layer_element('LayerElementUV', 101, 'UV', flip_uvs(uvs) if self.flip_uvs else uvs, i, uv_set_name)
+
+        material = geometry.add('LayerElementMaterial', 0)
+        material.add('Version', 101)
+        material.add('Name', '')
+        material.add('MappingInformationType', 'AllSame')
+        material.add('ReferenceInformationType', 'IndexToDirect')
+        material.add('Materials', numpy.zeros(1, dtype=numpy.int32))
+        layer_elements.append(('LayerElementMaterial', 0))
+
+        # every layer holds one element of each type, the uv sets after the first go to layers 1, 2...
+        layers = {}
+        for element_type, typed_index in layer_elements:
+            layers.setdefault(typed_index, []).append((element_type, typed_index))
+        for layer_index in sorted(layers):
+            layer = geometry.add('Layer', layer_index)
+            layer.add('Version', 100)
+            for element_type, typed_index in layers[layer_index]:
+                layer_element = layer.add('LayerElement')
+                layer_element.add('Type', element_type)
+                layer_element.add('TypedIndex', typed_index)
+
+        self.meshes.append((node, trimesh))
+        return geometry_id
+
+    def _add_material_(self, node: Mdb.Node):
+
+        try:
+            material = node_material(node, self.material_of)
+        except Exception as e:
+            self.errors.append('could not read material of {}: {}'.format(node.node_name.string, e))
+            return None
+        if material is None:
+            return None
+
+        if self.on_material is not None:
+            self.on_material(material)
+        self.materials.append((node, material))
+
+        key = str(material)
+        if key in self._material_ids:
+            return self._material_ids[key]
+
+        material_id = self._new_id_()
+        name = material.shader if len(material.shader) > 0 else node.node_name.string
+        fbx_material = self._add_object_('Material', material_id, object_name(name, 'Material'), '')
+        fbx_material.add('Version', 102)
+        fbx_material.add('ShadingModel', 'phong')
+        fbx_material.add('MultiLayer', 0)
+        properties = fbx_material.add('Properties70')
+        properties.add_p('DiffuseColor', 'Color', '', 'A', 0.8, 0.8, 0.8)
+
+        if self.texture_path is not None:
+            diffuse, normal_map = material.bound_texture_names()
+            for texture_name, material_property in ((diffuse, 'DiffuseColor'), (normal_map, 'NormalMap')):
+                path = None if texture_name is None else self.texture_path(texture_name)
+                if path is not None:
+                    self._connect_(self._add_texture_(texture_name, path), material_id, material_property)
+
+        self._material_ids[key] = material_id
+        return material_id
+
+    def _add_texture_(self, texture_name: str, path: str) -> Int64:
+
+        if path in self._texture_ids:
+            return self._texture_ids[path]
+
+        video_id = self._new_id_()
+        video = self._add_object_('Video', video_id, object_name(texture_name, 'Video'), 'Clip')
+        video.add('Type', 'Clip')
+        video.add('Properties70').add_p('Path', 'KString', 'XRefUrl', '', path)
+        video.add('UseMipMap', 0)
+        video.add('Filename', path)
+        video.add('RelativeFilename', path)
+
+        texture_id = self._new_id_()
+        texture = self._add_object_('Texture', texture_id, object_name(texture_name, 'Texture'), '')
+        texture.add('Type', 'TextureVideoClip')
+        texture.add('Version', 202)
+        texture.add('TextureName', object_name(texture_name, 'Texture'))
+        texture.add('Properties70').add_p('UseMaterial', 'bool', '', '', 1)
+        texture.add('Media', object_name(texture_name, 'Video'))
+        texture.add('FileName', path)
+        texture.add('RelativeFilename', path)
+        texture.add('ModelUVTranslation', 0.0, 0.0)
+        texture.add('ModelUVScaling', 1.0, 1.0)
+        texture.add('Texture_Alpha_Source', 'None')
+        texture.add('Cropping', 0, 0, 0, 0)
+
+        self._connect_(video_id, texture_id)
+        self._texture_ids[path] = texture_id
+        return texture_id
+
+
+if __name__ == '__main__':
+    args = sys.argv
+
+    if len(args) < 3:
+        print('usage: fbxbinary <mdb file> <fbx file>')
+        sys.exit(1)
+
+    from .mdbio import open_mdb
+
+    builder = MdbFbxBuilder(CoordinateSystemService(), texture_path=lambda texture_name: texture_name + '.png')
+    builder.build(open_mdb(args[1])).write(args[2])
+    for error in builder.errors:
+        print(error)
@@ -0,0 +1,126 @@
+import fbx
+import numpy
+import time
+
+'''
+bulk construction of fbx meshes from numpy arrays
+
+all per-element work that does not need the sdk (coordinate transform, uv flip, index conversion) is done on whole
+arrays beforehand, the sdk is then fed from flat python lists with its methods bound once, so filling a mesh costs
+only the sdk calls that have no bulk equivalent in the python bindings:
+    control points: 2 calls per vertex (FbxVector4, SetControlPointAt)
+    polygons:       5 calls per triangle (BeginPolygon, 3x AddPolygon, EndPolygon), storage is reserved up front
+    uvs:            2 calls per uv (FbxVector2, Add), the direct array is reserved up front
+    vertex streams: 2 calls per vector (FbxVector4, Add) for normals, tangents and binormals, same as uvs
+'''
+
+
+class FbxMeshBuilder:
+
+    """
+    fills an fbx mesh from pre-transformed arrays; timings holds the seconds spent per stage
+    (control_points, polygons, uvs, vertex_streams), accumulated over all meshes built with this builder
+    """
+
+    STAGES = ('control_points', 'polygons', 'uvs', 'vertex_streams')
+
+    NORMALS = 'normals'
+    TANGENTS = 'tangents'
+    BINORMALS = 'binormals'
+
+    def __init__(self):
+        self.timings = {stage: 0.0 for stage in self.STAGES}
+
+    def build(self, fbx_mesh: fbx.FbxMesh, control_points: numpy.ndarray, faces: numpy.ndarray, uv_sets: dict,
+              vertex_streams: dict = None):
+        """
+        :param control_points: (N, 3) positions in the target coordinate system
+        :param faces: (M, 3) vertex indices
+        :param uv_sets: uv set name -> (N, 2) uvs, already flipped if needed
+        :param vertex_streams: NORMALS, TANGENTS or BINORMALS -> (N, 3) unit vectors in the target coordinate system
+        """
+        self.set_control_points(fbx_mesh, control_points)
+        self.set_polygons(fbx_mesh, faces)
+        for uv_set_name, uvs in uv_sets.items():
+            self.add_uv_set(fbx_mesh, uv_set_name, uvs)
+        for stream, vectors in (vertex_streams or {}).items():
+            self.add_vertex_stream(fbx_mesh, stream, vectors)
+
+    def set_control_points(self, fbx_mesh: fbx.FbxMesh, control_points: numpy.ndarray):
+
+        start = time.perf_counter()
+
+        vector4 = fbx.FbxVector4
+        set_control_point = fbx_mesh.SetControlPointAt
+
+        fbx_mesh.InitControlPoints(len(control_points))
+        for i, (x, y, z) in enumerate(numpy.asarray(control_points, dtype=numpy.float64).tolist()):
+            set_control_point(vector4(x, y, z, 0.0), i)
+
+        self.timings['control_points'] += time.perf_counter() - start
+
+    def set_polygons(self, fbx_mesh: fbx.FbxMesh, faces: numpy.ndarray):
+
+        start = time.perf_counter()
+
+        faces = numpy.asarray(faces, dtype=numpy.int64)
+        if hasattr(fbx_mesh, 'ReservePolygonCount'):
+            fbx_mesh.ReservePolygonCount(len(faces))
+            fbx_mesh.ReservePolygonVertexCount(faces.size)
+
+        begin_polygon = fbx_mesh.BeginPolygon
+        add_polygon = fbx_mesh.AddPolygon
+        end_polygon = fbx_mesh.EndPolygon
+        for a, b, c in faces.tolist():
+            begin_polygon()
+            add_polygon(a)
+            add_polygon(b)
+            add_polygon(c)
+            end_polygon()
+
+        self.timings['polygons'] += time.perf_counter() - start
+
+    def add_uv_set(self, fbx_mesh: fbx.FbxMesh, uv_set_name: str, uvs: numpy.ndarray):
+
+        start = time.perf_counter()
+
+        uv_element: fbx.FbxLayerElementUV = fbx_mesh.CreateElementUV(uv_set_name)
+        uv_element.SetMappingMode(fbx.FbxLayerElementUV.eByControlPoint)
+        uv_element.SetReferenceMode(fbx.FbxLayerElement.eDirect)
+
+        direct_array = uv_element.GetDirectArray()
+        if hasattr(direct_array, 'Reserve'):
+            direct_array.Reserve(len(uvs))
+
+        vector2 = fbx.FbxVector2
+        add = direct_array.Add
+        for u, v in numpy.asarray(uvs, dtype=numpy.float64).tolist():
+            add(vector2(u, v))
+
+        self.timings['uvs'] += time.perf_counter() - start
+
+    def add_vertex_stream(self, fbx_mesh: fbx.FbxMesh, stream: str, vectors: numpy.ndarray):
+
+        start = time.perf_counter()
+
+        if stream == self.NORMALS:
+            element = fbx_mesh.CreateElementNormal()
+        elif stream == self.TANGENTS:
+            element = fbx_mesh.CreateElementTangent()
+        elif stream == self.BINORMALS:
+            element = fbx_mesh.CreateElementBinormal()
+        else:
+            raise Exception("unknown vertex stream '{}'".format(stream))
+        element.SetMappingMode(fbx.FbxLayerElement.eByControlPoint)
+        element.SetReferenceMode(fbx.FbxLayerElement.eDirect)
+
+        direct_array = element.GetDirectArray()
+        if hasattr(direct_array, 'Reserve'):
+            direct_array.Reserve(len(vectors))
+
+        vector4 = fbx.FbxVector4
+        add = direct_array.Add
+        for x, y, z in numpy.asarray(vectors, dtype=numpy.float64).tolist():
+            add(vector4(x, y, z, 0.0))
+
+        self.timings['vertex_streams'] += time.perf_counter() - start
@@ -0,0 +1,109 @@
+import errno
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+'''
+placing an existing file at a new path without reading it into python, cheapest method first:
+
+    hardlink         a second name for the same inode, metadata only (same file system)
+    symlink          a link to the path of the file (only if asked for, the file must stay where it is)
+    reflink          a copy-on-write clone of the extents (btrfs, xfs, ...), metadata only (same file system)
+    copy_file_range  an in-kernel copy, no user space buffers (linux)
+    copy             a buffered copy, works everywhere
+
+a method that is not supported between the two paths fails fast and the next one is tried
+'''
+
+HARDLINK = 'hardlink'
+SYMLINK = 'symlink'
+REFLINK = 'reflink'
+COPY_FILE_RANGE = 'copy_file_range'
+BUFFERED_COPY = 'copy'
+
+# linux ioctl cloning all extents of one file into another (FICLONE from linux/fs.h)
+_FICLONE = 0x40049409
+
+_BUFFER_SIZE = 1024 * 1024
+
+# errors meaning a method is not available for these paths, anything else is a real failure
+_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EACCES, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EINVAL,
+                errno.ENOSYS, errno.EMLINK, errno.ENOTTY, errno.EBADF}
+
+
+def _reflink(source, destination) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(destination.fileno(), _FICLONE, source.fileno())
+        return True
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            return False
+        raise
+
+
+def _copy_file_range(source, destination, size: int) -> bool:
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            count = os.copy_file_range(source.fileno(), destination.fileno(), size - copied)
+            if count == 0:
+                break
+            copied += count
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            # start over with the next method
+            destination.seek(0)
+            destination.truncate()
+            source.seek(0)
+            return False
+        raise
+    return copied == size
+
+
+def place_file(source_path: str, destination_path: str, hardlink: bool = True, symlink: bool = False) -> str:
+    """
+    makes destination_path (which must not exist) a copy of source_path
+
+    :param hardlink: False if the destination must be a file of its own (writing to a hardlink changes the source)
+    :param symlink: True to link to source_path (relative to the destination) if it can't be hardlinked
+    :return: the method that placed the file (HARDLINK, SYMLINK, REFLINK, COPY_FILE_RANGE or BUFFERED_COPY)
+    """
+
+    if hardlink:
+        try:
+            os.link(source_path, destination_path)
+            return HARDLINK
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+
+    if symlink:
+        try:
+            os.symlink(os.path.relpath(os.path.abspath(source_path),
+                                       os.path.dirname(os.path.abspath(destination_path))), destination_path)
+            return SYMLINK
+        except (OSError, NotImplementedError, ValueError) as e:  # ValueError: other drive (windows)
+            if isinstance(e, OSError) and e.errno not in _UNSUPPORTED:
+                raise
+
+    with open(source_path, 'rb') as source, open(destination_path, 'xb') as destination:
+        try:
+            if _reflink(source, destination):
+                return REFLINK
+            if _copy_file_range(source, destination, os.fstat(source.fileno()).st_size):
+                return COPY_FILE_RANGE
+            shutil.copyfileobj(source, destination, _BUFFER_SIZE)
+            return BUFFERED_COPY
+        except Exception:
+            # no partial copies
+            destination.close()
+            os.remove(destination_path)
+            raise
@@ -0,0 +1,357 @@
+from .mdb import Mdb
+from .mdbutil import node_table, Trimesh, NodeTransforms, node_material
+from .coordinates import CoordinateSystemService, flip_uvs
+import json
+import struct
+import sys
+import numpy
+
+'''
+gltf 2.0 binary (.glb) export, numpy only (no fbx sdk)
+
+GlbDocument collects the gltf json and the binary chunk; arrays are appended to the binary chunk as buffer views
+over their own memory (no per-element work, contiguous arrays are not even copied) and written out with a single
+writelines; MdbGltfBuilder fills a document with the node hierarchy, meshes (positions, normals, tangents, uv sets,
+indices) and materials with texture references of an mdb
+
+gltf positions are in meters with y up, uvs have their origin at the top left
+'''
+
+GLB_MAGIC = 0x46546C67
+GLB_VERSION = 2
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+COMPONENT_TYPES = {
+    numpy.dtype(numpy.float32): 5126,
+    numpy.dtype(numpy.uint32): 5125,
+    numpy.dtype(numpy.uint16): 5123
+}
+
+ACCESSOR_TYPES = {1: 'SCALAR', 2: 'VEC2', 3: 'VEC3', 4: 'VEC4'}
+
+_ALIGNMENT = 4
+
+
+class GlbDocument:
+
+    def __init__(self, generator: str = 'igni'):
+        self.gltf = {
+            'asset': {'version': '2.0', 'generator': generator},
+            'scene': 0,
+            'scenes': [{'nodes': []}],
+            'nodes': [],
+            'meshes': [],
+            'materials': [],
+            'textures': [],
+            'images': [],
+            'accessors': [],
+            'bufferViews': [],
+            'buffers': []
+        }
+        self._chunks = []
+        self._byte_length = 0
+        self._image_indices = {}
+
+    def add_accessor(self, array: numpy.ndarray, target: int = None, bounds: bool = False) -> int:
+        """
+        appends an (N,) or (N, C) array of float32, uint32 or uint16 as a buffer view with an accessor
+        :param bounds: write min and max (required for positions)
+        :return: accessor index
+        """
+
+        array = numpy.ascontiguousarray(array)
+        if array.dtype not in COMPONENT_TYPES:
+            raise Exception("can't store arrays of type {} in gltf".format(array.dtype))
+        if len(array) == 0:
+            raise Exception("can't store empty arrays in gltf")
+
+        padding = (-self._byte_length) % _ALIGNMENT
+        if padding > 0:
+            self._chunks.append(b'\x00' * padding)
+            self._byte_length += padding
+
+        buffer_view = {'buffer': 0, 'byteOffset': self._byte_length, 'byteLength': array.nbytes}
+        if target is not None:
+            buffer_view['target'] = target
+        self.gltf['bufferViews'].append(buffer_view)
+
+        self._chunks.append(memoryview(array).cast('B'))
+        self._byte_length += array.nbytes
+
+        accessor = {
+            'bufferView': len(self.gltf['bufferViews']) - 1,
+            'componentType': COMPONENT_TYPES[array.dtype],
+            'count': len(array),
+            'type': ACCESSOR_TYPES[1 if array.ndim == 1 else array.shape[1]]
+        }
+        if bounds:
+            accessor['min'] = numpy.atleast_1d(array.min(axis=0)).tolist()
+            accessor['max'] = numpy.atleast_1d(array.max(axis=0)).tolist()
+        self.gltf['accessors'].append(accessor)
+
+        return len(self.gltf['accessors']) - 1
+
+    def add_node(self, node: dict, parent: int = None) -> int:
+        """
+        :param parent: index of the parent node, None for a root node of the scene
+        :return: node index
+        """
+        self.gltf['nodes'].append(node)
+        index = len(self.gltf['nodes']) - 1
+        if parent is None:
+            self.gltf['scenes'][0]['nodes'].append(index)
+        else:
+            self.gltf['nodes'][parent].setdefault('children', []).append(index)
+        return index
+
+    def add_mesh(self, mesh: dict) -> int:
+        self.gltf['meshes'].append(mesh)
+        return len(self.gltf['meshes']) - 1
+
+    def add_material(self, material: dict) -> int:
+        self.gltf['materials'].append(material)
+        return len(self.gltf['materials']) - 1
+
+    def add_texture(self, uri: str) -> int:
+        """
+        a texture referencing an external image, images are shared by uri
+        :return: texture index
+        """
+        if uri not in self._image_indices:
+            self.gltf['images'].append({'uri': uri})
+            self._image_indices[uri] = len(self.gltf['images']) - 1
+        self.gltf['textures'].append({'source': self._image_indices[uri]})
+        return len(self.gltf['textures']) - 1
+
+    def to_json(self) -> bytes:
+        gltf = {key: value for key, value in self.gltf.items() if not (isinstance(value, list) and len(value) == 0)}
+        if self._byte_length > 0:
+            gltf['buffers'] = [{'byteLength': self._byte_length}]
+        data = json.dumps(gltf, separators=(',', ':')).encode('utf8')
+        return data + b' ' * ((-len(data)) % _ALIGNMENT)
+
+    def write(self, file_path: str):
+
+        json_chunk = self.to_json()
+        bin_padding = b'\x00' * ((-self._byte_length) % _ALIGNMENT)
+        bin_length = self._byte_length + len(bin_padding)
+
+        total_length = 12 + 8 + len(json_chunk) + (8 + bin_length if bin_length > 0 else 0)
+
+        with open(file_path, 'wb') as f:
+            f.write(struct.pack('<III', GLB_MAGIC, GLB_VERSION, total_length))
+            f.write(struct.pack('<II', len(json_chunk), GLB_CHUNK_JSON))
+            f.write(json_chunk)
+            if bin_length > 0:
+                f.write(struct.pack('<II', bin_length, GLB_CHUNK_BIN))
+                f.writelines(self._chunks)
+                f.write(bin_padding)
+
+
+def read_glb(file_path: str):
+    """
+    :return: (gltf json, binary chunk) of a glb file
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    magic, version, total_length = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC or version != GLB_VERSION or total_length != len(data):
+        raise Exception('{} is not a glb 2.0 file'.format(file_path))
+    json_length, _ = struct.unpack_from('<II', data, 12)
+    gltf = json.loads(data[20:20 + json_length])
+    binary = b''
+    if 20 + json_length < len(data):
+        bin_length, _ = struct.unpack_from('<II', data, 20 + json_length)
+        binary = data[28 + json_length:28 + json_length + bin_length]
+    return gltf, binary
+
+
+class MdbGltfBuilder:
+
+    """
+    converts the node tree, meshes and materials of an mdb into a GlbDocument
+
+    node locations, rotations and vertex data go through the coordinate system service; materials use the first
+    texture as base color and the first bumpmap as normal map, texture_uri maps a texture name to the uri written into
+    the file (None leaves the texture out), on_material is called with every non-empty material before it is written
+    (e.g. to read its material file), material_of replaces reading the material of a node (e.g.
+    ConversionContext.material_of, None for no material)
+
+    after build, nodes, meshes and materials list what was exported ((mdb node, Material) for materials), errors the
+    problems that did not stop the export
+    """
+
+    def __init__(self,
+                 coord_service: CoordinateSystemService,
+                 flip_uvs: bool = False,
+                 normals: bool = True,
+                 tangents: bool = True,
+                 skip_names_containing=(),
+                 texture_uri=None,
+                 on_material=None,
+                 material_of=None):
+
+        self.coord_service = coord_service
+        self.flip_uvs = flip_uvs
+        self.normals = normals
+        self.tangents = tangents
+        self.skip_names_containing = list(skip_names_containing)
+        self.texture_uri = texture_uri
+        self.on_material = on_material
+        self.material_of = material_of
+
+        self.nodes = []
+        self.meshes = []
+        self.materials = []
+        self.errors = []
+
+        self._material_indices = {}
+
+    def build(self, mdb: Mdb) -> GlbDocument:
+
+        document = GlbDocument()
+        table = node_table(mdb)
+        # skipped nodes are not read
+        translations, rotations = self._node_transforms_(table, table.kept_indices(self.skip_names_containing))
+
+        pending = [(child, None) for child in reversed(table.children_of(0))]
+        while len(pending) > 0:
+            index, parent = pending.pop()
+            node = table.nodes[index]
+
+            if any(word in table.names[index] for word in self.skip_names_containing):
+                continue  # with its children
+
+            gltf_node = {'name': table.names[index]}
+            if translations[index] is not None:
+                gltf_node['translation'] = translations[index]
+            if rotations[index] is not None:
+                gltf_node['rotation'] = rotations[index]
+
+            if node.node_type in {Mdb.NodeType.trimesh, Mdb.NodeType.skin}:
+                mesh = self._add_mesh_(document, node)
+                if mesh is not None:
+                    gltf_node['mesh'] = mesh
+
+            gltf_index = document.add_node(gltf_node, parent)
+            self.nodes.append(node)
+            pending.extend((child, gltf_index) for child in reversed(table.children_of(index)))
+
+        return document
+
+    def _node_transforms_(self, table, indices):
+
+        transforms = NodeTransforms(table, indices)
+        for index, e in transforms.errors:
+            self.errors.append('could not read node properties of {}: {}'.format(table.names[index], e))
+        return transforms.locations(self.coord_service.transform_points), transforms.rotations(self.coord_service.transform_quaternions)
+
+    def _add_mesh_(self, document: GlbDocument, node: Mdb.Node):
+
+        trimesh = Trimesh(node.node_data, node)
+        if trimesh.vertex_count == 0 or trimesh.face_count == 0:
+            return None
+
+        attributes = {
+            'POSITION': document.add_accessor(
+                self.coord_service.transform_points(trimesh.vertices).astype(numpy.float32), ARRAY_BUFFER, bounds=True)
+        }
+
+        normals = None
+        if self.normals and trimesh.trimesh.normals.size == trimesh.vertex_count:
+            normals = self.coord_service.transform_directions(trimesh.normals).astype(numpy.float32)
+            attributes['NORMAL'] = document.add_accessor(normals, ARRAY_BUFFER)
+
+        if normals is not None and self.tangents \
+                and trimesh.trimesh.tangents.size == trimesh.vertex_count \
+                and trimesh.trimesh.binormals.size == trimesh.vertex_count:
+            tangents = self.coord_service.transform_directions(trimesh.tangents)
+            binormals = self.coord_service.transform_directions(trimesh.binormals)
+            handedness = numpy.sign(numpy.einsum('ij,ij->i', numpy.cross(normals, tangents), binormals))
+            handedness[handedness == 0] = 1.0
+            attributes['TANGENT'] = document.add_accessor(
+                numpy.column_stack((tangents, handedness)).astype(numpy.float32), ARRAY_BUFFER)
+
+        for i, uvs in enumerate(trimesh.uv_sets.values()):
+            if self.flip_uvs:
+                uvs = flip_uvs(uvs)
+            attributes['TEXCOORD_{}'.format(i)] = document.add_accessor(uvs.astype(numpy.float32, copy=False),
+                                                                        ARRAY_BUFFER)
+
+        faces = trimesh.faces
+        if self.coord_service.flips_handedness:
+            faces = faces[:, ::-1]  # keep the winding counter-clockwise
+        if trimesh.vertex_count <= 0xFFFF:
+            faces = faces.astype(numpy.uint16)
+
+        primitive = {
+            'attributes': attributes,
+            'indices': document.add_accessor(faces.reshape(-1), ELEMENT_ARRAY_BUFFER)
+        }
+
+        material = self._add_material_(document, node)
+        if material is not None:
+            primitive['material'] = material
+
+        self.meshes.append((node, trimesh))
+        return document.add_mesh({'name': node.node_name.string, 'primitives': [primitive]})
+
+    def _add_material_(self, document: GlbDocument, node: Mdb.Node):
+
+        try:
+            material = node_material(node, self.material_of)
+        except Exception as e:
+            self.errors.append('could not read material of {}: {}'.format(node.node_name.string, e))
+            return None
+        if material is None:
+            return None
+
+        if self.on_material is not None:
+            self.on_material(material)
+        self.materials.append((node, material))
+
+        key = str(material)
+        if key in self._material_indices:
+            return self._material_indices[key]
+
+        gltf_material = {
+            'name': material.shader if len(material.shader) > 0 else node.node_name.string,
+            'pbrMetallicRoughness': {'metallicFactor': 0.0}
+        }
+
+        if self.texture_uri is not None:
+            base_color, normal_map = material.bound_texture_names()
+            for texture_name, slot in ((base_color, 'baseColorTexture'), (normal_map, 'normalTexture')):
+                uri = None if texture_name is None else self.texture_uri(texture_name)
+                if uri is None:
+                    continue
+                texture = {'index': document.add_texture(uri)}
+                if slot == 'baseColorTexture':
+                    gltf_material['pbrMetallicRoughness'][slot] = texture
+                else:
+                    gltf_material[slot] = texture
+
+        index = document.add_material(gltf_material)
+        self._material_indices[key] = index
+        return index
+
+
+if __name__ == '__main__':
+    args = sys.argv
+
+    if len(args) < 3:
+        print('usage: gltf <mdb file> <glb file>')
+        sys.exit(1)
+
+    from .mdbio import open_mdb
+    from .settings import Settings
+
+    builder = MdbGltfBuilder(CoordinateSystemService(Settings({'target-unit': 'm'})),
+                             texture_uri=lambda texture_name: texture_name + '.png')
+    builder.build(open_mdb(args[1])).write(args[2])
+    for error in builder.errors:
+        print(error)
@@ -3,7 +3,6 @@ import logging
 from logging.handlers import QueueHandler
 from .settings import Settings
 import sqlite3
-import pandas
 import time
 
 
@@ -85,6 +84,7 @@ class DatabaseHandler(logging.Handler):
         self.log_data.append(entry)
 
         if 'APPLICATION_SHUTDOWN' in entry['message']:
+            import pandas
             pandas.DataFrame(self.log_data).to_sql(self.table_name, self.connection, if_exists='append', index=False)
             self.log_data = []
 
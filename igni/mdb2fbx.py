@@ -1,366 +1,47 @@
 from .mdb import Mdb
+from .sharedmodel import SharedModelDescriptor, detach_shared_model, publish_model, release_shared_model
+from .coordinates import CoordinateSystemService, flip_uvs, quaternions_to_euler
+from .gltf import GlbDocument, MdbGltfBuilder
+from .fbxbinary import FbxDocument, MdbFbxBuilder
+from .conversion import ConversionContext
+from .textures import TextureLocatorService, ResourceManagerTextureLocatorService, FileSystemTextureLocatorService, \
+    TextureConversionResult, MaterialExportHandler, TextureConverterJob, TextureBatchJob, material_export_handler, \
+    texture_batches, texture_encoder_options
+from .textureio import PNG_FILTERS
 import os
-import fbx
 import sys
 from .settings import Settings
 from .resources import Directory, File, Resource, ResourceTypes, ResourceManager
-from .mdbutil import MdbWrapper, Material, Trimesh, NodeProperties
-from scipy.spatial.transform import Rotation
-from .app import IgniApplicationEntity, Application
-import pandas
+from .mdbutil import Material, Trimesh, NodeTable, NodeTransforms, node_table
+from .app import IgniApplicationEntity, Application, picklable
 
-try:
-    from wand import image
-except Exception as e:
-    '''
-    LOGGER.error('could not import "image" from "wand", please, check wand installation, error message: {}'.format(str(e)))
-    '''
-    image = None
+'''
+the fbx sdk (and the sdk mesh builder, fbxmesh.py) are imported by the first sdk export, scipy by the first rotation
+conversion, so the sdk-free backends and the texture tasks run in processes that never load them
+'''
 
-MEMORY_MANAGER = fbx.FbxManager.Create()
+_MEMORY_MANAGER = None
 
 
-class OnModuleClose:
-
-    def __del__(self):
-        MEMORY_MANAGER.Destroy()
-
-
-MODULE_CLOSE_INTERCEPTOR = OnModuleClose()
-
-
-# annotation
-def picklable(fun):
-    return fun
-
-
-class CoordinateSystemService:
-
-    COORDINATE_SYSTEM_SETTINGS_DEFAULT_SETTINGS = Settings({
-        'source-unit': 'm',
-        'target-unit': 'cm',
-        'coordinate-system-mapping': {
-            'x': 'y',
-            'y': 'z',
-            'z': 'x'
-        }
-    })
-
-    COORDINATE_SYSTEM_SETTINGS_TEMPLATE = Settings({
-        'source-unit': {'m', 'cm'},
-        'target-unit': {'m', 'cm'},
-        'coordinate-system-mapping': {
-            'x': {'y', '-y', 'x', '-x', 'z', '-z'},
-            'y': {'y', '-y', 'x', '-x', 'z', '-z'},
-            'z': {'y', '-y', 'x', '-x', 'z', '-z'}
-        }
-    })
-
-    MEASUREMENT_UNIT_TO_CM = {
-        'm': 100.0,
-        'cm': 1.0
-    }
-
-    def __init__(self, settings: Settings = Settings()):
-        self.settings = self.COORDINATE_SYSTEM_SETTINGS_DEFAULT_SETTINGS
-        self.settings.read_dict(settings).using_type_hint(self.COORDINATE_SYSTEM_SETTINGS_TEMPLATE)
-
-        self.multiplication_factor = self.MEASUREMENT_UNIT_TO_CM[self.settings['source-unit']] / \
-                                     self.MEASUREMENT_UNIT_TO_CM[self.settings['target-unit']]
-
-        self.coord_mapping = [(0, 1.0), (1, 1.0),
-                              (2, 1.0)]  # meaning: for zeroth index take zeroth member of input and multiply by 1.0
-        self.coord_names = {'x': 0, 'y': 1, 'z': 2}
-
-        for from_axis, to_axis in self.settings['coordinate-system-mapping'].items():
-            negation_factor = 1.0
-            if to_axis.startswith('-'):
-                negation_factor = -1.0
-            self.coord_mapping[self.coord_names[from_axis]] = (
-                self.coord_names[to_axis.replace('-', '')], negation_factor)
-
-    def location(self, vector_xyz):
-        if len(vector_xyz) != 3:
-            raise Exception('illegal argument {} supplied'.format(vector_xyz))
-        return (vector_xyz[self.coord_mapping[0][0]] * self.coord_mapping[0][1] * self.multiplication_factor,
-                vector_xyz[self.coord_mapping[1][0]] * self.coord_mapping[1][1] * self.multiplication_factor,
-                vector_xyz[self.coord_mapping[2][0]] * self.coord_mapping[2][1] * self.multiplication_factor)
-
-    def rotation(self, vector_xyz):
-        if len(vector_xyz) != 3:
-            raise Exception('illegal argument {} supplied'.format(vector_xyz))
-        return (vector_xyz[self.coord_mapping[0][0]],
-                vector_xyz[self.coord_mapping[1][0]],
-                vector_xyz[self.coord_mapping[2][0]])
-
-    def __str__(self):
-        return str(self.coord_mapping)
-
-
-class TextureLocatorService(IgniApplicationEntity):
-
-    def locate(self, texture_name: str):
-        raise Exception('not implemented')
-
-
-class ResourceManagerTextureLocatorService(TextureLocatorService):
-
-    POSSIBLE_TEXTURE_EXTENSIONS = [
-        'bmp',
-        'dds',
-        'ico',
-        'jpg',
-        'txi'
-    ]
-
-    def __init__(self):
-
-        super().__init__()
-
-    @staticmethod
-    def __likely_has_suffix__(texture_name):
-        if len(texture_name) < 2:
-            return False
-        return texture_name[-2] == '_'
-
-    @staticmethod
-    def __without_suffix__(texture_name):
-        if len(texture_name) < 2:
-            return texture_name
-        else:
-            return texture_name[0:-2]
-
-    def __locate__(self, texture_name: str, candidates: list):
-        if len(candidates) == 0:
-            return None
-
-        qualifying = [file for file in candidates if file.extension in self.POSSIBLE_TEXTURE_EXTENSIONS]
-        if len(qualifying) == 0:
-            return None
-        elif len(qualifying) > 1:
-            self.logger.warning('more than one qualifying texture found for texture name {}'.format(texture_name))
-            return qualifying[0]
-        else:
-            return qualifying[0]
-
-    def locate(self, texture_name: str):
-
-        attempted_names = []
-        result = None
-
-        names_to_attempt = [texture_name, texture_name.lower()]
-        if self.__likely_has_suffix__(texture_name):
-            names_to_attempt.append(self.__without_suffix__(texture_name))
-            names_to_attempt.append(self.__without_suffix__(texture_name).lower())
-
-        for name_to_attempt in names_to_attempt:
-            attempted_names.append(name_to_attempt)
-            result = self.__locate__(name_to_attempt, Application().resource_manager.get_by_file_name(name_to_attempt))
-            if result is not None:
-                break
-
-        if result is not None:
-            self.logger.debug('located texture with name {}, attempted names: {}'.format(texture_name, attempted_names))
-        else:
-            self.logger.error('could not locate texture with name {}, attempted names: {}'.format(texture_name, attempted_names))
-
-        return result
-
-
-class FileSystemTextureLocatorService(TextureLocatorService):
-
+def memory_manager():
     """
-    this class locates a texture by its name by means of searching specific folders in game contents
+    the fbx sdk memory manager of this process, created on first use
     """
+    global _MEMORY_MANAGER
+    if _MEMORY_MANAGER is None:
+        import fbx
+        _MEMORY_MANAGER = fbx.FbxManager.Create()
+    return _MEMORY_MANAGER
 
-    TEXTURE_EXTENSIONS = [
-        'dds',
-        'txi'
-    ]
-
-    def __init__(self, mdb_location: Directory):
-        self.resource_location_directory = mdb_location
-
-    @classmethod
-    def locate_texture(cls, directory: Directory, texture_name: str):
-        for extension in cls.TEXTURE_EXTENSIONS:
-            paths_to_check = [
-                os.path.join(directory.full_path, texture_name + '.' + extension),
-                os.path.join(directory.full_path, texture_name.lower() + '.' + extension)  # also check lower case
-            ]
-
-            for path in paths_to_check:
-                if os.path.exists(path):
-                    return File(path)
-        return None
-
-    def locate(self, texture_name: str):  # TODO
-
-        check_folders = [self.resource_location_directory] + \
-                        [subdir for subdir in self.resource_location_directory.parent.subdirectories
-                         if 'textures' in subdir.name] + \
-                        [subdir for subdir in self.resource_location_directory.parent.subdirectories
-                         if 'textures' not in subdir.name]
-
-        for folder in check_folders:
-            texture = self.locate_texture(folder, texture_name)
-            if texture is not None:
-                break
-
-        return texture
-
-
-@picklable
-class TextureConversionResult:
-
-    def __init__(self, converted_texture_path: str):
-
-        self.converted_texture_file = None
-
-        try:
-            self.converted_texture_file = File(converted_texture_path)
-        except Exception:
-            pass
-
-    def successful(self):
-        return self.converted_texture_file is not None
-
-
-class MaterialExportHandler(IgniApplicationEntity):
-
-    def __init__(self,
-                 texture_locator_service: TextureLocatorService):
-        super().__init__()
-
-        self.texture_locator_service = texture_locator_service
-        self.handled_texture_names = set()
-
-    def handle(self,
-               material: Material,
-               source_file: str,
-               target_destination: Directory,
-               target_format: str):
-
-        self.logger.extra['source_mdb'] = source_file
-        self.logger.extra['node'] = material.host_node.node_name.string
-
-        if len(material.material_file_pointer) > 0:
-            material_resource = Application().resource_manager.get(material.material_file_pointer,
-                                                                   ResourceTypes.MAT)
-            if material_resource is None:
-                self.logger.error('material is pointing to a material file {} but could locate none'.format(
-                            material.material_file_pointer))
-            else:
-                self.logger.debug('reading from material file {}'.format(material.material_file_pointer))
-                material.read_material_file(material_resource.file)
-
-        self.send_texture_export_tasks(material,
-                                       target_destination,
-                                       target_format)
-
-    def send_texture_export_tasks(self,
-                                  material: Material,
-                                  target_destination: Directory,
-                                  target_format: str):
-        for texture_name in material.get_all_texture_names():
-
-            if texture_name in self.handled_texture_names:
-                continue
-            else:
-                self.handled_texture_names.add(texture_name)
-
-            texture_file = self.texture_locator_service.locate(texture_name)
-            if texture_file is None:
-                continue
-
-            Application().submit_task(
-                TextureConverterJob().
-                    input(texture_file).
-                    target_fname(texture_name).
-                    target_format(target_format).
-                    target_dir(target_destination).
-                    execution_id('texture_export_' + texture_name)
-            )
-
-
-@picklable
-class TextureConverterJob(IgniApplicationEntity):
-
-    """
-    this class handles the logic of conversion of textures from arbitrary formats into arbitrary formats
-    """
-
-    def __init__(self):
-
-        super().__init__()
-
-        if image is None:
-            self.logger.error('could not create texture converter instance because wand is not properly installed')
-            self.invalid = True
-            return
-
-        self.input_ = None
-        self.target_location_: Directory = None
-        self.target_fname_ = ''
-        self.target_format_ = ''
-        self.invalid = False
-
-    def input(self, input_path):
-        if isinstance(input_path, Resource):
-            inp = input_path.file.full_path
-        elif isinstance(input_path, File):
-            inp = input_path.full_path
-        self.input_ = inp
-        return self
-
-    def target_dir(self, location: Directory):
-        self.target_location_ = location
-        return self
-
-    def target_fname(self, fname):
-        self.target_fname_ = fname
-        return self
 
-    def target_format(self, format_: str):
-        self.target_format_ = format_
-        return self
-
-    def __call__(self):
-        self.run()
-
-    def run(self):
-
-        if self.input is None or self.target_location_ is None \
-                or self.target_fname_ is None or len(self.target_fname_) == 0\
-                or self.target_format_ is None or len(self.target_format_) == 0:
-            self.logger.error("can't execute texture conversion job with incomplete description")
-            self.invalid = True
-
-        if self.invalid:
-            return
-
-        try:
-            self.input_ = image.Image(filename=self.input_)
-        except Exception as e:
-            '''
-            self.logger.error('could not load input image "{}", error message: {}'.format(inp, e))
-            '''
-            self.invalid = True
-
-        output_path = os.path.join(self.target_location_.full_path, self.target_fname_ + '.' + self.target_format_)
-
-        # only if not already exists...
-        if not File.exists(output_path):
-            try:
-                self.input_.save(filename=output_path)
-            except Exception as e:
-                self.logger.error('could not write image: {}'.format(e))
-                pass
+class OnModuleClose:
 
-        return TextureConversionResult(output_path)
+    def __del__(self):
+        if _MEMORY_MANAGER is not None:
+            _MEMORY_MANAGER.Destroy()
 
 
-material_export_handler = MaterialExportHandler(ResourceManagerTextureLocatorService())
+MODULE_CLOSE_INTERCEPTOR = OnModuleClose()
 
 
 @picklable
@@ -372,27 +53,69 @@ class FbxFileExportJob(IgniApplicationEntity):
 
     MDB_2_FBX_CONVERTER_SETTINGS_TEMPLATE = Settings({
         'texture-conversion': {
-            'format': {'png', 'jpg', 'leave-as-is'}
+            'format': {'png', 'jpg', 'leave-as-is'},
+            'batch-size': int,
+            'threads': int,
+            'deduplicate': bool,
+            'png': {
+                'compression-level': int,
+                'filter': set(PNG_FILTERS)
+            },
+            'jpg': {
+                'quality': int
+            }
         },
         'skip-nodes': {
             'if-name-contains': list,
             'of-type': list
         },
+        'output-format': {'fbx', 'glb'},
+        'fbx-writer': {
+            'backend': {'sdk', 'native'},
+            'compression-threads': int,
+            'compression-level': int
+        },
         'unit-conversion-factor': float,
         'flip-uvs': bool,
+        'vertex-streams': {
+            'normals': bool,
+            'tangents': bool,
+            'binormals': bool
+        },
         'repository-path': str,
         'coordinate-system': CoordinateSystemService.COORDINATE_SYSTEM_SETTINGS_TEMPLATE
     })
 
     MDB_2_FBX_CONVERTER_DEFAULT_SETTINGS = Settings({
         'texture-conversion': {
-            'format': 'png'
+            'format': 'png',
+            'batch-size': 64,
+            'threads': 4,
+            'deduplicate': True,
+            'png': {
+                'compression-level': 6,
+                'filter': 'up'
+            },
+            'jpg': {
+                'quality': 90
+            }
         },
         'skip-nodes': {
             'if-name-contains': ['shadow', 'Shadow']
         },
+        'output-format': 'fbx',
+        'fbx-writer': {
+            'backend': 'sdk',
+            'compression-threads': 4,
+            'compression-level': 1
+        },
         'unit-conversion-factor': 100.0,
         'flip-uvs': True,
+        'vertex-streams': {
+            'normals': True,
+            'tangents': True,
+            'binormals': True
+        },
         'coordinate-system': CoordinateSystemService.COORDINATE_SYSTEM_SETTINGS_DEFAULT_SETTINGS
     })
 
@@ -400,7 +123,8 @@ class FbxFileExportJob(IgniApplicationEntity):
                  source: Resource,
                  destination: Directory,  # can be None if no export intended
                  texture_destination: Directory,  # can be None if no export intended
-                 settings: Settings = Settings()):
+                 settings: Settings = Settings(),
+                 context: ConversionContext = None):  # shared with the dispatcher, one of its own if None
 
         super().__init__()
 
@@ -411,7 +135,8 @@ class FbxFileExportJob(IgniApplicationEntity):
         self.texture_output_destination: Directory = texture_destination
         self.settings: Settings = self.MDB_2_FBX_CONVERTER_DEFAULT_SETTINGS.read_dict(settings).using_type_hint(self.MDB_2_FBX_CONVERTER_SETTINGS_TEMPLATE)
         self.texture_export_jobs = []
-        self.context = None
+        self.context: ConversionContext = context if context is not None else ConversionContext(source)
+        self.shared_model = None
 
         self.file_meta = {
             'file': self.source.file.name,
@@ -428,14 +153,15 @@ class FbxFileExportJob(IgniApplicationEntity):
         self.logging_context = {}
 
         self.coord_service = CoordinateSystemService(self.settings['coordinate-system'])
+        self.mesh_builder = None  # fbxmesh.FbxMeshBuilder, created by the first sdk export
 
     def debug_log_trimesh(self, trimesh: Trimesh):
 
-        nvert = len(trimesh.vertices)
-        nfaces = len(trimesh.faces)
-        nnorms = len(trimesh.normals)
-        nbinorms = len(trimesh.binormals)
-        ntangents = len(trimesh.tangents)
+        nvert = trimesh.vertex_count
+        nfaces = trimesh.face_count
+        nnorms = trimesh.trimesh.normals.size
+        nbinorms = trimesh.trimesh.binormals.size
+        ntangents = trimesh.trimesh.tangents.size
 
         self.logger.debug("mesh has {} vertices, {} faces, {} normals, {} binormals, {} tangents"
                           .format(nvert, nfaces, nnorms, nbinorms, ntangents))
@@ -443,76 +169,88 @@ class FbxFileExportJob(IgniApplicationEntity):
         if nvert != nnorms:
             self.logger.warn("number of vertices not equal to number of normals in the mesh")
 
-    def _quaternion_to_euler_and_log_(self, quat: tuple):
-
-        rotation = Rotation.from_quat(quat)
-        self.logger.debug('converting from input quaternion {}'.format(quat))
+    def _read_node_transforms_(self, table: NodeTable, indices: list) -> list:
+        """
+        reads the node properties of the nodes at indices, converts their static locations and their rotations to
+        euler angles at once
+        :return: (node properties, location, euler rotation) for every node, None where a node has no value or is
+        not one of indices
+        """
 
-        rotation = rotation.as_euler('yzx', degrees=True)
-        self.logger.debug('converted to euler: {}'.format(rotation.tolist()))
+        transforms = NodeTransforms(table, indices)
+        for index, e in transforms.errors:
+            self.logger.extra = {'source_mdb': self.source.file.name, 'node': table.names[index]}
+            self.logger.error('could not read node properties: {}'.format(e))
 
-        return rotation.tolist()
+        return list(zip(transforms.properties,
+                        transforms.locations(self.coord_service.transform_points),
+                        transforms.rotations(quaternions_to_euler)))
 
-    def _build_fbx_mesh(self, fbx_mesh: fbx.FbxMesh, trimesh: Trimesh):
+    def _build_fbx_mesh(self, fbx_mesh: 'fbx.FbxMesh', trimesh: Trimesh):
 
         self.file_meta['mesh_count'] += 1
-        self.file_meta['tri_count'] += len(trimesh.faces)
+        self.file_meta['tri_count'] += trimesh.face_count
 
         # -- check input parameters
         self.debug_log_trimesh(trimesh)
 
         # -- build mesh data
-        fbx_mesh.InitControlPoints(len(trimesh.vertices))
-        for i in range(0, len(trimesh.vertices)):
-            vertex = self.coord_service.location(trimesh.vertices[i])
-            fbx_mesh.SetControlPointAt(fbx.FbxVector4(vertex[0], vertex[1], vertex[2], 0.0), i)
-
-        for i in range(len(trimesh.faces)):
-            face = trimesh.faces[i]
-            fbx_mesh.BeginPolygon()
-            for vertex_index in face:
-                fbx_mesh.AddPolygon(vertex_index)
-            fbx_mesh.EndPolygon()
-
-        for uv_set_name in trimesh.uv_sets:
-            uv_element: fbx.FbxLayerElementUV = fbx_mesh.CreateElementUV(uv_set_name)
-            uv_element.SetMappingMode(fbx.FbxLayerElementUV.eByControlPoint)
-            uv_element.SetReferenceMode(fbx.FbxLayerElement.eDirect)
-
-            for uv_coord in trimesh.uv_sets[uv_set_name]:
-                if self.settings['flip-uvs']:
-                    coords = (uv_coord[0], 1 - uv_coord[1])
-                else:
-                    coords = (uv_coord[0], uv_coord[1])
+        uv_sets = trimesh.uv_sets
+        if self.settings['flip-uvs']:
+            uv_sets = {uv_set_name: flip_uvs(uvs) for uv_set_name, uvs in uv_sets.items()}
 
-                uv_element.GetDirectArray().Add(fbx.FbxVector2(coords[0], coords[1]))
+        self.mesh_builder.build(fbx_mesh,
+                                self.coord_service.transform_points(trimesh.vertices),
+                                trimesh.faces,
+                                uv_sets,
+                                self._vertex_streams_(trimesh))
 
-    def _transfer_node_properties_(self, fbx_node: fbx.FbxNode, node_properties: NodeProperties):
+    def _vertex_streams_(self, trimesh: Trimesh) -> dict:
+        """
+        the normals, tangents and binormals of a mesh enabled in the settings, in the target coordinate system;
+        streams that are empty or don't match the vertex count are left out
+        """
+
+        from .fbxmesh import FbxMeshBuilder
+
+        streams = {}
+        for stream, array_ptr in ((FbxMeshBuilder.NORMALS, trimesh.trimesh.normals),
+                                  (FbxMeshBuilder.TANGENTS, trimesh.trimesh.tangents),
+                                  (FbxMeshBuilder.BINORMALS, trimesh.trimesh.binormals)):
+            if not self.settings['vertex-streams'][stream] or array_ptr.size == 0:
+                continue
+            if array_ptr.size != trimesh.vertex_count:
+                self.logger.warn('not exporting {}, mesh has {} vertices but {} {}'.format(
+                    stream, trimesh.vertex_count, array_ptr.size, stream))
+                continue
+            streams[stream] = self.coord_service.transform_directions(getattr(trimesh, stream))
+        return streams
+
+    def _transfer_node_properties_(self, fbx_node: 'fbx.FbxNode', node_transform: tuple):
+
+        import fbx
+
+        node_properties, location, rotation = node_transform
 
         if node_properties is None:
             self.logger.warn('received empty node properties')
             return
 
-        if node_properties.location is not None and (not node_properties.location.empty()):
-            location = self.coord_service.location(node_properties.location.value)
+        if location is not None:
             self.logger.debug('setting node location to {}'.format(location))
             fbx_node.LclTranslation.Set(fbx.FbxDouble3(location[0],
                                                        location[1],
                                                        location[2]))
 
-        if node_properties.rotation is not None and (not node_properties.rotation.empty()):
-            rotation = self._quaternion_to_euler_and_log_(node_properties.rotation.value)
+        if rotation is not None:
+            self.logger.debug('converted input quaternion {} to euler: {}'.format(node_properties.rotation.value,
+                                                                                 rotation))
             fbx_node.LclRotation.Set(fbx.FbxDouble3(rotation[0],
                                                     rotation[1],
                                                     rotation[2]))
             self.logger.debug('set node euler rotation to {}'.format(list(fbx_node.LclRotation.Get())))
 
-    def _build_fbx_node(self, fbx_node: fbx.FbxNode, source_node: Mdb.Node, fbx_scene: fbx.FbxScene):
-
-        global material_export_handler
-
-        self.logger.extra = {'source_mdb': self.source.file.name, 'node': source_node.node_name.string}
-
+    def _add_node_meta_(self, source_node: Mdb.Node):
         self.node_meta.append({
             'file': self.source.file.name,
             'node_name': source_node.node_name.string,
@@ -520,15 +258,56 @@ class FbxFileExportJob(IgniApplicationEntity):
         })
         self.file_meta['node_count'] += 1
 
+    def _handle_material_(self, material: Material):
+        """
+        records a (non-empty) material and submits the export of its textures, unless the task dispatcher already
+        did both (see ConversionContext.textures_dispatched)
+        """
+
+        self.file_meta['material_count'] += 1
+        if self.context.textures_dispatched:
+            return
+
+        self.material_meta.append(
+            {
+                'file': self.source.file.name,
+                'node': material.host_node.node_name.string,
+                'shader': material.shader,
+                'material': str(material)
+            }
+        )
+        self.texture_export_jobs.extend(material_export_handler().handle(material,
+                                                                         self.source.file.name,
+                                                                         self.texture_output_destination,
+                                                                         self.settings['texture-conversion']['format']))
+
+    def _submit_texture_jobs_(self):
+        """
+        submits the texture conversions of the handled materials in batches (see TextureBatchJob)
+        """
+
+        texture_settings = self.settings['texture-conversion']
+        options = texture_encoder_options(texture_settings, texture_settings['format'])
+        for job in self.texture_export_jobs:
+            job.encoder_options(options).deduplicate(texture_settings['deduplicate'])
+        for batch in texture_batches(self.texture_export_jobs, texture_settings['batch-size'],
+                                     texture_settings['threads']):
+            Application().submit_task(batch)
+        self.texture_export_jobs = []
+
+    def _build_fbx_node(self, fbx_node: 'fbx.FbxNode', source_node: Mdb.Node, fbx_scene: 'fbx.FbxScene',
+                        node_transform: tuple):
+
+        import fbx
+
+        self.logger.extra = {'source_mdb': self.source.file.name, 'node': source_node.node_name.string}
+
+        self._add_node_meta_(source_node)
+
         self.logger.debug('start building fbx node')
         fbx_node.SetName(source_node.node_name.string)
 
-        node_properties = None
-        try:
-            node_properties = NodeProperties(source_node.controller_defs.data, source_node.controller_data.data)
-        except Exception as e:
-            self.logger.error('could not read node properties: {}'.format(e))
-        self._transfer_node_properties_(fbx_node, node_properties)
+        self._transfer_node_properties_(fbx_node, node_transform)
 
         if source_node.node_type == Mdb.NodeType.trimesh or \
                 source_node.node_type == Mdb.NodeType.skin:
@@ -540,87 +319,202 @@ class FbxFileExportJob(IgniApplicationEntity):
                                  Trimesh(source_node.node_data))
 
             # --- materials
-            try:
-                material = Material.from_node(source_node)
-                if not material.is_empty():
-                    self.file_meta['material_count'] += 1
-                    self.material_meta.append(
-                        {
-                            'file': self.source.file.name,
-                            'node': material.host_node.node_name.string,
-                            'shader': material.shader,
-                            'material': str(material)
-                        }
-                    )
-                    material_export_handler.handle(material,
-                                                   self.source.file.name,
-                                                   self.texture_output_destination,
-                                                   self.settings['texture-conversion']['format'])
-            except Exception as e:
-                self.logger.error("exception while parsing material: {}".format(e))
+            material = self.context.material_of(source_node)
+            if material is not None:
+                try:
+                    self._handle_material_(material)
+                except Exception as e:
+                    self.logger.error("exception while handling material: {}".format(e))
 
         else:
             self.logger.debug('node type is not handled, it has been added to scene but its data wont be built')
 
-    def _build_fbx_scene(self, fbx_scene: fbx.FbxScene, source: Mdb):
+    def _build_fbx_scene(self, fbx_scene: 'fbx.FbxScene', source: Mdb):
+
+        import fbx
 
-        def recursive_add_nodes(source_nodes, under_parent: fbx.FbxNode):
-            for source_node in source_nodes:
+        table = node_table(source)
+        skip_containing_words = self.settings.get('skip-nodes.if-name-contains', default=[])
 
-                skip_containing_words = self.settings.get('skip-nodes.if-name-contains', default=[])
+        # skipped nodes and everything under them are not built, their properties are not read
+        node_transforms = self._read_node_transforms_(table, table.kept_indices(skip_containing_words))
+
+        def recursive_add_nodes(source_indices, under_parent: 'fbx.FbxNode'):
+            for source_index in source_indices:
+
+                source_node = table.nodes[source_index]
 
                 if any([word in source_node.node_name.string for word in skip_containing_words]):
-                    if len(source_node.children.data) > 0:
+                    if source_node.children.size > 0:
                         self.logger.warn('skipping node which contains children will result in data loss')
                     continue
 
                 fbx_node = fbx.FbxNode.Create(fbx_scene, '')
                 under_parent.AddChild(fbx_node)
-                self._build_fbx_node(fbx_node, source_node, fbx_scene)
+                self._build_fbx_node(fbx_node, source_node, fbx_scene, node_transforms[source_index])
 
                 '''
                 self.logger.context = None
                 '''
 
-                recursive_add_nodes(
-                    [child_ptr.data for child_ptr in source_node.children.data],
-                    fbx_node
-                )
+                recursive_add_nodes(table.children_of(source_index), fbx_node)
 
         self.logger.debug('start building fbx scene from mdb scene tree')
-        recursive_add_nodes([child_ptr.data for child_ptr in source.root_node.children.data],
+        recursive_add_nodes(table.children_of(0),
                             fbx_scene.GetRootNode())
 
+        self._persist_meta_()
+
+    def _persist_meta_(self):
         Application().persist_data(self.FILE_META_TABLE_NAME,
-                                  pandas.DataFrame([self.file_meta]))
+                                  [self.file_meta])
         Application().persist_data(self.NODE_META_TABLE_NAME,
-                                  pandas.DataFrame(self.node_meta))
+                                  self.node_meta)
         Application().persist_data(self.MATERIAL_META_TABLE_NAME,
-                                   pandas.DataFrame(self.material_meta))
+                                   self.material_meta)
+
+    def _export(self, scene: 'fbx.FbxScene', dest):
 
-    def _export(self, scene: fbx.FbxScene, dest):
+        import fbx
 
         self.logger.debug('exporting fbx scene')
 
-        fbx_exporter = fbx.FbxExporter.Create(MEMORY_MANAGER, '')
-        fbx_exporter.Initialize(os.path.join(dest, self.source.file.name), -1, MEMORY_MANAGER.GetIOSettings())
+        fbx_exporter = fbx.FbxExporter.Create(memory_manager(), '')
+        fbx_exporter.Initialize(os.path.join(dest, self.source.file.name), -1, memory_manager().GetIOSettings())
         fbx_exporter.Export(scene)
         fbx_exporter.Destroy()
 
-    def convert(self) -> fbx.FbxScene:
-        mdb_source = Mdb.from_file(str(self.source.file))  # TODO add full file path
-        dest_scene = fbx.FbxScene.Create(MEMORY_MANAGER, mdb_source.root_node.node_name.string)
+    def from_shared_model(self, descriptor: SharedModelDescriptor):
+        """
+        converts from a model another task published to shared memory instead of decoding the source again,
+        the shared model is released once this job is done
+        """
+        self.shared_model = descriptor
+        self.context.shared_model = descriptor
+        return self.releases(descriptor)
+
+    def _open_source_(self) -> Mdb:
+        return self.context.mdb
+
+    def _log_context_errors_(self):
+        self.logger.extra = {'source_mdb': self.source.file.name}
+        for error in self.context.errors:
+            self.logger.error(error)
+        self.context.errors = []
+
+    def _texture_uri_(self, texture_name: str) -> str:
+        """
+        where a gltf or native fbx file in the output destination finds a converted texture, None for formats whose
+        file name is not known up front
+        """
+        texture_format = self.settings['texture-conversion']['format']
+        if texture_format not in {'png', 'jpg'} or self.texture_output_destination is None:
+            return None
+        uri = texture_name + '.' + texture_format
+        texture_directory = os.path.relpath(self.texture_output_destination.full_path,
+                                            self.output_destination.full_path)
+        if texture_directory != '.':
+            uri = texture_directory.replace(os.sep, '/') + '/' + uri
+        return uri
+
+    def convert_to_glb(self) -> GlbDocument:
+        """
+        builds a gltf document from the source without the fbx sdk, see gltf.py
+        """
+
+        # gltf is in meters, uvs have their origin at the top left like the source (flip-uvs is for fbx)
+        coordinate_settings = Settings(self.settings['coordinate-system']).read_dict({'target-unit': 'm'})
+
+        builder = MdbGltfBuilder(CoordinateSystemService(coordinate_settings),
+                                 flip_uvs=not self.settings['flip-uvs'],
+                                 normals=self.settings['vertex-streams']['normals'],
+                                 tangents=self.settings['vertex-streams']['tangents'],
+                                 skip_names_containing=self.settings.get('skip-nodes.if-name-contains', default=[]),
+                                 texture_uri=self._texture_uri_,
+                                 on_material=self._handle_built_material_,
+                                 material_of=self.context.material_of)
+        document = builder.build(self._open_source_())
+        self._record_build_(builder)
+        return document
+
+    def convert_to_native_fbx(self) -> FbxDocument:
+        """
+        builds a binary fbx document from the source without the fbx sdk, see fbxbinary.py
+        """
+
+        builder = MdbFbxBuilder(self.coord_service,
+                                flip_uvs=self.settings['flip-uvs'],
+                                normals=self.settings['vertex-streams']['normals'],
+                                tangents=self.settings['vertex-streams']['tangents'],
+                                binormals=self.settings['vertex-streams']['binormals'],
+                                skip_names_containing=self.settings.get('skip-nodes.if-name-contains', default=[]),
+                                texture_path=self._texture_uri_,
+                                on_material=self._handle_built_material_,
+                                material_of=self.context.material_of)
+        document = builder.build(self._open_source_())
+        self._record_build_(builder)
+        return document
+
+    def _handle_built_material_(self, material: Material):
+        self.logger.extra = {'source_mdb': self.source.file.name, 'node': material.host_node.node_name.string}
+        try:
+            self._handle_material_(material)
+        except Exception as e:
+            self.logger.error("exception while handling material: {}".format(e))
+
+    def _record_build_(self, builder):
+        """
+        logs the errors and persists the metadata of an sdk-free build (gltf or native fbx builder)
+        """
+
+        self._log_context_errors_()
+        for error in builder.errors:
+            self.logger.error(error)
+        for node in builder.nodes:
+            self._add_node_meta_(node)
+        for _, trimesh in builder.meshes:
+            self.file_meta['mesh_count'] += 1
+            self.file_meta['tri_count'] += trimesh.face_count
+
+        self._persist_meta_()
+
+    def convert(self) -> 'fbx.FbxScene':
+
+        import fbx
+        from .fbxmesh import FbxMeshBuilder
+
+        if self.mesh_builder is None:
+            self.mesh_builder = FbxMeshBuilder()
+        mdb_source = self._open_source_()
+        dest_scene = fbx.FbxScene.Create(memory_manager(), mdb_source.root_node.node_name.string)
         self._build_fbx_scene(dest_scene, mdb_source)
+        self._log_context_errors_()
+        self.logger.debug('mesh building times (s): {}'.format(self.mesh_builder.timings))
         return dest_scene
 
     def convert_and_export(self):
 
-        fbx_scene = self.convert()
-        self._export(fbx_scene, self.output_destination.full_path)
-        fbx_scene.Destroy()
+        if self.settings['output-format'] == 'glb':
+            self.convert_to_glb().write(os.path.join(self.output_destination.full_path,
+                                                     self.source.file.name + '.glb'))
+        elif self.settings['fbx-writer']['backend'] == 'native':
+            self.convert_to_native_fbx().write(os.path.join(self.output_destination.full_path,
+                                                            self.source.file.name + '.fbx'),
+                                               compression_threads=self.settings['fbx-writer']['compression-threads'],
+                                               compression_level=self.settings['fbx-writer']['compression-level'])
+        else:
+            fbx_scene = self.convert()
+            self._export(fbx_scene, self.output_destination.full_path)
+            fbx_scene.Destroy()
+
+        self._submit_texture_jobs_()
 
     def __call__(self):
-        self.convert_and_export()
+        try:
+            self.convert_and_export()
+        finally:
+            if self.shared_model is not None:
+                detach_shared_model(self.shared_model)
 
 
 class Mdb2FbxConversionTaskDispatcher(IgniApplicationEntity):
@@ -648,7 +542,9 @@ class Mdb2FbxConversionTaskDispatcher(IgniApplicationEntity):
                   destination: Directory,
                   texture_destination: Directory):
         """
-        :return: a list of tasks that should be executed to convert an mdb to an fbx
+        :return: a list of tasks that should be executed to convert an mdb to an fbx; the export task converts from
+                 the model decoded here, published to shared memory, which is released once the application has
+                 executed the task (callers executing the tasks themselves release task.shared_models)
         """
 
         self.logger.extra['source_mdb'] = source.file.name
@@ -656,29 +552,30 @@ class Mdb2FbxConversionTaskDispatcher(IgniApplicationEntity):
         tasks = []
         material_meta = []
 
-        wrapper = MdbWrapper(source.get())
+        # the model is parsed and its materials (with their material files) read once, here, for all tasks
+        context = ConversionContext(source, self.resource_manager)
 
-        # export fbx file
-        tasks.append(FbxFileExportJob(source,
+        # export fbx file, from the decoded model instead of decoding the file again in the worker
+        export_job = FbxFileExportJob(source,
                                       destination,
                                       texture_destination,
-                                      self.settings))
+                                      self.settings,
+                                      context=context)
+        try:
+            export_job.from_shared_model(publish_model(context.mdb, source.file.full_path))
+        except Exception as e:
+            self.logger.error('could not publish the model to shared memory, it is decoded again: {}'.format(e))
+        tasks.append(export_job)
 
         # export textures
-        for material in wrapper.materials:
+        texture_jobs = []
+        texture_settings = self.settings['texture-conversion']
+        encoder_options = texture_encoder_options(texture_settings, texture_settings['format'])
+        for material in context.materials.values():
 
             self.logger.extra['node'] = material.host_node.node_name.string
             self.texture_locator_service.logger.extra = self.logger.extra
 
-            if len(material.material_file_pointer) > 0:
-                material_resource = self.resource_manager.get(material.material_file_pointer, ResourceTypes.MAT)
-                if material_resource is None:
-                    self.logger.error('material is pointing to a material file {} but could locate none'.format(
-                        material.material_file_pointer))
-                else:
-                    self.logger.debug('reading from material file {}'.format(material.material_file_pointer))
-                    material.read_material_file(material_resource.file)
-
             for texture_name in material.get_all_texture_names():
 
                 if texture_name in self.handled_texture_names:
@@ -690,12 +587,14 @@ class Mdb2FbxConversionTaskDispatcher(IgniApplicationEntity):
                 if texture_file is None:
                     continue
 
-                tasks.append(
+                texture_jobs.append(
                     TextureConverterJob().
                         input(texture_file).
                         target_fname(texture_name).
-                        target_format(self.settings['texture-conversion']['format']).
-                        target_dir(texture_destination)
+                        target_format(texture_settings['format']).
+                        target_dir(texture_destination).
+                        encoder_options(encoder_options).
+                        deduplicate(texture_settings['deduplicate'])
                 )
 
             material_meta.append(
@@ -707,7 +606,10 @@ class Mdb2FbxConversionTaskDispatcher(IgniApplicationEntity):
                 }
             )
 
-        Application().persist_data('material_meta', pandas.DataFrame(material_meta))
+        tasks.extend(texture_batches(texture_jobs, texture_settings['batch-size'], texture_settings['threads']))
+        context.textures_dispatched = True  # the export job doesn't look for the textures again
+
+        Application().persist_data('material_meta', material_meta)
         return tasks
 
 
@@ -715,10 +617,16 @@ def mdb_to_fbx(source: Resource,
                destination: Directory,
                texture_destination: Directory,
                settings: Settings = Settings()):
-    [task() for task in Mdb2FbxConversionTaskDispatcher(source,
-                                                        destination,
-                                                        texture_destination,
-                                                        settings).get_tasks()]  # everything needs to be runnable and picklable
+    dispatcher = Mdb2FbxConversionTaskDispatcher(ResourceManagerTextureLocatorService(),
+                                                 Application().resource_manager,
+                                                 settings)
+    # everything needs to be runnable and picklable
+    for task in dispatcher.get_tasks(source, destination, texture_destination):
+        try:
+            task()
+        finally:
+            for descriptor in task.shared_models:
+                release_shared_model(descriptor)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,367 @@
+from .mdb import Mdb
+from kaitaistruct import KaitaiStream
+from collections import Counter
+import mmap
+import numpy
+import struct
+
+'''
+loading and array-backed decoding for the kaitai auto-generated Mdb class
+
+Mdb.ArrayPtr.data builds one python object per array element, the functions below read the payload of an
+array pointer with fixed-size records in one go and return a typed numpy array over the read buffer instead;
+the generated object api is not touched and stays available
+
+open_mdb maps the file into memory instead of reading it, array payloads are then numpy arrays over
+memoryview slices of the mapping (no copy), so only the pages actually touched are loaded
+
+Mdb.Ptr.data caches per pointer object, deref resolves pointers through a table keyed by file offset
+kept on the Mdb root, so nodes (materials, animations...) reachable through several pointers are decoded once
+
+scan_header reads the header and walks the raw node records for names, types and array sizes only,
+for cataloguing large numbers of files without decoding them
+
+if a model cache is installed (see modelcache.py), open_mdb goes through it and arrays, material specs and the node
+table of a cached model are served from the cache
+'''
+
+# bump whenever decoding changes in a way that makes previously cached models (see modelcache.py) invalid
+PARSER_VERSION = 1
+
+_MODEL_CACHE = None
+
+
+def set_model_cache(model_cache):
+    """
+    installs a modelcache.ModelCache used by open_mdb, None to uninstall
+    """
+    global _MODEL_CACHE
+    _MODEL_CACHE = model_cache
+
+
+def cached_model(mdb: Mdb):
+    """
+    the modelcache.CachedModel attached to an mdb loaded through the model cache, None otherwise
+    """
+    return getattr(mdb, '_m_cached_model', None)
+
+
+class MappedKaitaiStream(KaitaiStream):
+
+    """
+    a kaitai stream over a read-only memory mapping of a file
+    the generated parser reads fields through read_bytes as usual (small, copied), large payloads are read
+    through read_view which returns a memoryview slice of the mapping without copying
+    """
+
+    @classmethod
+    def from_file(cls, file_path: str):
+        with open(file_path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapping)
+
+    def read_view(self, n: int) -> memoryview:
+        position = self._io.tell()
+        if position + n > len(self._io):
+            raise EOFError('requested {} bytes, but only {} bytes available'.format(n, len(self._io) - position))
+        self._io.seek(position + n)
+        return memoryview(self._io)[position:(position + n)]
+
+
+def open_mdb(file_path: str, mapped: bool = True) -> Mdb:
+    """
+    loads an mdb (or mba) file, memory-mapped by default and through the model cache if one is installed
+    """
+    if not mapped:
+        return Mdb.from_file(file_path)
+    if _MODEL_CACHE is not None:
+        return _MODEL_CACHE.open(str(file_path))
+    return Mdb(MappedKaitaiStream.from_file(str(file_path)))
+
+
+_POINTER_TARGET_TYPES = {
+    'node': Mdb.Node,
+    'animation': Mdb.Animation,
+    'animation_node': Mdb.AnimationNode,
+    'material': Mdb.Material
+}
+
+
+def decode_at(mdb: Mdb, dtype: str, offset: int):
+    """
+    returns the object of type dtype (as named in Mdb.Ptr) at the absolute offset, decoding it only if nothing was
+    decoded at this offset before
+    """
+
+    if not hasattr(mdb, '_m_interned'):
+        mdb._m_interned = {}
+        mdb._m_saved_decode_count = 0
+
+    key = (dtype, offset)
+    if key in mdb._m_interned:
+        mdb._m_saved_decode_count += 1
+        return mdb._m_interned[key]
+
+    if key == ('node', mdb.header.offset_root_node + 32):
+        # the root node is decoded by Mdb.root_node, not through a pointer
+        if hasattr(mdb, '_m_root_node'):
+            mdb._m_saved_decode_count += 1
+        data = mdb.root_node
+    else:
+        data = decode_detached(mdb, dtype, offset)
+
+    mdb._m_interned[key] = data
+    return data
+
+
+def decode_detached(mdb: Mdb, dtype: str, offset: int):
+    """
+    decodes the object of type dtype at the absolute offset without interning it, nothing but the caller holds on
+    to the result (and what it decodes through its own pointers)
+    """
+    _pos = mdb._io.pos()
+    mdb._io.seek(offset)
+    data = _POINTER_TARGET_TYPES.get(dtype, Mdb.UnknownType)(mdb._io, mdb, mdb)
+    mdb._io.seek(_pos)
+    return data
+
+
+def deref(ptr: Mdb.Ptr):
+    """
+    returns the data a pointer points to, decoding it only if no other pointer to the same offset was resolved before
+    the interned object is also cached on the pointer, so ptr.data returns the same object afterwards
+    """
+
+    if not hasattr(ptr, '_m_data'):
+        ptr._m_data = decode_at(ptr._root, ptr.dtype, ptr.offset + ptr.additional_offset)
+    return ptr._m_data
+
+
+def deref_all(ptr_array_ptr: Mdb.PtrArrayPtr) -> list:
+    return [deref(ptr) for ptr in ptr_array_ptr.data]
+
+
+def read_material_spec(material_ptr: Mdb.Ptr) -> list:
+    """
+    material spec lines of a material pointer (Mdb.Material.material_spec)
+    """
+    model = cached_model(material_ptr._root)
+    if model is not None:
+        material_spec = model.material_spec(material_ptr.offset + material_ptr.additional_offset)
+        if material_spec is not None:
+            return material_spec
+    return deref(material_ptr).material_spec
+
+
+def animation_offsets(mdb: Mdb) -> list:
+    """
+    index of the animations of an mba file, read without decoding any animation, cached on the mdb
+    :return: (animation name, absolute offset of the animation record) in file order, names may repeat
+    """
+
+    if hasattr(mdb, '_m_animation_offsets'):
+        return mdb._m_animation_offsets
+
+    offsets = []
+    _pos = mdb._io.pos()
+    for animation_ptr in mdb.animations.animation_array_pointer.data:
+        offset = animation_ptr.offset + animation_ptr.additional_offset
+        mdb._io.seek(offset + 8)  # Mdb.Animation: 8 unknown bytes, then the name
+        offsets.append((Mdb.Strl(64, mdb._io, mdb, mdb).string, offset))
+    mdb._io.seek(_pos)
+
+    mdb._m_animation_offsets = offsets
+    return offsets
+
+
+def saved_decode_count(mdb: Mdb) -> int:
+    """
+    number of pointer resolutions that were served from the interning table instead of decoding again
+    """
+    return getattr(mdb, '_m_saved_decode_count', 0)
+
+
+# numpy record layouts for the fixed-size array element types of the mdb format (see kaitai/mdb.ksy)
+
+FACE_DTYPE = numpy.dtype([
+    ('unknown', '<u4', (5,)),
+    ('vert', '<u4', (3,))
+])
+
+CONTROLLER_DEF_DTYPE = numpy.dtype([
+    ('controller_type', '<u4'),
+    ('key_count', '<u2'),
+    ('times_start', '<u2'),
+    ('values_start', '<u2'),
+    ('channel_count', 'u1'),
+    ('pad', 'u1')
+])
+
+BONE_DTYPE = numpy.dtype([
+    ('bone_id', '<u4'),
+    ('bone_name', 'S92')
+])
+
+ARRAY_DTYPES = {
+    'vertex': numpy.dtype(('<f4', (3,))),
+    'normal': numpy.dtype(('<i2', (3,))),
+    'vector3ofs2': numpy.dtype(('<i2', (3,))),
+    'uv': numpy.dtype(('<f4', (2,))),
+    'f4': numpy.dtype('<f4'),
+    'face': FACE_DTYPE,
+    'controller_def': CONTROLLER_DEF_DTYPE,
+    'bone': BONE_DTYPE
+}
+
+
+def is_array_decodable(array_ptr: Mdb.ArrayPtr) -> bool:
+    return array_ptr.dtype in ARRAY_DTYPES
+
+
+def read_array(array_ptr: Mdb.ArrayPtr) -> numpy.ndarray:
+    """
+    reads all elements of an array pointer into a numpy array, the result is cached on the array pointer
+    for mdbs loaded with open_mdb the array is a read-only view into the file mapping
+    vertex -> (N, 3) float32, normal and vector3ofs2 -> (N, 3) int16, uv -> (N, 2) float32, f4 -> (N,) float32,
+    face, controller_def and bone -> structured arrays (see FACE_DTYPE, CONTROLLER_DEF_DTYPE, BONE_DTYPE)
+    """
+
+    if hasattr(array_ptr, '_m_array'):
+        return array_ptr._m_array
+
+    if not is_array_decodable(array_ptr):
+        raise Exception("can't decode array of type '{}' into a numpy array".format(array_ptr.dtype))
+
+    dtype = ARRAY_DTYPES[array_ptr.dtype]
+    model = cached_model(array_ptr._root)
+
+    if model is not None and model.has_array(array_ptr):
+        array_ptr._m_array = model.array(array_ptr)
+        return array_ptr._m_array
+
+    if array_ptr.size == 0:
+        buffer = b''
+    else:
+        io = array_ptr._io
+        read = io.read_view if isinstance(io, MappedKaitaiStream) else io.read_bytes
+        _pos = io.pos()
+        io.seek(array_ptr.first_element_offset + array_ptr.additional_offset)
+        buffer = read(array_ptr.size * dtype.itemsize)
+        io.seek(_pos)
+
+    array_ptr._m_array = numpy.frombuffer(buffer, dtype=dtype)
+    return array_ptr._m_array
+
+
+def read_face_indices(array_ptr: Mdb.ArrayPtr) -> numpy.ndarray:
+    """
+    (M, 3) uint32 vertex indices of a face array (a view into the face records)
+    """
+    return read_array(array_ptr)['vert']
+
+
+def read_bone_names(array_ptr: Mdb.ArrayPtr) -> list:
+    return [bone_name.split(b'\x00', 1)[0].decode('utf8') for bone_name in read_array(array_ptr)['bone_name']]
+
+
+# byte layout of the node records as far as scan_header needs it (see kaitai/mdb.ksy, types 'node' and 'trimesh')
+# offsets are relative to the start of a node record, pointers in the file are relative to the model data (+32)
+
+_DATA_OFFSET = 32
+_NODE_CHILDREN = struct.Struct('<II')  # first_element_offset, size of the children pointer array
+_NODE_CHILDREN_OFFSET = 104
+_NODE_TYPE = struct.Struct('<I')
+_NODE_TYPE_OFFSET = 160
+_NODE_DATA_OFFSET = 164
+_TRIMESH_VERTICES_OFFSET = _NODE_DATA_OFFSET + 768
+_SKIN_VERTICES_OFFSET = _NODE_DATA_OFFSET + 784  # skins have 4 unknown bytes and the bones array in between
+_VERTICES_TO_FACES = 9 * 12  # vertices, normals, tangents, binormals, 4 uv sets, unknown array (12 bytes each)
+_ARRAY_SIZE = struct.Struct('<I')
+
+
+class HeaderScan:
+
+    """
+    summary of an mdb file gathered without decoding node data or array payloads
+    """
+
+    def __init__(self):
+        self.file = ''
+        self.model_name = ''
+        self.super_model = ''
+        self.first_lod = 0.0
+        self.last_lod = 0.0
+        self.node_count = 0
+        self.node_count_by_type = {}
+        self.vertex_count = 0
+        self.face_count = 0
+
+    def __iter__(self):
+        yield ('file', self.file)
+        yield ('model_name', self.model_name)
+        yield ('super_model', self.super_model)
+        yield ('first_lod', self.first_lod)
+        yield ('last_lod', self.last_lod)
+        yield ('node_count', self.node_count)
+        yield ('node_count_by_type', self.node_count_by_type)
+        yield ('vertex_count', self.vertex_count)
+        yield ('face_count', self.face_count)
+
+    def __str__(self):
+        return str(dict(self))
+
+
+def _walk_node_records(mapping, root_node_offset: int):
+    """
+    yields (offset, node type) of every node record below and including the root, depth-first, without recursion
+    """
+
+    visited = set()
+    pending = [root_node_offset]
+
+    while len(pending) > 0:
+        node_offset = pending.pop()
+        if node_offset in visited:
+            continue
+        visited.add(node_offset)
+
+        yield node_offset, KaitaiStream.resolve_enum(
+            Mdb.NodeType, _NODE_TYPE.unpack_from(mapping, node_offset + _NODE_TYPE_OFFSET)[0])
+
+        first_child, child_count = _NODE_CHILDREN.unpack_from(mapping, node_offset + _NODE_CHILDREN_OFFSET)
+        if child_count > 0:
+            child_pointers = struct.unpack_from('<{}I'.format(child_count), mapping, first_child + _DATA_OFFSET)
+            pending.extend(child_pointer + _DATA_OFFSET for child_pointer in reversed(child_pointers))
+
+
+def scan_header(file_path: str) -> HeaderScan:
+    """
+    reads Mdb.Header and walks the raw node records reading only node types and ArrayPtr sizes
+    """
+
+    stream = MappedKaitaiStream.from_file(str(file_path))
+    try:
+        header = Mdb(stream).header
+
+        scan = HeaderScan()
+        scan.file = str(file_path)
+        scan.model_name = header.model_name.string
+        scan.super_model = header.super_model.string
+        scan.first_lod = header.first_lod
+        scan.last_lod = header.last_lod
+
+        node_types = Counter()
+        for node_offset, node_type in _walk_node_records(stream._io, header.offset_root_node + _DATA_OFFSET):
+            node_types[node_type.name if isinstance(node_type, Mdb.NodeType) else str(node_type)] += 1
+
+            if node_type in {Mdb.NodeType.trimesh, Mdb.NodeType.skin}:
+                vertices_offset = node_offset + (_SKIN_VERTICES_OFFSET if node_type == Mdb.NodeType.skin
+                                                 else _TRIMESH_VERTICES_OFFSET)
+                scan.vertex_count += _ARRAY_SIZE.unpack_from(stream._io, vertices_offset + 4)[0]
+                scan.face_count += _ARRAY_SIZE.unpack_from(stream._io, vertices_offset + _VERTICES_TO_FACES + 4)[0]
+
+        scan.node_count = sum(node_types.values())
+        scan.node_count_by_type = dict(node_types)
+        return scan
+    finally:
+        stream.close()
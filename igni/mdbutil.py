@@ -1,7 +1,11 @@
 from .mdb import Mdb
+from .mdbio import read_array, read_face_indices, read_bone_names, read_material_spec, deref, deref_all, \
+    decode_at, decode_detached, animation_offsets, cached_model
 from collections.abc import Iterable
 from typing import List
+import numpy
 import re
+import sys
 from .resources import Resource, ResourceTypes
 
 '''
@@ -9,22 +13,46 @@ defines a wrapper for kaitai auto-generated Mdb class and some utility functions
 '''
 
 
-class AnimationCurve:
+def controller_keys(controller_data: numpy.ndarray, key_count: int, times_start: int, values_start: int,
+                    channel_count: int):
+    """
+    keyframes of one controller as views into the shared controller data
+    :return: times (float32, [key count]), values (float32, [key count, channel count])
+    """
+    times = controller_data[times_start:(times_start + key_count)]
+    values = controller_data[values_start:(values_start + key_count * channel_count)].reshape(key_count, channel_count)
+    return times, values
+
+
+def inconsistent_controllers(controller_defs: numpy.ndarray, controller_data_sizes) -> numpy.ndarray:
+    """
+    checks many controller definitions at once
+    :param controller_data_sizes: size of the controller data each definition refers to (scalar or one per definition)
+    :return: boolean mask of definitions without keys or with keys outside of their controller data
+    """
+    key_count = controller_defs['key_count'].astype(numpy.int64)
+    channel_count = controller_defs['channel_count'].astype(numpy.int64)
 
-    def __init__(self, controller_def: Mdb.ControllerDef, controller_data):
-        self.data = {}
+    return (key_count == 0) | (channel_count == 0) | \
+           (controller_defs['times_start'] + key_count > controller_data_sizes) | \
+           (controller_defs['values_start'] + key_count * channel_count > controller_data_sizes)
 
-        times_start = controller_def.times_start
-        values_start = controller_def.values_start
-        key_count = controller_def.key_count
-        chnl_count = controller_def.channel_count
 
-        times = controller_data[times_start:(times_start + key_count)]
+class AnimationCurve:
 
-        values = controller_data[values_start:(values_start + key_count * chnl_count)]
-        values = [values[i:(i + chnl_count)] for i in range(0, key_count)]
+    def __init__(self, controller_def, controller_data: numpy.ndarray):
+        """
+        :param controller_def: a record of a controller definition array (see mdbio.CONTROLLER_DEF_DTYPE)
+        """
+        self.times, self.values = controller_keys(controller_data,
+                                                  int(controller_def['key_count']),
+                                                  int(controller_def['times_start']),
+                                                  int(controller_def['values_start']),
+                                                  int(controller_def['channel_count']))
 
-        self.data = {times[i]: values[i] for i in range(0, key_count)}
+    @property
+    def data(self):
+        return {time: tuple(values) for time, values in zip(self.times.tolist(), self.values.tolist())}
 
 
 class AnimationNode:
@@ -41,10 +69,40 @@ class Animation:
         self.name = name
         self.anim_nodes = []
         self.root_node = None
+        self.transition_time = 0.0
 
         self._length = 0
         self._key_count = 0
         self._node_count = 0
+        self._node_properties = None
+
+    @classmethod
+    def from_mdb_animation(cls, animation: Mdb.Animation):
+        """
+        wraps an animation decoded on its own (see iter_animations), its node tree is not interned on the mdb,
+        so it is released together with the wrapper
+        """
+        wrapper = cls(animation.animation_name.string)
+        wrapper.anim_nodes = get_animation_nodes(animation, interned=False)
+        wrapper.root_node = wrapper.anim_nodes[0]
+        wrapper.transition_time = animation.transition_time
+        wrapper._length = animation.animation_length
+        wrapper._node_count = len(wrapper.anim_nodes)
+        return wrapper
+
+    @property
+    def node_properties(self) -> dict:
+        """
+        animation node name -> NodeProperties (keyframe arrays) of all nodes, checked in bulk on first access
+        """
+        if self._node_properties is None:
+            self._node_properties = animation_node_properties(None, self.anim_nodes, self.name)
+            self._key_count = max([node_property.key_count()
+                                   for properties in self._node_properties.values()
+                                   for node_property in (properties.location, properties.rotation, properties.scale,
+                                                         properties.self_illum, properties.alpha)
+                                   if node_property is not None], default=0)
+        return self._node_properties
 
 
 class Skeleton:
@@ -56,57 +114,107 @@ class Skeleton:
 # a wrapper class for trimesh (triangular mesh) objects
 class Trimesh:
 
+    """
+    numpy view of a trimesh (or skin) node, all arrays are built on first access and kept:
+    vertices (N, 3) float32 and uv sets (N, 2) float32 are views into the parsed file, faces (M, 3) uint32 is a
+    contiguous copy of the vertex indices of the face records, normals, tangents and binormals (N, 3) float32 are
+    dequantised from the stored int16 values (see NORMAL_QUANTISATION_SCALE)
+    """
+
+    # normals are stored as int16 vectors of length 8192, tangents and binormals are assumed to use the same scale
+    NORMAL_QUANTISATION_SCALE = 8192.0
+
     def __init__(self, trimesh: Mdb.Trimesh, host_node: Mdb.Node = None):
 
-        self.vertices = ()
-        self.faces = ()
-        self.normals = ()
-        self.binormals = ()
-        self.tangents = ()
-        self.uv_sets = {}
         self.trimesh: Mdb.Trimesh = trimesh
         self.host_node = host_node
 
-        self._init_data()
-
-    def _init_data(self):
+        self._vertices = None
+        self._faces = None
+        self._normals = None
+        self._tangents = None
+        self._binormals = None
+        self._uv_sets = None
+
+    @property
+    def vertex_count(self) -> int:
+        return self.trimesh.vertices.size
+
+    @property
+    def face_count(self) -> int:
+        return self.trimesh.faces.size
+
+    @property
+    def vertices(self) -> numpy.ndarray:
+        if self._vertices is None:
+            self._vertices = read_array(self.trimesh.vertices)
+        return self._vertices
+
+    @property
+    def faces(self) -> numpy.ndarray:
+        if self._faces is None:
+            self._faces = numpy.ascontiguousarray(read_face_indices(self.trimesh.faces))
+        return self._faces
+
+    def _dequantised(self, array_ptr: Mdb.ArrayPtr) -> numpy.ndarray:
+        return read_array(array_ptr).astype(numpy.float32) * numpy.float32(1.0 / self.NORMAL_QUANTISATION_SCALE)
+
+    @property
+    def normals(self) -> numpy.ndarray:
+        if self._normals is None:
+            self._normals = self._dequantised(self.trimesh.normals)
+        return self._normals
+
+    @property
+    def tangents(self) -> numpy.ndarray:
+        if self._tangents is None:
+            self._tangents = self._dequantised(self.trimesh.tangents)
+        return self._tangents
+
+    @property
+    def binormals(self) -> numpy.ndarray:
+        if self._binormals is None:
+            self._binormals = self._dequantised(self.trimesh.binormals)
+        return self._binormals
+
+    @property
+    def uv_sets(self) -> dict:
+        """
+        uv set name ('UvSet0'..'UvSet3') -> (N, 2) float32, only non-empty sets
+        """
+        if self._uv_sets is None:
+            self._uv_sets = {}
+            for i, uvs_ptr in enumerate(self.trimesh.uvs):
+                if uvs_ptr.size > 0:
+                    self._uv_sets['UvSet{}'.format(i)] = read_array(uvs_ptr)
+        return self._uv_sets
 
-        self.vertices = tuple((v.x, v.y, v.z) for v in self.trimesh.vertices.data)
-        self.faces = tuple((f.vert1, f.vert2, f.vert3) for f in self.trimesh.faces.data)
-        self.normals = tuple((n.x, n.y, n.z) for n in self.trimesh.normals.data)
-        self.binormals = tuple((b.x, b.y, b.z) for b in self.trimesh.binormals.data)
-        self.tangents = tuple((t.x, t.y, t.z) for t in self.trimesh.tangents.data)
 
-        for i in range(0, 4):
-            uv_array_pointer = self.trimesh.uvs[i]
-            if uv_array_pointer.data is not None and len(uv_array_pointer.data) > 0:
-                self.uv_sets['UvSet{}'.format(i)] = ((c.u, c.v) for c in uv_array_pointer.data)
+class NodeProperty:
 
+    def __init__(self, property_type, times: numpy.ndarray = None, values: numpy.ndarray = None):
+        """
+        :param times: key times, float32 [key count]
+        :param values: key values, float32 [key count, channel count]; a single key means a static (not animated) value
+        """
+        self.type = property_type
+        self.times = times
+        self.values = values
 
-class NodeProperty:
+        if self._is_empty_(times):
+            self.value = None
+        else:
+            self.value = tuple(self.values[0].tolist())
 
     @staticmethod
     def _is_empty_(data):
         return data is None or len(data) == 0
 
-    @staticmethod
-    def _is_formatted_as_animation_(data):
-        for time_val in data:
-            if isinstance(time_val, tuple) and len(time_val) == 2:
-                return True
-
-    def __init__(self, property_type, data):
-        self.type = property_type
-
-        if self._is_empty_(data):
-            self.value = None
-            self.frames = None
-        elif self._is_formatted_as_animation_(data):
-            self.frames = data
-            self.value = self.frames[0][1]
-        else:
-            self.value = data
-            self.frames = tuple(0.0, data)
+    @property
+    def frames(self):
+        if self.empty():
+            return None
+        return [(time, tuple(values)) for time, values in zip(self.times.tolist(), self.values.tolist())]
 
     def empty(self):
         return self._is_empty_(self.value)
@@ -116,7 +224,7 @@ class NodeProperty:
 
     def key_count(self):
         if not self.empty():
-            return len(self.frames)
+            return len(self.times)
         else:
             return 0
 
@@ -129,66 +237,87 @@ class NodeProperties:
     ePropertyTypeScale = 'scale'
     ePropertyTypeSelfIllum = 'self_illum'
 
+    MDB_CONTROLLER_TYPE_MAP = {
+        Mdb.ControllerType.position.value: ePropertyTypeLocation,
+        Mdb.ControllerType.orientation.value: ePropertyTypeRotation,
+        Mdb.ControllerType.alpha.value: ePropertyTypeAlpha,
+        Mdb.ControllerType.scale.value: ePropertyTypeScale,
+        Mdb.ControllerType.self_illum.value: ePropertyTypeSelfIllum
+    }
+
     @classmethod
     def from_node(cls, node: Mdb.Node):
-        return cls(node.controller_defs.data, node.controller_data.data)
+        return cls(read_array(node.controller_defs), read_array(node.controller_data))
 
-    def __init__(self, controller_defs, controller_data):
+    def __init__(self, controller_defs, controller_data, checked=False):
+        """
+        :param controller_defs: structured array of controller definitions (see mdbio.CONTROLLER_DEF_DTYPE)
+        :param controller_data: float32 array of shared controller data
+        :param checked: controller definitions were already checked against the data (see animation_node_properties)
+        """
 
-        # location, rotation, etc. are either a dict (representing animation) or a single value (no animation, static)
+        # location, rotation, etc. hold the keys of the property, a single key if the property is not animated
         self.location: NodeProperty = None
         self.rotation: NodeProperty = None
         self.scale: NodeProperty = None
         self.self_illum: NodeProperty = None
         self.alpha: NodeProperty = None
 
-        self._mdb_controller_type_map = {
-            'position': self.ePropertyTypeLocation,
-            'orientation': self.ePropertyTypeRotation,
-            'alpha': self.ePropertyTypeAlpha,
-            'scale': self.ePropertyTypeScale,
-            'self_illum': self.ePropertyTypeSelfIllum
-        }
+        self._init_data_(controller_defs, controller_data, checked)
 
-        self._init_data_(controller_defs, controller_data)
+    @classmethod
+    def _known_controllers_(cls, controller_defs):
+        return numpy.isin(controller_defs['controller_type'], list(cls.MDB_CONTROLLER_TYPE_MAP))
 
-    def _is_unknown_controller_type_(self, controller_def):
-        if not isinstance(controller_def.controller_type, Mdb.ControllerType) or \
-                controller_def.controller_type.name not in self._mdb_controller_type_map:
-            return True
-        return False
+    def _init_data_(self, controller_defs, controller_data, checked):
+        data_size = len(controller_data)
 
-    @classmethod
-    def _get_property_data_(cls,
-                            shared_array,
-                            times_start,
-                            values_start,
-                            channel_count,
-                            key_count):
-        times = shared_array[times_start:(times_start + key_count)]
-        values = shared_array[values_start:(values_start + channel_count * key_count)]
-
-        if len(times) == 0 or len(values) == 0 or len(times) != len(values) / channel_count:
-            raise Exception('property data seems to have inconsistent number of keys or values')
-
-        values = [tuple(values[i:(i + channel_count)]) for i
-                  in range(0, len(values), channel_count)]
-        return [tuple([time, value]) for time, value in zip(times, values)]
-
-    def _init_data_(self, controller_defs, controller_data):
-        for controller_def in controller_defs:
-            if self._is_unknown_controller_type_(controller_def):
+        for controller_type, key_count, times_start, values_start, channel_count, _ in controller_defs.tolist():
+            property_type = self.MDB_CONTROLLER_TYPE_MAP.get(controller_type, None)
+            if property_type is None:
                 continue  # log
 
-            property_type = self._mdb_controller_type_map[controller_def.controller_type.name.lower()]
-            self.__setattr__(
-                property_type,
-                NodeProperty(property_type, self._get_property_data_(controller_data,
-                                                                     controller_def.times_start,
-                                                                     controller_def.values_start,
-                                                                     controller_def.channel_count,
-                                                                     controller_def.key_count))
-            )
+            # same check as inconsistent_controllers, a few controllers are checked faster without numpy
+            if not checked and (key_count == 0 or channel_count == 0 or times_start + key_count > data_size or
+                                values_start + key_count * channel_count > data_size):
+                raise Exception('property data seems to have inconsistent number of keys or values')
+
+            self.__setattr__(property_type,
+                             NodeProperty(property_type, *controller_keys(controller_data,
+                                                                          key_count,
+                                                                          times_start,
+                                                                          values_start,
+                                                                          channel_count)))
+
+
+def animation_node_properties(animation: Mdb.Animation, animation_nodes: list = None, animation_name: str = None) -> dict:
+    """
+    node properties of all nodes of an animation, the controllers of all nodes are checked at once
+    :param animation_nodes: the nodes of the animation if already walked, animation may be None then
+    :return: animation node name -> NodeProperties
+    """
+
+    if animation_nodes is None:
+        animation_nodes = get_animation_nodes(animation)
+    if animation_name is None:
+        animation_name = animation.animation_name.string
+    controller_defs = [read_array(node.controller_defs) for node in animation_nodes]
+    controller_data = [read_array(node.controller_data) for node in animation_nodes]
+
+    if len(animation_nodes) > 0:
+        all_controller_defs = numpy.concatenate(controller_defs)
+        controller_counts = [len(defs) for defs in controller_defs]
+        inconsistent = inconsistent_controllers(all_controller_defs,
+                                                numpy.repeat([len(data) for data in controller_data], controller_counts))
+        inconsistent &= NodeProperties._known_controllers_(all_controller_defs)
+        if inconsistent.any():
+            node_of_controller = numpy.repeat(numpy.arange(len(animation_nodes)), controller_counts)
+            raise Exception('animation {} has controllers with inconsistent number of keys or values in nodes {}'.format(
+                animation_name,
+                sorted({animation_nodes[i].name.string for i in node_of_controller[inconsistent]})))
+
+    return {node.name.string: NodeProperties(defs, data, checked=True)
+            for node, defs, data in zip(animation_nodes, controller_defs, controller_data)}
 
 
 # a wrapper class for mdb materials
@@ -205,6 +334,7 @@ class Material:
         self.light_map_name: str = ''
         self.host_node: Mdb.Node = None
         self.material_file_pointer = ''
+        self.material_file_read = False
 
     @staticmethod
     def __parse_material_descr__(material_spec: list):
@@ -306,7 +436,7 @@ class Material:
         if not node.node_type in {Mdb.NodeType.trimesh, Mdb.NodeType.skin}:
             raise Exception("can't parse material for node type '{}'".format(node.node_type))
 
-        material_description = node.node_data.material.data.material_spec
+        material_description = read_material_spec(node.node_data.material)
         light_map_name = node.node_data.light_map_name.string.lstrip().rstrip()
         day_night_transition_string = node.node_data.day_night_transition_string.string.lstrip().rstrip()
 
@@ -337,7 +467,11 @@ class Material:
     def read_material_file(self, material_resource: Resource):
         if material_resource.resource_type != ResourceTypes.MAT:
             raise Exception("can't read from material file which is not of type 'mat'")
-        self.shader, self.textures, self.bumpmaps, self.properties = self.__parse_material_descr__(material_resource.get())
+        self.read_material_lines(material_resource.get())
+
+    def read_material_lines(self, material_lines: list):
+        self.shader, self.textures, self.bumpmaps, self.properties = self.__parse_material_descr__(material_lines)
+        self.material_file_read = True
 
     def is_empty(self):
         return self == Material()
@@ -369,34 +503,308 @@ class Material:
 
         return set(texture_names)
 
+    def bound_texture_names(self) -> tuple:
+        """
+        :return: (diffuse texture, normal map) names the exporters bind to the material, None where there is none
+        """
+        diffuse = next(iter(self.textures.values()), None)
+        if diffuse is None and len(self.texture_strings) > 0:
+            diffuse = self.texture_strings[0]
+        return diffuse, next(iter(self.bumpmaps.values()), None)
+
+
+def node_material(node: Mdb.Node, material_of=None) -> Material:
+    """
+    the material an exporter writes for a mesh node, from material_of (e.g. ConversionContext.material_of) or read
+    from the node if none is given
+    :return: None if the node has no non-empty material, errors reading the material are raised
+    """
+    material = material_of(node) if material_of is not None else Material.from_node(node)
+    if material is None or material.is_empty():
+        return None
+    return material
+
 
 def print_node_tree(node, print_this=lambda nd: nd.node_name.string):
     def recursive_print(nodes, indent_string, depth, print_this):
         if len(nodes) == 0:
             return
-        for node in [node_ptr.data for node_ptr in nodes]:
+        for node in nodes:
             this = print_this(node)
             print(indent_string * depth + this)
-            recursive_print(node.children.data, indent_string, depth + 1, print_this)
+            recursive_print(deref_all(node.children), indent_string, depth + 1, print_this)
 
     print(print_this(node))
-    recursive_print(node.children.data, '-- ', 1, print_this)
+    recursive_print(deref_all(node.children), '-- ', 1, print_this)
 
 
-class MdbWrapper:
+class _LazyNodeList:
 
-    @staticmethod
-    def get_all_nodes(mdb: Mdb) -> List[Mdb.Node]:
-        flat_nodes = []
+    """
+    nodes of a node table restored from the model cache, decoded (and interned) on first access by index
+    """
 
-        def recursive_append_node_and_children(node: Mdb.Node):
-            flat_nodes.append(node)
-            for child in node.children.data:
-                recursive_append_node_and_children(child.data)
+    def __init__(self, mdb: Mdb, offsets: numpy.ndarray):
+        self.mdb = mdb
+        self.offsets = offsets
 
-        recursive_append_node_and_children(mdb.root_node)
+    def __len__(self):
+        return len(self.offsets)
 
-        return flat_nodes
+    def __getitem__(self, index: int) -> Mdb.Node:
+        return decode_at(self.mdb, 'node', int(self.offsets[index]))
+
+    def __iter__(self):
+        for index in range(len(self.offsets)):
+            yield self[index]
+
+
+class NodeTable:
+
+    """
+    flat, array-backed table of the node tree of an mdb
+    nodes are indexed in depth-first order (same order as the recursive walk), the tree is described by parallel arrays
+    indexed by node index, -1 meaning 'none'; built once, iteratively, or restored from the model cache
+    """
+
+    ARRAY_NAMES = ('offset', 'parent_index', 'node_type', 'min_lod', 'max_lod', 'first_child', 'next_sibling')
+
+    def __init__(self, mdb: Mdb):
+
+        self.nodes: List[Mdb.Node] = []
+        self.names: List[str] = []
+        self.name_index = {}  # node name -> node index, only for unique names
+        self.duplicate_names = set()
+
+        self.offset: numpy.ndarray = None  # absolute offset of the node record in the file
+        self.parent_index: numpy.ndarray = None
+        self.node_type: numpy.ndarray = None
+        self.min_lod: numpy.ndarray = None
+        self.max_lod: numpy.ndarray = None
+        self.first_child: numpy.ndarray = None
+        self.next_sibling: numpy.ndarray = None
+
+        model = cached_model(mdb)
+        if model is not None:
+            self._init_from_cached_model_(mdb, model)
+        else:
+            self._init_from_node_tree_(mdb)
+
+        for index, name in enumerate(self.names):
+            if name in self.name_index or name in self.duplicate_names:
+                self.name_index.pop(name, None)
+                self.duplicate_names.add(name)
+            else:
+                self.name_index[name] = index
+
+    def _init_from_cached_model_(self, mdb: Mdb, model):
+        self.names = [sys.intern(name) for name in model.node_names]
+        for array_name in self.ARRAY_NAMES:
+            setattr(self, array_name, model.node_array(array_name))
+        self.nodes = _LazyNodeList(mdb, self.offset)
+
+    def _init_from_node_tree_(self, mdb: Mdb):
+
+        offset = []
+        parent_index = []
+        node_type = []
+        min_lod = []
+        max_lod = []
+        first_child = []
+        next_sibling = []
+        last_child = []
+
+        pending = [(mdb.root_node, mdb.header.offset_root_node + 32, -1)]
+        while len(pending) > 0:
+            node, node_offset, parent = pending.pop()
+
+            index = len(self.nodes)
+            self.nodes.append(node)
+            self.names.append(sys.intern(node.node_name.string))
+
+            offset.append(node_offset)
+            parent_index.append(parent)
+            node_type.append(node.node_type.value if isinstance(node.node_type, Mdb.NodeType) else node.node_type)
+            min_lod.append(node.min_lod)
+            max_lod.append(node.max_lod)
+            first_child.append(-1)
+            next_sibling.append(-1)
+            last_child.append(-1)
+
+            if parent != -1:
+                if first_child[parent] == -1:
+                    first_child[parent] = index
+                else:
+                    next_sibling[last_child[parent]] = index
+                last_child[parent] = index
+
+            pending.extend((deref(child_ptr), child_ptr.offset + child_ptr.additional_offset, index)
+                           for child_ptr in reversed(node.children.data))
+
+        self.offset = numpy.array(offset, dtype=numpy.uint32)
+        self.parent_index = numpy.array(parent_index, dtype=numpy.int32)
+        self.node_type = numpy.array(node_type, dtype=numpy.uint32)
+        self.min_lod = numpy.array(min_lod, dtype=numpy.int32)
+        self.max_lod = numpy.array(max_lod, dtype=numpy.int32)
+        self.first_child = numpy.array(first_child, dtype=numpy.int32)
+        self.next_sibling = numpy.array(next_sibling, dtype=numpy.int32)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def index_of(self, name: str) -> int:
+        """
+        :return: index of the node with this name, None if there is no such node or more than one
+        """
+        return self.name_index.get(name, None)
+
+    def children_of(self, index: int) -> List[int]:
+        children = []
+        child = self.first_child[index]
+        while child != -1:
+            children.append(int(child))
+            child = self.next_sibling[child]
+        return children
+
+    def kept_indices(self, skip_names_containing) -> List[int]:
+        """
+        :return: indices (in order) of the nodes under the root that are kept when the nodes with a name containing
+        any of the words are skipped together with their children
+        """
+        kept = []
+        pending = list(self.children_of(0))
+        while len(pending) > 0:
+            index = pending.pop()
+            if any(word in self.names[index] for word in skip_names_containing):
+                continue
+            kept.append(index)
+            pending.extend(self.children_of(index))
+        return sorted(kept)
+
+    def indices_of_type(self, *node_types) -> List[int]:
+        return numpy.flatnonzero(numpy.isin(self.node_type, [node_type.value for node_type in node_types])).tolist()
+
+    def nodes_of_type(self, *node_types) -> List[Mdb.Node]:
+        return [self.nodes[i] for i in self.indices_of_type(*node_types)]
+
+
+class NodeTransforms:
+
+    """
+    the node properties of some nodes of a node table with their static locations and rotations gathered, so an
+    exporter converts all of them in one call; errors lists (node index, error) of the nodes that could not be read
+    """
+
+    def __init__(self, table: NodeTable, indices: List[int]):
+
+        self.properties: List[NodeProperties] = [None] * len(table)
+        self.errors = []
+
+        self._location_indices, self._locations = [], []
+        self._rotation_indices, self._rotations = [], []
+        for index in indices:
+            try:
+                properties = NodeProperties.from_node(table.nodes[index])
+            except Exception as e:
+                self.errors.append((index, e))
+                continue
+            self.properties[index] = properties
+            if properties.location is not None and not properties.location.empty():
+                self._location_indices.append(index)
+                self._locations.append(properties.location.value)
+            if properties.rotation is not None and not properties.rotation.empty():
+                self._rotation_indices.append(index)
+                self._rotations.append(properties.rotation.value)
+
+    def _per_node_(self, indices: List[int], values: list, convert) -> list:
+        per_node = [None] * len(self.properties)
+        if len(values) > 0:
+            for index, value in zip(indices, numpy.asarray(convert(values)).tolist()):
+                per_node[index] = value
+        return per_node
+
+    def locations(self, convert) -> list:
+        """
+        :param convert: (N, 3) locations -> (N, k) in the target system, e.g. CoordinateSystemService.transform_points
+        :return: the converted static location of every node, None where a node has none
+        """
+        return self._per_node_(self._location_indices, self._locations, convert)
+
+    def rotations(self, convert) -> list:
+        """
+        :param convert: (N, 4) quaternions (x, y, z, w) -> (N, k) in the target system
+        :return: the converted static rotation of every node, None where a node has none
+        """
+        return self._per_node_(self._rotation_indices, self._rotations, convert)
+
+
+def node_table(mdb: Mdb) -> NodeTable:
+    """
+    the node table of an mdb, built on first request and cached on the mdb
+    """
+    if not hasattr(mdb, '_m_node_table'):
+        mdb._m_node_table = NodeTable(mdb)
+    return mdb._m_node_table
+
+
+def get_animation_nodes(animation: Mdb.Animation, interned: bool = True) -> List[Mdb.AnimationNode]:
+    """
+    :param interned: resolve the node pointers through the interning table of the mdb (see mdbio.deref), if False
+    the nodes are only cached on the pointers of the animation and released with it
+    """
+
+    def resolve(ptr: Mdb.Ptr):
+        return deref(ptr) if interned else ptr.data
+
+    animation_nodes: List[Mdb.AnimationNode] = []
+
+    pending = [resolve(animation.root_animation_node)]
+    while len(pending) > 0:
+        anim_node = pending.pop()
+        animation_nodes.append(anim_node)
+        pending.extend(resolve(child_ptr) for child_ptr in reversed(anim_node.children.data))
+
+    return animation_nodes
+
+
+def get_animation_names(mdb: Mdb) -> List[str]:
+    return [name for name, _ in animation_offsets(mdb)]
+
+
+def _read_animation_at(mdb: Mdb, offset: int) -> Animation:
+    return Animation.from_mdb_animation(decode_detached(mdb, 'animation', offset))
+
+
+def read_animation(mdb: Mdb, name: str) -> Animation:
+    """
+    decodes a single animation of an mba file by name (the first one if the name repeats), none of the other
+    animations are decoded
+    """
+    for animation_name, offset in animation_offsets(mdb):
+        if animation_name == name:
+            return _read_animation_at(mdb, offset)
+    raise Exception('no animation with name {} found'.format(name))
+
+
+def iter_animations(mdb: Mdb, names: List[str] = None):
+    """
+    yields the animations of an mba file (all, including repeated names, or the ones named) one at a time; each one
+    is decoded when it is requested and released once the caller drops it, so only one animation is held in memory
+    at a time
+    """
+    if names is not None:
+        for name in names:
+            yield read_animation(mdb, name)
+        return
+    for _, offset in animation_offsets(mdb):
+        yield _read_animation_at(mdb, offset)
+
+
+class MdbWrapper:
+
+    @staticmethod
+    def get_all_nodes(mdb: Mdb) -> List[Mdb.Node]:
+        return get_all_nodes(mdb)
 
     @staticmethod
     def get_all_materials(mdb: Mdb) -> Material:
@@ -416,63 +824,22 @@ class MdbWrapper:
 
     @staticmethod
     def get_all_bones(mdb: Mdb) -> List[Mdb.Node]:
-
-        bones: List[Mdb.Node] = []
-        nodes = get_all_nodes(mdb)
-
-        skins = [node for node in get_all_nodes(mdb) if node.node_type == Mdb.NodeType.skin]
-        for skin in skins:
-            for bone in skin.node_data.bones.data:
-                if bone.bone_name.string not in [node.node_name.string for node in bones]:
-                    nodes_matched_by_bone_name = [node for node in nodes if
-                                                  node.node_name.string == bone.bone_name.string]
-                    if len(nodes_matched_by_bone_name) != 1:
-                        raise Exception('found zero or >1 nodes matching the bone name')
-                    bones.append(nodes_matched_by_bone_name[0])
-
-        return bones
+        return get_all_bones(mdb)
 
     @staticmethod
     def get_all_animated_nodes(mdb: Mdb) -> List[Mdb.Node]:
-
-        def get_animation_nodes(animation: Mdb.Animation) -> List[Mdb.AnimationNode]:
-
-            animation_nodes: List[Mdb.AnimationNode] = []
-
-            def add_animation_nodes_recursive(anim_node: Mdb.AnimationNode):
-                animation_nodes.append(anim_node)
-                for anim_child_node in anim_node.children.data:
-                    add_animation_nodes_recursive(anim_child_node.data)
-
-            add_animation_nodes_recursive(animation.root_animation_node.data)
-
-            return animation_nodes
-
-        nodes = get_all_nodes(mdb)
-        animations = mdb.animations.animation_array_pointer.data
-
-        animated_nodes: List[Mdb.Node] = []
-
-        for animation in animations:
-            animation_nodes = get_animation_nodes(animation.data)
-            for animation_node in animation_nodes:
-                nodes_matching_by_animated_node_name = [node for node in nodes if
-                                                        node.node_name.string == animation_node.name.string]
-                if len(nodes_matching_by_animated_node_name) != 1:
-                    raise Exception('found 0 or >1 nodes matching animated node by name')
-                animated_nodes.append(nodes_matching_by_animated_node_name[0])
-
-        return animated_nodes
+        return get_all_animated_nodes(mdb)
 
     def _init_data(self):
         if self.mdb is None:
             return
 
         # nodes
-        self.nodes = self.get_all_nodes(self.mdb)
+        self.node_table = node_table(self.mdb)
+        self.nodes = self.node_table.nodes
 
         # meshes
-        self.meshes = [node for node in self.nodes if node.node_type in {Mdb.NodeType.skin, Mdb.NodeType.trimesh}]
+        self.meshes = self.node_table.nodes_of_type(Mdb.NodeType.skin, Mdb.NodeType.trimesh)
 
         # materials
         all_materials = []
@@ -509,10 +876,14 @@ class MdbWrapper:
         return all_used_texture_names
 
     def get_node_by_name(self, name: str):
-        return self.get_node_by(lambda nd: nd.node_name.string == name)
+        if name in self.node_table.duplicate_names:
+            return self.get_node_by(lambda nd: nd.node_name.string == name)
+        index = self.node_table.index_of(name)
+        return self.nodes[index] if index is not None else None
 
     def __init__(self, mdb: Mdb):
         self.mdb = mdb
+        self.node_table: NodeTable = None
         self.nodes = []
         self.meshes = []
         self.materials = []
@@ -522,16 +893,7 @@ class MdbWrapper:
 
 
 def get_all_nodes(mdb: Mdb) -> List[Mdb.Node]:
-    flat_nodes = []
-
-    def recursive_append_node_and_children(node: Mdb.Node):
-        flat_nodes.append(node)
-        for child in node.children.data:
-            recursive_append_node_and_children(child.data)
-
-    recursive_append_node_and_children(mdb.root_node)
-
-    return flat_nodes
+    return list(node_table(mdb).nodes)
 
 
 def get_all_materials(mdb: Mdb) -> Material:
@@ -547,49 +909,37 @@ def get_all_materials(mdb: Mdb) -> Material:
     return materials
 
 
+def _node_by_unique_name(table: NodeTable, name: str, error_message: str) -> Mdb.Node:
+    index = table.index_of(name)
+    if index is None:
+        raise Exception(error_message)
+    return table.nodes[index]
+
+
 def get_all_bones(mdb: Mdb) -> List[Mdb.Node]:
 
     bones: List[Mdb.Node] = []
-    nodes = get_all_nodes(mdb)
+    bone_names = set()
+    table = node_table(mdb)
 
-    skins = [node for node in get_all_nodes(mdb) if node.node_type == Mdb.NodeType.skin]
-    for skin in skins:
-        for bone in skin.node_data.bones.data:
-            if bone.bone_name.string not in [node.node_name.string for node in bones]:
-                nodes_matched_by_bone_name = [node for node in nodes if node.node_name.string == bone.bone_name.string]
-                if len(nodes_matched_by_bone_name) != 1:
-                    raise Exception('found zero or >1 nodes matching the bone name')
-                bones.append(nodes_matched_by_bone_name[0])
+    for skin in table.nodes_of_type(Mdb.NodeType.skin):
+        for bone_name in read_bone_names(skin.node_data.bones):
+            if bone_name not in bone_names:
+                bone_names.add(bone_name)
+                bones.append(_node_by_unique_name(table, bone_name, 'found zero or >1 nodes matching the bone name'))
 
     return bones
 
 
 def get_all_animated_nodes(mdb: Mdb) -> List[Mdb.Node]:
 
-    def get_animation_nodes(animation: Mdb.Animation) -> List[Mdb.AnimationNode]:
-
-        animation_nodes: List[Mdb.AnimationNode] = []
-
-        def add_animation_nodes_recursive(anim_node: Mdb.AnimationNode):
-            animation_nodes.append(anim_node)
-            for anim_child_node in anim_node.children.data:
-                add_animation_nodes_recursive(anim_child_node.data)
-
-        add_animation_nodes_recursive(animation.root_animation_node.data)
-
-        return animation_nodes
-
-    nodes = get_all_nodes(mdb)
-    animations = mdb.animations.animation_array_pointer.data
+    table = node_table(mdb)
 
     animated_nodes: List[Mdb.Node] = []
 
-    for animation in animations:
-        animation_nodes = get_animation_nodes(animation.data)
-        for animation_node in animation_nodes:
-            nodes_matching_by_animated_node_name = [node for node in nodes if node.node_name.string == animation_node.name.string]
-            if len(nodes_matching_by_animated_node_name) != 1:
-                raise Exception('found 0 or >1 nodes matching animated node by name')
-            animated_nodes.append(nodes_matching_by_animated_node_name[0])
+    for animation in iter_animations(mdb):
+        for animation_node in animation.anim_nodes:
+            animated_nodes.append(_node_by_unique_name(table, animation_node.name.string,
+                                                       'found 0 or >1 nodes matching animated node by name'))
 
     return animated_nodes
@@ -0,0 +1,333 @@
+from .mdb import Mdb
+from .mdbio import MappedKaitaiStream, PARSER_VERSION, ARRAY_DTYPES, read_array, deref, set_model_cache
+from .mdbutil import NodeTable, node_table, iter_animations
+from .resources import Directory, ResourceManager, ResourceTypes
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import numpy
+
+'''
+persistent on-disk cache of decoded models
+
+an entry holds the node table, the geometry and controller arrays and the material spec lines of one mdb/mba file;
+it is keyed by the file identity (path, size and modification time, or a hash of the content) and the parser version,
+so changed files and parser changes simply miss the cache
+
+an entry is two files: <key>.npy, a single uint8 blob with all arrays which is memory-mapped on load, and
+<key>.json, the index into the blob; the json is written last and marks the entry as complete
+
+both files are written under a unique temporary name and renamed into place, so processes storing the same entry
+at the same time never write into each other's files
+'''
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE_BYTES = 2 * 1024 ** 3
+
+_ALIGNMENT = 8
+
+
+class CachedModel:
+
+    """
+    a cache entry as loaded from disk, arrays are read-only views into the memory-mapped blob
+    """
+
+    def __init__(self, index: dict, payload: numpy.ndarray):
+        self.index = index
+        self.payload = payload
+        self.node_names = index['node_names']
+
+    def _view(self, dtype: numpy.dtype, start: int, count: int) -> numpy.ndarray:
+        return numpy.frombuffer(self.payload, dtype=dtype, count=count, offset=start)
+
+    def node_array(self, name: str) -> numpy.ndarray:
+        dtype, start, count = self.index['node_arrays'][name]
+        return self._view(numpy.dtype(dtype), start, count)
+
+    @staticmethod
+    def array_key(array_ptr: Mdb.ArrayPtr) -> str:
+        return '{}@{}'.format(array_ptr.dtype, array_ptr.first_element_offset + array_ptr.additional_offset)
+
+    def has_array(self, array_ptr: Mdb.ArrayPtr) -> bool:
+        entry = self.index['arrays'].get(self.array_key(array_ptr), None)
+        return entry is not None and entry[1] == array_ptr.size
+
+    def array(self, array_ptr: Mdb.ArrayPtr) -> numpy.ndarray:
+        start, count = self.index['arrays'][self.array_key(array_ptr)]
+        return self._view(ARRAY_DTYPES[array_ptr.dtype], start, count)
+
+    def material_spec(self, offset: int) -> list:
+        return self.index['material_specs'].get(str(offset), None)
+
+
+class _PayloadWriter:
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def add(self, array: numpy.ndarray) -> int:
+        data = numpy.ascontiguousarray(array).tobytes()
+        start = self.size
+        padding = (-len(data)) % _ALIGNMENT
+        self.chunks.append(data)
+        self.chunks.append(b'\x00' * padding)
+        self.size += len(data) + padding
+        return start
+
+    def payload(self) -> numpy.ndarray:
+        return numpy.frombuffer(b''.join(self.chunks), dtype=numpy.uint8)
+
+
+def build_cached_model(mdb: Mdb, file_path: str) -> CachedModel:
+    """
+    decodes everything a cache entry holds from the mdb into an in-memory model (not written anywhere)
+    """
+
+    writer = _PayloadWriter()
+    index = {
+        'file': os.path.abspath(file_path),
+        'parser_version': PARSER_VERSION,
+        'node_names': [],
+        'node_arrays': {},
+        'arrays': {},
+        'material_specs': {}
+    }
+
+    def add_array(array_ptr: Mdb.ArrayPtr):
+        index['arrays'][CachedModel.array_key(array_ptr)] = [writer.add(read_array(array_ptr)), array_ptr.size]
+
+    table = node_table(mdb)
+    index['node_names'] = list(table.names)
+    for array_name in NodeTable.ARRAY_NAMES:
+        array = getattr(table, array_name)
+        index['node_arrays'][array_name] = [array.dtype.str, writer.add(array), len(array)]
+
+    for node in table.nodes:
+        add_array(node.controller_defs)
+        add_array(node.controller_data)
+
+        if node.node_type not in {Mdb.NodeType.trimesh, Mdb.NodeType.skin}:
+            continue
+
+        trimesh: Mdb.Trimesh = node.node_data
+        for array_ptr in [trimesh.vertices, trimesh.normals, trimesh.tangents, trimesh.binormals,
+                          trimesh.faces] + trimesh.uvs:
+            add_array(array_ptr)
+        if trimesh.is_skin:
+            add_array(trimesh.bones)
+            add_array(trimesh.weights)
+
+        try:
+            material_offset = trimesh.material.offset + trimesh.material.additional_offset
+            index['material_specs'][str(material_offset)] = deref(trimesh.material).material_spec
+        except Exception:
+            pass  # not every mesh has a readable material, Material.from_node reports it where it matters
+
+    if file_path.lower().endswith('.' + ResourceTypes.MBA.extension):
+        for animation in iter_animations(mdb):
+            for animation_node in animation.anim_nodes:
+                add_array(animation_node.controller_defs)
+                add_array(animation_node.controller_data)
+
+    payload = writer.payload()
+    index['payload_size'] = len(payload)
+
+    return CachedModel(index, payload)
+
+
+class ModelCache:
+
+    """
+    size-bounded cache of decoded models in a directory, least recently used entries are evicted first
+    identity: 'stat' keys entries by path, size and modification time, 'content' by a hash of the file content
+    """
+
+    def __init__(self, directory: str, max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES, identity: str = 'stat'):
+
+        if identity not in {'stat', 'content'}:
+            raise Exception("unknown model cache identity '{}'".format(identity))
+
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self.identity = identity
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    def key(self, file_path: str) -> str:
+        if self.identity == 'content':
+            with open(file_path, 'rb') as f:
+                identity = hashlib.sha1(f.read()).hexdigest()
+        else:
+            stat = os.stat(file_path)
+            identity = '{}|{}|{}'.format(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        return hashlib.sha1('{}|{}'.format(identity, PARSER_VERSION).encode('utf8')).hexdigest()
+
+    def _entry_paths(self, key: str):
+        return os.path.join(self.directory, key + '.json'), os.path.join(self.directory, key + '.npy')
+
+    def load(self, file_path: str) -> CachedModel:
+        """
+        :return: the cached model for this file, None if there is no valid entry
+        """
+
+        index_path, payload_path = self._entry_paths(self.key(file_path))
+        if not os.path.exists(index_path) or not os.path.exists(payload_path):
+            return None
+
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        if index.get('parser_version', None) != PARSER_VERSION:
+            return None
+
+        payload = numpy.load(payload_path, mmap_mode='r' if index['payload_size'] > 0 else None)
+        os.utime(index_path)  # recently used
+        return CachedModel(index, payload)
+
+    def _write_entry_file(self, path: str, write):
+        descriptor, temporary_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                                      dir=self.directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                write(f)
+            os.replace(temporary_path, path)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            raise
+
+    def store(self, mdb: Mdb, file_path: str, evict: bool = True) -> CachedModel:
+        """
+        decodes everything the cache holds from the mdb and writes a new entry for the file
+        :param evict: False to leave the cache size to a later evict() (when storing many entries)
+        """
+
+        model = build_cached_model(mdb, file_path)
+
+        index_path, payload_path = self._entry_paths(self.key(file_path))
+        self._write_entry_file(payload_path, lambda f: numpy.save(f, model.payload))
+        self._write_entry_file(index_path, lambda f: f.write(json.dumps(model.index).encode('utf8')))
+
+        if evict:
+            self.evict()
+
+        return model
+
+    def open(self, file_path: str) -> Mdb:
+        """
+        loads an mdb memory-mapped with its cached model attached, the model is decoded and stored on a cache miss
+        """
+
+        mdb = Mdb(MappedKaitaiStream.from_file(file_path))
+
+        model = self.load(file_path)
+        if model is None:
+            try:
+                model = self.store(mdb, file_path)
+            except Exception:
+                return mdb  # decoding errors surface where the model is used, nothing is cached
+
+        mdb._m_cached_model = model
+        return mdb
+
+    def _entries(self):
+        """
+        :return: (index path, payload path, size, last use) of all complete entries
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.json'):
+                continue
+            index_path, payload_path = self._entry_paths(file_name[:-len('.json')])
+            try:
+                size = os.path.getsize(index_path) + os.path.getsize(payload_path)
+                entries.append((index_path, payload_path, size, os.path.getmtime(index_path)))
+            except OSError:
+                continue
+        return entries
+
+    def size(self) -> int:
+        return sum(entry[2] for entry in self._entries())
+
+    def evict(self):
+        entries = self._entries()
+        total_size = sum(entry[2] for entry in entries)
+        if total_size <= self.max_size_bytes:
+            return
+        for index_path, payload_path, size, _ in sorted(entries, key=lambda entry: entry[3]):
+            if total_size <= self.max_size_bytes:
+                break
+            self._remove(index_path, payload_path)
+            total_size -= size
+
+    def clear(self):
+        for index_path, payload_path, _, _ in self._entries():
+            self._remove(index_path, payload_path)
+
+    @staticmethod
+    def _remove(index_path: str, payload_path: str):
+        for path in (index_path, payload_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # still mapped by another process (windows) or already removed
+
+    def warm(self, resource_manager: ResourceManager) -> int:
+        """
+        makes sure all mdb and mba files of the resource manager are cached, the cache is evicted once at the end
+        :return: number of files newly stored
+        """
+        stored = 0
+        for resource in resource_manager.get_all_of_type((ResourceTypes.MDB, ResourceTypes.MBA)):
+            file_path = resource.file.full_path
+            if self.load(file_path) is None:
+                try:
+                    self.store(Mdb(MappedKaitaiStream.from_file(file_path)), file_path, evict=False)
+                    stored += 1
+                except Exception as e:
+                    logger.error('could not cache {}: {}'.format(file_path, e))
+        self.evict()
+        return stored
+
+
+def model_cache_from_settings(settings) -> ModelCache:
+    """
+    builds a model cache from the 'model-cache' application settings (directory, max-size-mb, identity)
+    """
+    return ModelCache(settings['directory'],
+                      int(float(settings.get('max-size-mb', default=DEFAULT_MAX_SIZE_BYTES / 1024 ** 2)) * 1024 ** 2),
+                      settings.get('identity', default='stat'))
+
+
+def install_model_cache(settings):
+    """
+    installs the model cache configured in the application settings for open_mdb, does nothing if none is configured
+    """
+    if settings is not None:
+        set_model_cache(model_cache_from_settings(settings))
+
+
+if __name__ == '__main__':
+    args = sys.argv
+
+    if len(args) < 3 or args[1] not in {'warm', 'clear'}:
+        print('usage: modelcache warm <cache directory> <witcher data directory> [max size in mb]\n'
+              '       modelcache clear <cache directory>')
+        sys.exit(1)
+
+    if args[1] == 'clear':
+        ModelCache(args[2]).clear()
+    else:
+        logging.basicConfig(format='%(message)s')
+        max_size_bytes = int(float(args[4]) * 1024 ** 2) if len(args) > 4 else DEFAULT_MAX_SIZE_BYTES
+        cache = ModelCache(args[2], max_size_bytes)
+        print('cached {} new models, cache size is {} bytes'.format(
+            cache.warm(ResourceManager(Directory(args[3]))), cache.size()))
@@ -1,11 +1,63 @@
 # a utility for managing / loading the witcher game resources from the root folder with resources
 import re
 
-from .mdb import Mdb
+from .mdbio import open_mdb
 import os
 import ntpath
 
 
+class DirectoryListing:
+
+    """
+    the file and subdirectory names of a directory, read with one scandir and kept until refresh() sees the
+    modification time of the directory change; files are found by name without touching the file system
+    """
+
+    def __init__(self, full_directory_path: str):
+        self.full_path = full_directory_path
+        self.modification_time = None
+        self.file_names = {}  # lowercase file name -> file names
+        self.subdirectory_names = []
+        self._files = {}  # file name -> File, created on first find
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """
+        reads the directory again if it changed since it was last read
+        :return: True if it was read
+        """
+        modification_time = os.stat(self.full_path).st_mtime_ns
+        if modification_time == self.modification_time:
+            return False
+
+        file_names = {}
+        subdirectory_names = []
+        with os.scandir(self.full_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirectory_names.append(entry.name)
+                elif entry.is_file():
+                    file_names.setdefault(entry.name.lower(), []).append(entry.name)
+
+        self.modification_time = modification_time
+        self.file_names = file_names
+        self.subdirectory_names = sorted(subdirectory_names)
+        self._files = {}
+        return True
+
+    def find(self, file_name: str):
+        """
+        :return: the File with this name, or with this name in another case if there is none; None if neither exists
+        """
+        names = self.file_names.get(file_name.lower(), None)
+        if names is None:
+            return None
+        name = file_name if file_name in names else names[0]
+        if name not in self._files:
+            self._files[name] = File(os.path.join(self.full_path, name))
+        return self._files[name]
+
+
 class FileSystem:
 
     """
@@ -14,6 +66,7 @@ class FileSystem:
 
     def __init__(self):
         self.directories = []
+        self.listings = {}  # full directory path -> DirectoryListing
 
     def get_directory(self, directory):
         # try to return cached data
@@ -22,6 +75,15 @@ class FileSystem:
         else:
             return directory
 
+    def listing(self, full_directory_path: str) -> DirectoryListing:
+        """
+        the listing of a directory, read once per process; call its refresh() to pick up changes
+        """
+        full_directory_path = os.path.abspath(full_directory_path)
+        if full_directory_path not in self.listings:
+            self.listings[full_directory_path] = DirectoryListing(full_directory_path)
+        return self.listings[full_directory_path]
+
 
 FILE_SYSTEM = FileSystem()
 
@@ -255,12 +317,12 @@ class ResourceTypes:
     MDB = ResourceType(name='mdb',
                        extension='.mdb',
                        validator=is_mdb_binary,
-                       loader=Mdb.from_file)
+                       loader=open_mdb)
 
     MBA = ResourceType(name='mba',
                        extension='.mba',
                        validator=is_mdb_binary,
-                       loader=Mdb.from_file)
+                       loader=open_mdb)
 
     MDBT = ResourceType(name='mdbt',
                         extension='.mdb',
@@ -298,6 +360,63 @@ class Resource:
         return self.resource_type.load_resource_data(self.file)
 
 
+class TextureNameIndex:
+
+    """
+    the texture files of a resource manager by normalised name (case-folded), each name's candidates ranked by the
+    priority of their extension (first of extensions is best)
+
+    a texture name is looked up as it is and, if it ends with a one letter suffix (_a, _n, ...), without it, like
+    'cr_drown1_c1_a' -> 'cr_drown1_c1'; what a name resolves to is remembered, so locating a name again is a single
+    dict lookup
+    """
+
+    def __init__(self, files: list, extensions: list):
+
+        self.extensions = list(extensions)
+        priority = {extension.lower(): rank for rank, extension in enumerate(self.extensions)}
+
+        self.candidates = {}  # normalised name -> files, best first
+        for file in files:
+            if file.extension is not None and file.extension.lower() in priority:
+                self.candidates.setdefault(file.name.lower(), []).append(file)
+        for files_of_name in self.candidates.values():
+            files_of_name.sort(key=lambda file: (priority[file.extension.lower()], file.full_path))
+
+        # names whose two best candidates have the same extension, the first is used
+        self.ambiguous_names = sorted(name for name, files_of_name in self.candidates.items()
+                                      if len(files_of_name) > 1 and
+                                      files_of_name[0].extension.lower() == files_of_name[1].extension.lower())
+
+        self._resolved = {}  # texture name -> normalised name it was found under, None if not found
+
+    @staticmethod
+    def normalised_names(texture_name: str) -> list:
+        """
+        the normalised names a texture name is looked up under, in order
+        """
+        names = [texture_name.lower()]
+        if len(texture_name) > 2 and texture_name[-2] == '_':
+            names.append(texture_name[:-2].lower())
+        return names
+
+    def resolve(self, texture_name: str) -> str:
+        """
+        :return: the normalised name texture_name is found under, None if there is none
+        """
+        if texture_name not in self._resolved:
+            self._resolved[texture_name] = next((name for name in self.normalised_names(texture_name)
+                                                 if name in self.candidates), None)
+        return self._resolved[texture_name]
+
+    def locate(self, texture_name: str) -> File:
+        """
+        :return: the best candidate for the texture name, None if there is none
+        """
+        name = self.resolve(texture_name)
+        return self.candidates[name][0] if name is not None else None
+
+
 class ResourceManager:
 
     def __init__(self, root_dir):
@@ -305,6 +424,7 @@ class ResourceManager:
         self.root_directory: Directory = None
         self.files = None
         self.file_hash = {}
+        self._texture_name_indices = {}  # tuple of extensions -> TextureNameIndex
 
         if root_dir is None:
             return
@@ -389,5 +509,14 @@ class ResourceManager:
     def get_by_file_name(self, file_name: str):
         return self.file_hash.get(file_name, [])
 
+    def texture_name_index(self, extensions: list) -> TextureNameIndex:
+        """
+        the index of the files with one of the extensions (in order of preference), built on first use
+        """
+        key = tuple(extensions)
+        if key not in self._texture_name_indices:
+            self._texture_name_indices[key] = TextureNameIndex(self.files, extensions)
+        return self._texture_name_indices[key]
+
     def get_by_file_name_pattern(self, file_name_pattern: re.Pattern):
         return [Resource(file) for file in self.root_directory.search(file_name_pattern)]
@@ -0,0 +1,154 @@
+from .mdb import Mdb
+from .mdbio import MappedKaitaiStream, cached_model
+from .modelcache import CachedModel, build_cached_model
+from multiprocessing import shared_memory, resource_tracker
+import os
+import numpy
+
+'''
+hand-off of decoded models between worker processes through shared memory
+
+publish_model puts the payload of a decoded model (the same node table, geometry and controller arrays and material
+specs a model cache entry holds, see modelcache.py) into a multiprocessing.shared_memory segment and returns a
+SharedModelDescriptor; only the descriptor (segment name and the index into the payload) is pickled when it is passed
+to a task, open_shared_model in the receiving process maps the segment and attaches it to the mdb as its cached model,
+so read_array, node_table etc. return views into the segment instead of decoding again
+
+a segment lives until it is released; a task that consumes a shared model declares it with
+IgniApplicationEntity.releases(descriptor), and the application releases the segment once that task is done, whether it
+succeeded or not:
+
+    descriptor = publish_model(mdb, file_path)
+    try:
+        Application().submit_task(FbxFileExportJob(...).from_shared_model(descriptor))
+    except Exception:
+        release_shared_model(descriptor)
+        raise
+
+segments are not left to the resource tracker of the process that happened to create or attach them (it would unlink
+them when that worker exits), ownership goes with the descriptor. the publishing process keeps its handle to a segment
+open until the segment is released: windows frees a named segment as soon as its last handle is closed, the worker
+attaching it would find it gone
+'''
+
+
+class SharedModelDescriptor:
+
+    """
+    picklable reference to a model published to shared memory
+    """
+
+    def __init__(self, file_path: str, segment_name: str, index: dict):
+        self.file_path = file_path
+        self.segment_name = segment_name
+        self.index = index
+
+    def __repr__(self):
+        return 'SharedModelDescriptor({}, {}, {} bytes)'.format(
+            self.file_path, self.segment_name, self.index['payload_size'])
+
+
+# segments published by this process by name, open until released
+_PUBLISHED = {}
+
+# segments attached in this process by name; views into them may outlive the mdb they were attached to, so segments
+# are only closed once nothing refers to them anymore (see _close_detached)
+_ATTACHED = {}
+_DETACHED = []
+
+
+def _untrack(segment: shared_memory.SharedMemory):
+    if os.name == 'posix':
+        resource_tracker.unregister(segment._name, 'shared_memory')
+
+
+def _unlink(segment: shared_memory.SharedMemory):
+    if os.name == 'posix':
+        resource_tracker.register(segment._name, 'shared_memory')  # unlink unregisters it again
+    segment.unlink()
+
+
+def _close_detached():
+    for segment in list(_DETACHED):
+        try:
+            segment.close()
+            _DETACHED.remove(segment)
+        except BufferError:
+            pass  # views into the segment are still alive, retried on the next detach
+
+
+def publish_model(mdb: Mdb, file_path: str) -> SharedModelDescriptor:
+    """
+    copies the decoded model of an mdb into a new shared memory segment
+    the arrays of a model loaded through the model cache are not decoded again
+    """
+
+    model = cached_model(mdb)
+    if model is None:
+        model = build_cached_model(mdb, file_path)
+
+    size = model.index['payload_size']
+    segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    _untrack(segment)
+    try:
+        numpy.frombuffer(segment.buf, dtype=numpy.uint8, count=size)[:] = model.payload
+    except BaseException:
+        segment.close()
+        _unlink(segment)
+        raise
+    _PUBLISHED[segment.name] = segment
+
+    return SharedModelDescriptor(os.path.abspath(file_path), segment.name, model.index)
+
+
+def attach_shared_model(descriptor: SharedModelDescriptor) -> CachedModel:
+    """
+    maps the segment of a shared model, the arrays of the returned model are read-only views into it
+    """
+
+    segment = _ATTACHED.get(descriptor.segment_name, None)
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=descriptor.segment_name)
+        _untrack(segment)
+        _ATTACHED[descriptor.segment_name] = segment
+
+    payload = numpy.frombuffer(segment.buf, dtype=numpy.uint8, count=descriptor.index['payload_size'])
+    payload.flags.writeable = False
+    return CachedModel(descriptor.index, payload)
+
+
+def open_shared_model(descriptor: SharedModelDescriptor) -> Mdb:
+    """
+    loads the mdb of a shared model memory-mapped with the shared model attached (see open_mdb)
+    """
+    mdb = Mdb(MappedKaitaiStream.from_file(descriptor.file_path))
+    mdb._m_cached_model = attach_shared_model(descriptor)
+    return mdb
+
+
+def detach_shared_model(descriptor: SharedModelDescriptor):
+    """
+    unmaps the segment of a shared model in this process once no views into it are left
+    """
+    segment = _ATTACHED.pop(descriptor.segment_name, None)
+    if segment is not None:
+        _DETACHED.append(segment)
+    _close_detached()
+
+
+def release_shared_model(descriptor: SharedModelDescriptor):
+    """
+    frees the segment of a shared model, processes still mapping it keep their mapping until they detach
+    """
+    detach_shared_model(descriptor)
+    segment = _PUBLISHED.pop(descriptor.segment_name, None)
+    if segment is not None:
+        _unlink(segment)
+        segment.close()
+        return
+    try:
+        segment = shared_memory.SharedMemory(name=descriptor.segment_name)
+    except FileNotFoundError:
+        return  # already released
+    segment.unlink()  # also unregisters the segment attached above from the resource tracker
+    segment.close()
@@ -0,0 +1,211 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+'''
+batch-wide registry of texture conversions, so a texture referenced by many models is converted by one task only
+
+the registry is an sqlite table keyed by texture name, target format and target directory; a task claims a
+conversion with INSERT OR IGNORE before decoding the texture, sqlite serialises the inserts of all processes so
+exactly one of them gets the row, the others skip the texture. the application creates the registry for a run and
+installs it in every task process (like the model cache), without one every task converts what it is given
+
+the registry also deduplicates by content: many textures are byte-identical under different names, so the first task
+to convert a payload (keyed by the hash of the source bytes and the target format) claims it, the tasks given the
+same payload under another name wait for that conversion and link their output to it. what the links saved is
+recorded for the batch report
+'''
+
+# seconds between two looks at a content conversion another task is doing
+_CONTENT_POLL_INTERVAL = 0.05
+
+
+class TextureClaimRegistry:
+
+    """
+    claims of one batch run in the sqlite file at db_path; picklable, every process (and every thread of a texture
+    batch) opens its own connection
+    """
+
+    def __init__(self, db_path: str, timeout: float = 60.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._connections = {}  # (pid, thread id) -> connection
+
+        self.connection.execute('create table if not exists texture_claims ('
+                                'texture_name text not null, '
+                                'target_format text not null, '
+                                'target_directory text not null, '
+                                'claimed_by integer not null, '
+                                'primary key (texture_name, target_format, target_directory))')
+        self.connection.execute('create table if not exists texture_contents ('
+                                'content_hash text not null, '
+                                'target_format text not null, '
+                                'output_path text not null, '
+                                'claimed_by integer not null, '
+                                'done integer not null default 0, '
+                                'conversion_seconds real not null default 0, '
+                                'output_bytes integer not null default 0, '
+                                'primary key (content_hash, target_format))')
+        self.connection.execute('create table if not exists texture_duplicates ('
+                                'texture_name text not null, '
+                                'content_hash text not null, '
+                                'target_format text not null, '
+                                'output_path text not null, '
+                                'saved_seconds real not null, '
+                                'saved_bytes integer not null)')
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_connections'] = {}
+        return state
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        key = (os.getpid(), threading.get_ident())
+        connection = self._connections.get(key, None)
+        if connection is None:
+            # autocommit, every claim is its own transaction; only used by this thread, closed by any
+            connection = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('pragma journal_mode=wal')
+            self._connections[key] = connection
+        return connection
+
+    def claim(self, texture_name: str, target_format: str, target_directory: str) -> bool:
+        """
+        :return: True if the caller is the first to claim this conversion and should convert the texture
+        """
+        cursor = self.connection.execute('insert or ignore into texture_claims values (?, ?, ?, ?)',
+                                         (texture_name, target_format, os.path.normcase(target_directory),
+                                          os.getpid()))
+        return cursor.rowcount == 1
+
+    def release(self, texture_name: str, target_format: str, target_directory: str):
+        """
+        gives up a claim (e.g. the conversion failed), the next task that is given the texture converts it
+        """
+        self.connection.execute('delete from texture_claims '
+                                'where texture_name = ? and target_format = ? and target_directory = ?',
+                                (texture_name, target_format, os.path.normcase(target_directory)))
+
+    def claim_content(self, content_hash: str, target_format: str, output_path: str) -> bool:
+        """
+        :return: True if the caller is the first to convert this payload to target_format (into output_path)
+        """
+        cursor = self.connection.execute('insert or ignore into texture_contents '
+                                         '(content_hash, target_format, output_path, claimed_by) values (?, ?, ?, ?)',
+                                         (content_hash, target_format, output_path, os.getpid()))
+        return cursor.rowcount == 1
+
+    def complete_content(self, content_hash: str, target_format: str, conversion_seconds: float, output_bytes: int):
+        """
+        marks the conversion of a claimed payload as done, tasks waiting for it can link to its output
+        """
+        self.connection.execute('update texture_contents set done = 1, conversion_seconds = ?, output_bytes = ? '
+                                'where content_hash = ? and target_format = ?',
+                                (conversion_seconds, output_bytes, content_hash, target_format))
+
+    def release_content(self, content_hash: str, target_format: str):
+        """
+        gives up a content claim (the conversion failed), the next task given the payload converts it
+        """
+        self.connection.execute('delete from texture_contents where content_hash = ? and target_format = ?',
+                                (content_hash, target_format))
+
+    def wait_for_content(self, content_hash: str, target_format: str) -> tuple:
+        """
+        waits (at most timeout seconds) for the conversion of a payload claimed by another task
+        :return: (output path, conversion seconds, output bytes) of the finished conversion, None if the claim was
+                 released or the conversion did not finish in time
+        """
+        deadline = time.time() + self.timeout
+        while time.time() < deadline:
+            row = self.connection.execute('select output_path, done, conversion_seconds, output_bytes '
+                                          'from texture_contents where content_hash = ? and target_format = ?',
+                                          (content_hash, target_format)).fetchone()
+            if row is None:
+                return None
+            if row[1]:
+                return row[0], row[2], row[3]
+            time.sleep(_CONTENT_POLL_INTERVAL)
+        return None
+
+    def record_duplicate(self, texture_name: str, content_hash: str, target_format: str, output_path: str,
+                         saved_seconds: float, saved_bytes: int):
+        self.connection.execute('insert into texture_duplicates values (?, ?, ?, ?, ?, ?)',
+                                (texture_name, content_hash, target_format, output_path, saved_seconds, saved_bytes))
+
+    def savings(self) -> tuple:
+        """
+        :return: (duplicate textures linked, bytes not written, seconds not spent converting)
+        """
+        count, saved_bytes, saved_seconds = self.connection.execute(
+            'select count(*), sum(saved_bytes), sum(saved_seconds) from texture_duplicates').fetchone()
+        return count, saved_bytes or 0, saved_seconds or 0.0
+
+    def claim_count(self) -> int:
+        return self.connection.execute('select count(*) from texture_claims').fetchone()[0]
+
+    def close(self):
+        for (pid, _), connection in list(self._connections.items()):
+            if pid == os.getpid():
+                connection.close()
+        self._connections = {}
+
+    def remove(self):
+        """
+        closes the registry and deletes its files, for the end of the batch run that created it
+        """
+        self.close()
+        _remove_database_files(self.db_path)
+
+
+_TEXTURE_CLAIMS: TextureClaimRegistry = None
+
+
+_content_hashes = {}  # (path, size, modification time) -> hash, per process
+
+
+def texture_content_hash(file_path: str) -> str:
+    """
+    hash of the bytes of a texture file, computed once per process for an unchanged file
+    """
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_size, stat.st_mtime_ns)
+    if key not in _content_hashes:
+        digest = hashlib.blake2b(digest_size=20)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        _content_hashes[key] = digest.hexdigest()
+    return _content_hashes[key]
+
+
+def set_texture_claims(registry: TextureClaimRegistry):
+    """
+    installs the registry texture conversion tasks claim their textures in, None to uninstall
+    """
+    global _TEXTURE_CLAIMS
+    _TEXTURE_CLAIMS = registry
+
+
+def texture_claims() -> TextureClaimRegistry:
+    return _TEXTURE_CLAIMS
+
+
+def _remove_database_files(db_path: str):
+    for path in (db_path, db_path + '-wal', db_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def create_texture_claims(directory: str) -> TextureClaimRegistry:
+    """
+    a new, empty registry for a batch run of this process in directory, remove() it when the run is done
+    """
+    db_path = os.path.join(directory, 'texture_claims_{}.db'.format(os.getpid()))
+    _remove_database_files(db_path)
+    return TextureClaimRegistry(db_path)
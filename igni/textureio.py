@@ -0,0 +1,765 @@
+import os
+import struct
+import sys
+import zlib
+import numpy
+
+'''
+texture decoding and encoding with numpy only (no imagemagick)
+
+readers return (height, width, 4) uint8 rgba arrays, top row first:
+    dds: dxt1, dxt3, dxt5 (also as dx10 bc1-bc3) and uncompressed rgb(a)/luminance/alpha with bit masks, top mip level
+    tga: true color, grayscale and color mapped, raw and rle
+    bmp: 1/4/8 bit palette, 16/24/32 bit (bi_rgb and bi_bitfields)
+
+writers take such arrays (or (height, width, 3)):
+    png: 8 bit rgb, or rgba if any pixel is not opaque, with one of the five png filters on every row
+    jpg: baseline jfif, 4:2:0, standard huffman tables, alpha is dropped
+
+all per-pixel and per-block work is done on whole arrays, the only python loops are over tga rle packets
+'''
+
+# --- dds
+
+_DDS_MAGIC = b'DDS '
+_DDS_HEADER_SIZE = 128
+_DX10_HEADER_SIZE = 20
+
+_DDPF_ALPHAPIXELS = 0x1
+_DDPF_ALPHA = 0x2
+_DDPF_FOURCC = 0x4
+_DDPF_RGB = 0x40
+_DDPF_LUMINANCE = 0x20000
+
+_DXGI_BLOCK_FORMATS = {70: b'DXT1', 71: b'DXT1', 72: b'DXT1',
+                       73: b'DXT3', 74: b'DXT3', 75: b'DXT3',
+                       76: b'DXT5', 77: b'DXT5', 78: b'DXT5'}
+_DXGI_RGBA_FORMATS = {28: (0x000000ff, 0x0000ff00, 0x00ff0000, 0xff000000),  # r8g8b8a8
+                      29: (0x000000ff, 0x0000ff00, 0x00ff0000, 0xff000000),
+                      87: (0x00ff0000, 0x0000ff00, 0x000000ff, 0xff000000),  # b8g8r8a8
+                      91: (0x00ff0000, 0x0000ff00, 0x000000ff, 0xff000000)}
+
+
+def _rgb565(colors: numpy.ndarray) -> numpy.ndarray:
+    """
+    :param colors: uint16 array
+    :return: int32 array (..., 4) of rgba, alpha 255
+    """
+    colors = colors.astype(numpy.int32)
+    r = (colors >> 11) & 31
+    g = (colors >> 5) & 63
+    b = colors & 31
+    return numpy.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2),
+                        numpy.full_like(colors, 255)], axis=-1)
+
+
+def _decode_color_blocks(blocks: numpy.ndarray, four_colors_only: bool) -> numpy.ndarray:
+    """
+    :param blocks: (n, 8) uint8 dxt color blocks
+    :param four_colors_only: dxt3/dxt5 color blocks always interpolate two colors, dxt1 only if color 0 > color 1
+    :return: (n, 16, 4) uint8 rgba pixels in block order
+    """
+
+    endpoints = numpy.ascontiguousarray(blocks[:, :4]).view('<u2')
+    c0, c1 = endpoints[:, 0], endpoints[:, 1]
+    p0, p1 = _rgb565(c0), _rgb565(c1)
+
+    palette = numpy.empty((len(blocks), 4, 4), dtype=numpy.int32)
+    palette[:, 0] = p0
+    palette[:, 1] = p1
+    palette[:, 2] = (2 * p0 + p1 + 1) // 3
+    palette[:, 3] = (p0 + 2 * p1 + 1) // 3
+
+    if not four_colors_only:
+        three_colors = c0 <= c1
+        palette[three_colors, 2] = (p0[three_colors] + p1[three_colors] + 1) // 2
+        palette[three_colors, 3] = 0  # transparent black
+
+    bits = numpy.ascontiguousarray(blocks[:, 4:8]).view('<u4')
+    indices = (bits >> (2 * numpy.arange(16, dtype=numpy.uint32))) & 3
+    return palette[numpy.arange(len(blocks))[:, None], indices].astype(numpy.uint8)
+
+
+def _decode_explicit_alpha(blocks: numpy.ndarray) -> numpy.ndarray:
+    """
+    :param blocks: (n, 8) uint8 dxt3 alpha blocks
+    :return: (n, 16) uint8 alpha
+    """
+    bits = numpy.ascontiguousarray(blocks).view('<u8')
+    return (((bits >> (4 * numpy.arange(16, dtype=numpy.uint64))) & 15) * 17).astype(numpy.uint8)
+
+
+def _decode_interpolated_alpha(blocks: numpy.ndarray) -> numpy.ndarray:
+    """
+    :param blocks: (n, 8) uint8 dxt5 alpha blocks
+    :return: (n, 16) uint8 alpha
+    """
+
+    a0 = blocks[:, 0].astype(numpy.int32)[:, None]
+    a1 = blocks[:, 1].astype(numpy.int32)[:, None]
+
+    eight = numpy.arange(1, 7, dtype=numpy.int32)[None, :]  # 6 interpolated values
+    six = numpy.arange(1, 5, dtype=numpy.int32)[None, :]  # 4 interpolated values, then 0 and 255
+
+    table = numpy.empty((len(blocks), 8), dtype=numpy.int32)
+    table[:, 0:1] = a0
+    table[:, 1:2] = a1
+    table[:, 2:8] = ((7 - eight) * a0 + eight * a1 + 3) // 7
+    six_table = numpy.concatenate([((5 - six) * a0 + six * a1 + 2) // 5,
+                                   numpy.zeros_like(a0), numpy.full_like(a0, 255)], axis=1)
+    six_values = (a0 <= a1)[:, 0]
+    table[six_values, 2:8] = six_table[six_values]
+
+    padded = numpy.zeros((len(blocks), 8), dtype=numpy.uint8)
+    padded[:, :6] = blocks[:, 2:8]
+    bits = padded.view('<u8')
+    indices = (bits >> (3 * numpy.arange(16, dtype=numpy.uint64))) & 7
+    return table[numpy.arange(len(blocks))[:, None], indices.astype(numpy.intp)].astype(numpy.uint8)
+
+
+def _blocks_to_image(pixels: numpy.ndarray, width: int, height: int) -> numpy.ndarray:
+    """
+    :param pixels: (blocks_y * blocks_x, 16, 4) pixels of 4x4 blocks, blocks row by row
+    """
+    blocks_x, blocks_y = (width + 3) // 4, (height + 3) // 4
+    image = pixels.reshape(blocks_y, blocks_x, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(blocks_y * 4, blocks_x * 4, 4)
+    return numpy.ascontiguousarray(image[:height, :width])
+
+
+def _decode_dxt(data: memoryview, width: int, height: int, four_cc: bytes) -> numpy.ndarray:
+
+    block_count = ((width + 3) // 4) * ((height + 3) // 4)
+    block_size = 8 if four_cc == b'DXT1' else 16
+    if len(data) < block_count * block_size:
+        raise Exception('dds data is truncated')
+    blocks = numpy.frombuffer(data, dtype=numpy.uint8, count=block_count * block_size).reshape(block_count, block_size)
+
+    if four_cc == b'DXT1':
+        pixels = _decode_color_blocks(blocks, four_colors_only=False)
+    else:
+        pixels = _decode_color_blocks(blocks[:, 8:], four_colors_only=True)
+        if four_cc == b'DXT3':
+            pixels[:, :, 3] = _decode_explicit_alpha(blocks[:, :8])
+        else:
+            pixels[:, :, 3] = _decode_interpolated_alpha(blocks[:, :8])
+
+    return _blocks_to_image(pixels, width, height)
+
+
+def _channel_from_mask(values: numpy.ndarray, mask: int) -> numpy.ndarray:
+    """
+    extracts the bits of mask from packed pixel values and scales them to 0..255
+    """
+    if mask == 0:
+        return None
+    shift = (mask & -mask).bit_length() - 1
+    maximum = mask >> shift
+    channel = (values >> shift) & maximum
+    if maximum == 255:
+        return channel.astype(numpy.uint8)
+    return ((channel.astype(numpy.uint32) * 255 + maximum // 2) // maximum).astype(numpy.uint8)
+
+
+def _unpack_masked(data: memoryview, width: int, height: int, bits_per_pixel: int, pitch: int,
+                   masks: tuple, luminance: bool = False) -> numpy.ndarray:
+    """
+    decodes packed pixels (8 to 32 bit) with r, g, b, a bit masks
+    """
+
+    bytes_per_pixel = bits_per_pixel // 8
+    if len(data) < pitch * (height - 1) + width * bytes_per_pixel:
+        raise Exception('pixel data is truncated')
+
+    rows = numpy.frombuffer(data, dtype=numpy.uint8, count=min(len(data), pitch * height) // pitch * pitch)
+    rows = rows.reshape(-1, pitch)[:height, :width * bytes_per_pixel].reshape(height, width, bytes_per_pixel)
+    values = numpy.zeros((height, width), dtype=numpy.uint32)
+    for byte in range(bytes_per_pixel):
+        values |= rows[:, :, byte].astype(numpy.uint32) << (8 * byte)
+
+    r_mask, g_mask, b_mask, a_mask = masks
+    image = numpy.empty((height, width, 4), dtype=numpy.uint8)
+    r = _channel_from_mask(values, r_mask)
+    if luminance:
+        image[:, :, 0] = image[:, :, 1] = image[:, :, 2] = r
+    else:
+        for i, mask in enumerate((r_mask, g_mask, b_mask)):
+            channel = _channel_from_mask(values, mask)
+            image[:, :, i] = 0 if channel is None else channel
+    alpha = _channel_from_mask(values, a_mask)
+    image[:, :, 3] = 255 if alpha is None else alpha
+    return image
+
+
+def read_dds(data) -> numpy.ndarray:
+
+    data = memoryview(data)
+    if bytes(data[:4]) != _DDS_MAGIC or len(data) < _DDS_HEADER_SIZE:
+        raise Exception('not a dds file')
+
+    flags, height, width, pitch_or_linear_size = struct.unpack_from('<4I', data, 8)
+    format_flags, four_cc, bits_per_pixel, r_mask, g_mask, b_mask, a_mask = struct.unpack_from('<I4s5I', data, 80)
+    offset = _DDS_HEADER_SIZE
+
+    if format_flags & _DDPF_FOURCC:
+        if four_cc == b'DX10':
+            dxgi_format, = struct.unpack_from('<I', data, _DDS_HEADER_SIZE)
+            offset += _DX10_HEADER_SIZE
+            if dxgi_format in _DXGI_BLOCK_FORMATS:
+                return _decode_dxt(data[offset:], width, height, _DXGI_BLOCK_FORMATS[dxgi_format])
+            if dxgi_format in _DXGI_RGBA_FORMATS:
+                return _unpack_masked(data[offset:], width, height, 32, width * 4, _DXGI_RGBA_FORMATS[dxgi_format])
+            raise Exception('unsupported dds dxgi format {}'.format(dxgi_format))
+        if four_cc in {b'DXT1', b'DXT3', b'DXT5'}:
+            return _decode_dxt(data[offset:], width, height, four_cc)
+        if four_cc in {b'DXT2', b'DXT4'}:
+            # premultiplied alpha, same block layout
+            return _decode_dxt(data[offset:], width, height, b'DXT3' if four_cc == b'DXT2' else b'DXT5')
+        raise Exception('unsupported dds compression {}'.format(four_cc))
+
+    if bits_per_pixel not in {8, 16, 24, 32}:
+        raise Exception('unsupported dds bit count {}'.format(bits_per_pixel))
+    pitch = width * bits_per_pixel // 8
+    if format_flags & _DDPF_ALPHA and not format_flags & (_DDPF_RGB | _DDPF_LUMINANCE):
+        # alpha only, white color
+        image = _unpack_masked(data[offset:], width, height, bits_per_pixel, pitch, (0, 0, 0, a_mask))
+        image[:, :, :3] = 255
+        return image
+    if not format_flags & _DDPF_ALPHAPIXELS:
+        a_mask = 0
+    return _unpack_masked(data[offset:], width, height, bits_per_pixel, pitch, (r_mask, g_mask, b_mask, a_mask),
+                          luminance=bool(format_flags & _DDPF_LUMINANCE))
+
+
+# --- tga
+
+def _tga_pixels(raw: numpy.ndarray, bytes_per_pixel: int, grayscale: bool) -> numpy.ndarray:
+    """
+    :param raw: (n, bytes_per_pixel) uint8 pixels as stored (bgr(a), 16 bit arrrrrgggggbbbbb or gray)
+    :return: (n, 4) rgba
+    """
+    pixels = numpy.empty((len(raw), 4), dtype=numpy.uint8)
+    if grayscale:
+        pixels[:, 0] = pixels[:, 1] = pixels[:, 2] = raw[:, 0]
+        pixels[:, 3] = raw[:, 1] if bytes_per_pixel == 2 else 255
+    elif bytes_per_pixel == 2:
+        values = raw[:, 0].astype(numpy.uint32) | (raw[:, 1].astype(numpy.uint32) << 8)
+        for i, mask in enumerate((0x7c00, 0x03e0, 0x001f)):
+            pixels[:, i] = _channel_from_mask(values, mask)
+        pixels[:, 3] = 255
+    else:
+        pixels[:, 0] = raw[:, 2]
+        pixels[:, 1] = raw[:, 1]
+        pixels[:, 2] = raw[:, 0]
+        pixels[:, 3] = raw[:, 3] if bytes_per_pixel == 4 else 255
+    return pixels
+
+
+def _tga_rle(data: memoryview, offset: int, pixel_count: int, bytes_per_pixel: int) -> numpy.ndarray:
+    out = bytearray(pixel_count * bytes_per_pixel)
+    position = 0
+    end = len(out)
+    while position < end:
+        if offset >= len(data):
+            raise Exception('tga rle data is truncated')
+        header = data[offset]
+        count = (header & 0x7f) + 1
+        offset += 1
+        if header & 0x80:
+            pixel = bytes(data[offset:offset + bytes_per_pixel])
+            out[position:position + count * bytes_per_pixel] = pixel * count
+            offset += bytes_per_pixel
+        else:
+            out[position:position + count * bytes_per_pixel] = data[offset:offset + count * bytes_per_pixel]
+            offset += count * bytes_per_pixel
+        position += count * bytes_per_pixel
+    return numpy.frombuffer(bytes(out[:end]), dtype=numpy.uint8)
+
+
+def read_tga(data) -> numpy.ndarray:
+
+    data = memoryview(data)
+    if len(data) < 18:
+        raise Exception('not a tga file')
+    (id_length, color_map_type, image_type, color_map_first, color_map_length, color_map_depth,
+     _, _, width, height, depth, descriptor) = struct.unpack_from('<BBBHHBHHHHBB', data, 0)
+
+    if image_type not in {1, 2, 3, 9, 10, 11}:
+        raise Exception('unsupported tga image type {}'.format(image_type))
+
+    offset = 18 + id_length
+    color_map = None
+    if color_map_type == 1:
+        entry_size = (color_map_depth + 7) // 8
+        entries = numpy.frombuffer(data, dtype=numpy.uint8, count=color_map_length * entry_size, offset=offset)
+        color_map = _tga_pixels(entries.reshape(-1, entry_size), entry_size, grayscale=False)
+        offset += color_map_length * entry_size
+
+    bytes_per_pixel = (depth + 7) // 8
+    pixel_count = width * height
+    if image_type in {9, 10, 11}:
+        raw = _tga_rle(data, offset, pixel_count, bytes_per_pixel)
+    else:
+        if len(data) < offset + pixel_count * bytes_per_pixel:
+            raise Exception('tga data is truncated')
+        raw = numpy.frombuffer(data, dtype=numpy.uint8, count=pixel_count * bytes_per_pixel, offset=offset)
+    raw = raw.reshape(pixel_count, bytes_per_pixel)
+
+    if image_type in {1, 9}:
+        if color_map is None:
+            raise Exception('color mapped tga without color map')
+        indices = raw[:, 0].astype(numpy.int64)
+        if bytes_per_pixel == 2:
+            indices |= raw[:, 1].astype(numpy.int64) << 8
+        pixels = color_map[numpy.clip(indices - color_map_first, 0, len(color_map) - 1)]
+    else:
+        pixels = _tga_pixels(raw, bytes_per_pixel, grayscale=image_type in {3, 11})
+
+    image = pixels.reshape(height, width, 4)
+    if not descriptor & 0x20:  # bottom-up
+        image = image[::-1]
+    if descriptor & 0x10:  # right-to-left
+        image = image[:, ::-1]
+    return numpy.ascontiguousarray(image)
+
+
+# --- bmp
+
+def read_bmp(data) -> numpy.ndarray:
+
+    data = memoryview(data)
+    if bytes(data[:2]) != b'BM' or len(data) < 26:
+        raise Exception('not a bmp file')
+
+    pixel_offset, header_size = struct.unpack_from('<II', data, 10)
+    if header_size == 12:
+        width, height, _, bits_per_pixel = struct.unpack_from('<HHHH', data, 18)
+        compression, colors_used, palette_entry_size = 0, 0, 3
+    else:
+        width, height, _, bits_per_pixel, compression = struct.unpack_from('<iiHHI', data, 18)
+        colors_used, = struct.unpack_from('<I', data, 46)
+        palette_entry_size = 4
+
+    top_down = height < 0
+    height = abs(height)
+    pitch = ((bits_per_pixel * width + 31) // 32) * 4
+
+    if compression not in {0, 3, 6}:
+        raise Exception('unsupported bmp compression {}'.format(compression))
+    if len(data) < pixel_offset + pitch * height:
+        raise Exception('bmp data is truncated')
+    rows = numpy.frombuffer(data, dtype=numpy.uint8, count=pitch * height, offset=pixel_offset).reshape(height, pitch)
+
+    if bits_per_pixel in {1, 4, 8}:
+        palette_size = colors_used if colors_used > 0 else 1 << bits_per_pixel
+        palette_offset = 14 + header_size
+        entries = numpy.frombuffer(data, dtype=numpy.uint8, count=palette_size * palette_entry_size,
+                                   offset=palette_offset).reshape(palette_size, palette_entry_size)
+        palette = numpy.full((palette_size, 4), 255, dtype=numpy.uint8)
+        palette[:, :3] = entries[:, 2::-1]
+
+        if bits_per_pixel == 8:
+            indices = rows[:, :width]
+        elif bits_per_pixel == 4:
+            indices = numpy.stack([rows >> 4, rows & 15], axis=-1).reshape(height, -1)[:, :width]
+        else:
+            indices = numpy.unpackbits(rows, axis=1)[:, :width]
+        image = palette[numpy.minimum(indices, palette_size - 1)]
+
+    elif bits_per_pixel in {16, 24, 32}:
+        if compression in {3, 6}:
+            masks = struct.unpack_from('<4I' if compression == 6 or header_size >= 56 else '<3I', data, 54)
+            masks = tuple(masks) + (0,) * (4 - len(masks))
+        elif bits_per_pixel == 16:
+            masks = (0x7c00, 0x03e0, 0x001f, 0)
+        else:
+            masks = (0x00ff0000, 0x0000ff00, 0x000000ff, 0)  # the fourth byte of bi_rgb pixels is unused
+        image = _unpack_masked(rows.reshape(-1), width, height, bits_per_pixel, pitch, masks)
+
+    else:
+        raise Exception('unsupported bmp bit count {}'.format(bits_per_pixel))
+
+    if not top_down:
+        image = image[::-1]
+    return numpy.ascontiguousarray(image)
+
+
+READERS = {
+    'dds': read_dds,
+    'tga': read_tga,
+    'bmp': read_bmp
+}
+
+
+def read_texture(file_path: str) -> numpy.ndarray:
+    """
+    :return: (height, width, 4) uint8 rgba pixels of a dds, tga or bmp file
+    """
+    extension = os.path.splitext(file_path)[1][1:].lower()
+    if extension not in READERS:
+        raise Exception("can't read textures of type '{}'".format(extension))
+    with open(file_path, 'rb') as f:
+        return READERS[extension](f.read())
+
+
+# --- png
+
+PNG_FILTERS = {'none': 0, 'sub': 1, 'up': 2, 'average': 3, 'paeth': 4}
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def _png_filter(rows: numpy.ndarray, bytes_per_pixel: int, filter_type: int) -> numpy.ndarray:
+    """
+    :param rows: (height, row bytes) uint8
+    :return: (height, row bytes) uint8 filtered rows
+    """
+
+    if filter_type == 0:
+        return rows
+
+    x = rows.astype(numpy.int16)
+    left = numpy.zeros_like(x)
+    left[:, bytes_per_pixel:] = x[:, :-bytes_per_pixel]
+    up = numpy.zeros_like(x)
+    up[1:] = x[:-1]
+
+    if filter_type == 1:
+        filtered = x - left
+    elif filter_type == 2:
+        filtered = x - up
+    elif filter_type == 3:
+        filtered = x - ((left + up) >> 1)
+    else:
+        up_left = numpy.zeros_like(x)
+        up_left[1:, bytes_per_pixel:] = x[:-1, :-bytes_per_pixel]
+        estimate = left + up - up_left
+        distance_left = numpy.abs(estimate - left)
+        distance_up = numpy.abs(estimate - up)
+        distance_up_left = numpy.abs(estimate - up_left)
+        predictor = numpy.where((distance_left <= distance_up) & (distance_left <= distance_up_left), left,
+                                numpy.where(distance_up <= distance_up_left, up, up_left))
+        filtered = x - predictor
+
+    return (filtered & 0xff).astype(numpy.uint8)
+
+
+def encode_png(pixels: numpy.ndarray, compression_level: int = 6, filter_type: str = 'up') -> bytes:
+    """
+    :param pixels: (height, width, 3 or 4) uint8, alpha is only written if some pixel is not opaque
+    :param filter_type: one of PNG_FILTERS, used for every row
+    """
+
+    if filter_type not in PNG_FILTERS:
+        raise Exception("unknown png filter '{}'".format(filter_type))
+
+    height, width, channels = pixels.shape
+    if channels == 4 and bool((pixels[:, :, 3] == 255).all()):
+        pixels = pixels[:, :, :3]
+        channels = 3
+    color_type = 6 if channels == 4 else 2
+
+    rows = numpy.ascontiguousarray(pixels, dtype=numpy.uint8).reshape(height, width * channels)
+    scanlines = numpy.empty((height, width * channels + 1), dtype=numpy.uint8)
+    scanlines[:, 0] = PNG_FILTERS[filter_type]
+    scanlines[:, 1:] = _png_filter(rows, channels, PNG_FILTERS[filter_type])
+
+    return b''.join([_PNG_SIGNATURE,
+                     _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)),
+                     _png_chunk(b'IDAT', zlib.compress(memoryview(scanlines).cast('B'), compression_level)),
+                     _png_chunk(b'IEND', b'')])
+
+
+# --- jpg
+
+_JPEG_LUMINANCE_QUANTIZATION = numpy.array([
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99], dtype=numpy.int32).reshape(8, 8)
+
+_JPEG_CHROMINANCE_QUANTIZATION = numpy.full((8, 8), 99, dtype=numpy.int32)
+_JPEG_CHROMINANCE_QUANTIZATION[:4, :4] = numpy.array([
+    17, 18, 24, 47,
+    18, 21, 26, 66,
+    24, 26, 56, 99,
+    47, 66, 99, 99], dtype=numpy.int32).reshape(4, 4)
+
+# (code length counts for lengths 1..16, symbols), itu t.81 annex k.3
+_JPEG_DC_LUMINANCE = ((0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0), tuple(range(12)))
+_JPEG_DC_CHROMINANCE = ((0, 3, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0), tuple(range(12)))
+_JPEG_AC_LUMINANCE = ((0, 2, 1, 3, 3, 2, 4, 3, 5, 5, 4, 4, 0, 0, 1, 0x7d), (
+    0x01, 0x02, 0x03, 0x00, 0x04, 0x11, 0x05, 0x12, 0x21, 0x31, 0x41, 0x06, 0x13, 0x51, 0x61, 0x07,
+    0x22, 0x71, 0x14, 0x32, 0x81, 0x91, 0xa1, 0x08, 0x23, 0x42, 0xb1, 0xc1, 0x15, 0x52, 0xd1, 0xf0,
+    0x24, 0x33, 0x62, 0x72, 0x82, 0x09, 0x0a, 0x16, 0x17, 0x18, 0x19, 0x1a, 0x25, 0x26, 0x27, 0x28,
+    0x29, 0x2a, 0x34, 0x35, 0x36, 0x37, 0x38, 0x39, 0x3a, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48, 0x49,
+    0x4a, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58, 0x59, 0x5a, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68, 0x69,
+    0x6a, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78, 0x79, 0x7a, 0x83, 0x84, 0x85, 0x86, 0x87, 0x88, 0x89,
+    0x8a, 0x92, 0x93, 0x94, 0x95, 0x96, 0x97, 0x98, 0x99, 0x9a, 0xa2, 0xa3, 0xa4, 0xa5, 0xa6, 0xa7,
+    0xa8, 0xa9, 0xaa, 0xb2, 0xb3, 0xb4, 0xb5, 0xb6, 0xb7, 0xb8, 0xb9, 0xba, 0xc2, 0xc3, 0xc4, 0xc5,
+    0xc6, 0xc7, 0xc8, 0xc9, 0xca, 0xd2, 0xd3, 0xd4, 0xd5, 0xd6, 0xd7, 0xd8, 0xd9, 0xda, 0xe1, 0xe2,
+    0xe3, 0xe4, 0xe5, 0xe6, 0xe7, 0xe8, 0xe9, 0xea, 0xf1, 0xf2, 0xf3, 0xf4, 0xf5, 0xf6, 0xf7, 0xf8,
+    0xf9, 0xfa))
+_JPEG_AC_CHROMINANCE = ((0, 2, 1, 2, 4, 4, 3, 4, 7, 5, 4, 4, 0, 1, 2, 0x77), (
+    0x00, 0x01, 0x02, 0x03, 0x11, 0x04, 0x05, 0x21, 0x31, 0x06, 0x12, 0x41, 0x51, 0x07, 0x61, 0x71,
+    0x13, 0x22, 0x32, 0x81, 0x08, 0x14, 0x42, 0x91, 0xa1, 0xb1, 0xc1, 0x09, 0x23, 0x33, 0x52, 0xf0,
+    0x15, 0x62, 0x72, 0xd1, 0x0a, 0x16, 0x24, 0x34, 0xe1, 0x25, 0xf1, 0x17, 0x18, 0x19, 0x1a, 0x26,
+    0x27, 0x28, 0x29, 0x2a, 0x35, 0x36, 0x37, 0x38, 0x39, 0x3a, 0x43, 0x44, 0x45, 0x46, 0x47, 0x48,
+    0x49, 0x4a, 0x53, 0x54, 0x55, 0x56, 0x57, 0x58, 0x59, 0x5a, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68,
+    0x69, 0x6a, 0x73, 0x74, 0x75, 0x76, 0x77, 0x78, 0x79, 0x7a, 0x82, 0x83, 0x84, 0x85, 0x86, 0x87,
+    0x88, 0x89, 0x8a, 0x92, 0x93, 0x94, 0x95, 0x96, 0x97, 0x98, 0x99, 0x9a, 0xa2, 0xa3, 0xa4, 0xa5,
+    0xa6, 0xa7, 0xa8, 0xa9, 0xaa, 0xb2, 0xb3, 0xb4, 0xb5, 0xb6, 0xb7, 0xb8, 0xb9, 0xba, 0xc2, 0xc3,
+    0xc4, 0xc5, 0xc6, 0xc7, 0xc8, 0xc9, 0xca, 0xd2, 0xd3, 0xd4, 0xd5, 0xd6, 0xd7, 0xd8, 0xd9, 0xda,
+    0xe2, 0xe3, 0xe4, 0xe5, 0xe6, 0xe7, 0xe8, 0xe9, 0xea, 0xf2, 0xf3, 0xf4, 0xf5, 0xf6, 0xf7, 0xf8,
+    0xf9, 0xfa))
+
+# natural (row major) index of every zigzag position
+_ZIGZAG = numpy.array(sorted(range(64), key=lambda i: (i // 8 + i % 8,
+                                                       i // 8 if (i // 8 + i % 8) % 2 else -(i // 8))))
+
+_DCT = numpy.array([[(numpy.sqrt(1 / 8) if k == 0 else 0.5) * numpy.cos((2 * n + 1) * k * numpy.pi / 16)
+                     for n in range(8)] for k in range(8)])
+
+# events of the entropy coder are packed in chunks to bound the size of the intermediate bit matrix
+_JPEG_PACK_CHUNK = 1 << 18
+
+
+def _huffman_lookup(table) -> tuple:
+    """
+    :return: (codes, code lengths), both indexed by symbol
+    """
+    counts, symbols = table
+    codes = numpy.zeros(256, dtype=numpy.uint32)
+    lengths = numpy.zeros(256, dtype=numpy.uint32)
+    code = 0
+    symbol_iter = iter(symbols)
+    for length, count in enumerate(counts, start=1):
+        for _ in range(count):
+            symbol = next(symbol_iter)
+            codes[symbol] = code
+            lengths[symbol] = length
+            code += 1
+        code <<= 1
+    return codes, lengths
+
+
+_JPEG_HUFFMAN_LOOKUPS = {name: _huffman_lookup(table) for name, table in (
+    ('dc0', _JPEG_DC_LUMINANCE), ('dc1', _JPEG_DC_CHROMINANCE),
+    ('ac0', _JPEG_AC_LUMINANCE), ('ac1', _JPEG_AC_CHROMINANCE))}
+
+
+def _quantization_table(base: numpy.ndarray, quality: int) -> numpy.ndarray:
+    quality = min(max(quality, 1), 100)
+    scale = 5000 // quality if quality < 50 else 200 - 2 * quality
+    return numpy.clip((base * scale + 50) // 100, 1, 255)
+
+
+def _magnitude(values: numpy.ndarray) -> tuple:
+    """
+    :return: (bit size category, amplitude bits) of jpeg coefficients
+    """
+    absolute = numpy.abs(values)
+    sizes = numpy.zeros(values.shape, dtype=numpy.uint32)
+    nonzero = absolute > 0
+    sizes[nonzero] = numpy.floor(numpy.log2(absolute[nonzero])).astype(numpy.uint32) + 1
+    amplitudes = numpy.where(values >= 0, values, values + (1 << sizes.astype(numpy.int64)) - 1)
+    return sizes, amplitudes.astype(numpy.uint32)
+
+
+def _pack_bits(values: numpy.ndarray, lengths: numpy.ndarray) -> bytes:
+    """
+    concatenates the low lengths[i] bits of values[i] (msb first), pads with 1 bits and stuffs 0xff bytes
+    """
+
+    bit_positions = numpy.arange(31, -1, -1, dtype=numpy.uint32)
+    chunks = []
+    for start in range(0, len(values), _JPEG_PACK_CHUNK):
+        chunk_values = values[start:start + _JPEG_PACK_CHUNK]
+        chunk_lengths = lengths[start:start + _JPEG_PACK_CHUNK]
+        bit_matrix = ((chunk_values[:, None] >> bit_positions[None, :]) & 1).astype(numpy.uint8)
+        selected = numpy.arange(32)[None, :] >= (32 - chunk_lengths.astype(numpy.int64))[:, None]
+        chunks.append(bit_matrix[selected])
+
+    bits = numpy.concatenate(chunks) if len(chunks) > 0 else numpy.zeros(0, dtype=numpy.uint8)
+    padding = (-len(bits)) % 8
+    if padding > 0:
+        bits = numpy.concatenate([bits, numpy.ones(padding, dtype=numpy.uint8)])
+    packed = numpy.packbits(bits)
+
+    stuffed_after = numpy.flatnonzero(packed == 0xff)
+    if len(stuffed_after) > 0:
+        packed = numpy.insert(packed, stuffed_after + 1, 0)
+    return packed.tobytes()
+
+
+def _jpeg_blocks(pixels: numpy.ndarray) -> tuple:
+    """
+    :return: (level-shifted 8x8 blocks in scan order, component of every block, padded height, padded width);
+             4:2:0, every 16x16 mcu is 4 luminance blocks followed by one cb and one cr block
+    """
+
+    height, width = pixels.shape[:2]
+    padded_height, padded_width = -(-height // 16) * 16, -(-width // 16) * 16
+    rgb = numpy.pad(pixels[:, :, :3].astype(numpy.float32),
+                    ((0, padded_height - height), (0, padded_width - width), (0, 0)), mode='edge')
+
+    r, g, b = rgb[:, :, 0], rgb[:, :, 1], rgb[:, :, 2]
+    y = 0.299 * r + 0.587 * g + 0.114 * b - 128.0
+    cb = -0.168736 * r - 0.331264 * g + 0.5 * b
+    cr = 0.5 * r - 0.418688 * g - 0.081312 * b
+
+    def subsample(channel):
+        return channel.reshape(padded_height // 2, 2, padded_width // 2, 2).mean(axis=(1, 3))
+
+    mcu_rows, mcu_columns = padded_height // 16, padded_width // 16
+    # (mcu row, mcu column, block row in mcu, block column in mcu, 8, 8)
+    y_blocks = y.reshape(mcu_rows, 2, 8, mcu_columns, 2, 8).transpose(0, 3, 1, 4, 2, 5)
+    y_blocks = y_blocks.reshape(mcu_rows, mcu_columns, 4, 8, 8)
+    cb_blocks = subsample(cb).reshape(mcu_rows, 8, mcu_columns, 8).transpose(0, 2, 1, 3)[:, :, None]
+    cr_blocks = subsample(cr).reshape(mcu_rows, 8, mcu_columns, 8).transpose(0, 2, 1, 3)[:, :, None]
+
+    blocks = numpy.concatenate([y_blocks, cb_blocks, cr_blocks], axis=2).reshape(-1, 8, 8)
+    components = numpy.tile(numpy.array([0, 0, 0, 0, 1, 2]), mcu_rows * mcu_columns)
+    return blocks, components
+
+
+def _entropy_code(coefficients: numpy.ndarray, components: numpy.ndarray) -> bytes:
+    """
+    :param coefficients: (n, 64) quantized coefficients in zigzag order, blocks in scan order
+    :param components: component (0 luminance, 1 cb, 2 cr) of every block
+    """
+
+    block_count = len(coefficients)
+    chrominance = (components > 0).astype(numpy.intp)
+
+    # dc: difference to the previous block of the same component
+    dc = coefficients[:, 0].astype(numpy.int64)
+    dc_difference = numpy.empty_like(dc)
+    for component in range(3):
+        selected = components == component
+        dc_difference[selected] = numpy.diff(dc[selected], prepend=0)
+    dc_sizes, dc_amplitudes = _magnitude(dc_difference)
+
+    # ac: (run of zeros, size) symbols for every nonzero coefficient, 16 zero runs (zrl) before long runs
+    ac = coefficients[:, 1:]
+    ac_blocks, ac_positions = numpy.nonzero(ac)
+    ac_values = ac[ac_blocks, ac_positions].astype(numpy.int64)
+    ac_positions = ac_positions + 1
+    previous = numpy.zeros_like(ac_positions)
+    if len(ac_positions) > 0:
+        previous[1:] = numpy.where(ac_blocks[1:] == ac_blocks[:-1], ac_positions[:-1], 0)
+    runs = ac_positions - previous - 1
+    ac_sizes, ac_amplitudes = _magnitude(ac_values)
+    ac_symbols = ((runs % 16) << 4) | ac_sizes
+
+    zrl_counts = runs // 16
+    zrl_blocks = numpy.repeat(ac_blocks, zrl_counts)
+    zrl_positions = numpy.repeat(ac_positions, zrl_counts)
+
+    last_position = numpy.zeros(block_count, dtype=numpy.int64)
+    if len(ac_positions) > 0:
+        last_position[ac_blocks] = ac_positions  # positions ascend within a block, the last write wins
+    eob_blocks = numpy.flatnonzero(last_position < 63)
+
+    ac_codes = [_JPEG_HUFFMAN_LOOKUPS['ac0'], _JPEG_HUFFMAN_LOOKUPS['ac1']]
+    dc_codes = [_JPEG_HUFFMAN_LOOKUPS['dc0'], _JPEG_HUFFMAN_LOOKUPS['dc1']]
+
+    def codes_of(symbols, blocks, lookups):
+        table = chrominance[blocks]
+        codes = numpy.where(table == 0, lookups[0][0][symbols], lookups[1][0][symbols])
+        lengths = numpy.where(table == 0, lookups[0][1][symbols], lookups[1][1][symbols])
+        return codes.astype(numpy.uint64), lengths.astype(numpy.uint64)
+
+    block_indices = numpy.arange(block_count)
+    event_blocks, event_keys, event_values, event_lengths = [], [], [], []
+
+    def add_events(blocks, keys, symbols, lookups, amplitudes=None, sizes=None):
+        codes, lengths = codes_of(symbols, blocks, lookups)
+        if amplitudes is not None:
+            sizes = sizes.astype(numpy.uint64)
+            codes = (codes << sizes) | amplitudes.astype(numpy.uint64)
+            lengths = lengths + sizes
+        event_blocks.append(blocks)
+        event_keys.append(keys)
+        event_values.append(codes)
+        event_lengths.append(lengths)
+
+    add_events(block_indices, numpy.zeros(block_count, dtype=numpy.int64), dc_sizes, dc_codes,
+               dc_amplitudes, dc_sizes)
+    add_events(zrl_blocks, 2 * zrl_positions - 1, numpy.full(len(zrl_blocks), 0xf0), ac_codes)
+    add_events(ac_blocks, 2 * ac_positions, ac_symbols, ac_codes, ac_amplitudes, ac_sizes)
+    add_events(eob_blocks, numpy.full(len(eob_blocks), 200, dtype=numpy.int64), numpy.zeros(len(eob_blocks),
+                                                                                            dtype=numpy.intp), ac_codes)
+
+    blocks = numpy.concatenate(event_blocks)
+    order = numpy.lexsort((numpy.concatenate(event_keys), blocks))
+    return _pack_bits(numpy.concatenate(event_values)[order].astype(numpy.uint32),
+                      numpy.concatenate(event_lengths)[order].astype(numpy.uint32))
+
+
+def _jpeg_segment(marker: int, data: bytes) -> bytes:
+    return struct.pack('>HH', marker, len(data) + 2) + data
+
+
+def encode_jpg(pixels: numpy.ndarray, quality: int = 90) -> bytes:
+    """
+    :param pixels: (height, width, 3 or 4) uint8, alpha is dropped
+    """
+
+    height, width = pixels.shape[:2]
+    quantization = [_quantization_table(_JPEG_LUMINANCE_QUANTIZATION, quality),
+                    _quantization_table(_JPEG_CHROMINANCE_QUANTIZATION, quality)]
+
+    blocks, components = _jpeg_blocks(pixels)
+    coefficients = numpy.matmul(numpy.matmul(_DCT, blocks), _DCT.T).reshape(-1, 64)
+    divisors = numpy.stack([quantization[0].reshape(64), quantization[1].reshape(64)])[
+        (components > 0).astype(numpy.intp)]
+    quantized = numpy.rint(coefficients / divisors).astype(numpy.int32)[:, _ZIGZAG]
+
+    segments = [b'\xff\xd8',
+                _jpeg_segment(0xffe0, b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00')]
+    for table_id, table in enumerate(quantization):
+        segments.append(_jpeg_segment(0xffdb, bytes([table_id]) + table.reshape(64)[_ZIGZAG].astype(numpy.uint8)
+                                      .tobytes()))
+    segments.append(_jpeg_segment(0xffc0, struct.pack('>BHHB', 8, height, width, 3) +
+                                  bytes([1, 0x22, 0, 2, 0x11, 1, 3, 0x11, 1])))
+    for table_class_id, (counts, symbols) in ((0x00, _JPEG_DC_LUMINANCE), (0x10, _JPEG_AC_LUMINANCE),
+                                              (0x01, _JPEG_DC_CHROMINANCE), (0x11, _JPEG_AC_CHROMINANCE)):
+        segments.append(_jpeg_segment(0xffc4, bytes([table_class_id]) + bytes(counts) + bytes(symbols)))
+    segments.append(_jpeg_segment(0xffda, bytes([3, 1, 0x00, 2, 0x11, 3, 0x11, 0, 63, 0])))
+    segments.append(_entropy_code(quantized, components))
+    segments.append(b'\xff\xd9')
+    return b''.join(segments)
+
+
+ENCODERS = {
+    'png': encode_png,
+    'jpg': encode_jpg
+}
+
+
+def write_texture(file_path: str, pixels: numpy.ndarray, texture_format: str, **options):
+    """
+    :param options: passed to the encoder (compression_level, filter_type for png, quality for jpg)
+    """
+    if texture_format not in ENCODERS:
+        raise Exception("can't write textures of type '{}'".format(texture_format))
+    with open(file_path, 'wb') as f:
+        f.write(ENCODERS[texture_format](pixels, **options))
+
+
+if __name__ == '__main__':
+    args = sys.argv
+
+    if len(args) < 3:
+        print('usage: textureio <dds, tga or bmp file> <png or jpg file>')
+        sys.exit(1)
+
+    write_texture(args[2], read_texture(args[1]), os.path.splitext(args[2])[1][1:].lower())
@@ -0,0 +1,516 @@
+from .resources import Directory, DirectoryListing, File, Resource, ResourceTypes, FILE_SYSTEM
+from .mdbutil import Material
+from .app import IgniApplicationEntity, Application, picklable
+from .textureclaims import TextureClaimRegistry, texture_claims, texture_content_hash
+from . import textureio
+from .fileplacement import place_file, HARDLINK, SYMLINK, REFLINK
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+'''
+texture location and conversion for exported models
+
+dds, tga and bmp textures are converted to png and jpg in-process by textureio; everything else goes through wand
+(imagemagick), which is only imported by the first conversion that needs it, so processes that never do such a
+conversion don't load it. textures kept in their format (leave-as-is) are never decoded, the source file is linked
+or copied to the destination (see fileplacement.py)
+
+the textures of a model are submitted as batches (TextureBatchJob), a batch converts its textures on a thread pool
+of the worker it runs in; zlib, numpy and file writes release the gil
+
+with a claim registry installed, a payload that was converted under one name already is not converted again under
+another, the output is linked to the first one (see textureclaims.py)
+'''
+
+_wand_image = None
+_wand_import_attempted = False
+
+
+def wand_image():
+    """
+    :return: the wand.image module, None if wand is not installed
+    """
+    global _wand_image, _wand_import_attempted
+    if not _wand_import_attempted:
+        _wand_import_attempted = True
+        try:
+            from wand import image
+            _wand_image = image
+        except Exception:
+            _wand_image = None
+    return _wand_image
+
+
+class TextureLocatorService(IgniApplicationEntity):
+
+    def locate(self, texture_name: str):
+        raise Exception('not implemented')
+
+
+class ResourceManagerTextureLocatorService(TextureLocatorService):
+
+    # in order of preference, a name with more than one candidate is located as the one with the first extension
+    POSSIBLE_TEXTURE_EXTENSIONS = [
+        'dds',
+        'tga',
+        'bmp',
+        'jpg',
+        'ico',
+        'txi'
+    ]
+
+    def __init__(self):
+
+        super().__init__()
+
+    def locate(self, texture_name: str):
+
+        index = Application().resource_manager.texture_name_index(self.POSSIBLE_TEXTURE_EXTENSIONS)
+        result = index.locate(texture_name)
+
+        if result is not None:
+            self.logger.debug('located texture with name {}: {}'.format(texture_name, result.full_path))
+        else:
+            self.logger.error('could not locate texture with name {}, attempted names: {}'.format(
+                texture_name, index.normalised_names(texture_name)))
+
+        return result
+
+
+class FileSystemTextureLocatorService(TextureLocatorService):
+
+    """
+    this class locates a texture by its name by means of searching specific folders in game contents
+
+    the folders are searched in cached listings (see DirectoryListing), so after the first search a texture that is
+    found costs no file system calls; when a texture is not found the listings of changed folders are read again and
+    it is searched once more
+    """
+
+    TEXTURE_EXTENSIONS = [
+        'dds',
+        'txi'
+    ]
+
+    def __init__(self, mdb_location: Directory):
+        self.resource_location_directory = mdb_location
+        self._m_check_folders = None
+
+    @classmethod
+    def _find_(cls, listing: DirectoryListing, texture_name: str):
+        for extension in cls.TEXTURE_EXTENSIONS:
+            texture = listing.find(texture_name + '.' + extension)  # also finds other cases
+            if texture is not None:
+                return texture
+        return None
+
+    @classmethod
+    def locate_texture(cls, directory: Directory, texture_name: str):
+        return cls._find_(FILE_SYSTEM.listing(directory.full_path), texture_name)
+
+    @property
+    def check_folders(self) -> list:
+        """
+        listings of the folders searched, in order: the folder of the model, then its sibling folders, those named
+        like textures first
+        """
+        if self._m_check_folders is None:
+            parent = FILE_SYSTEM.listing(os.path.join(self.resource_location_directory.full_path, os.pardir))
+            siblings = [os.path.join(parent.full_path, name) for name in parent.subdirectory_names]
+            self._m_check_folders = [FILE_SYSTEM.listing(self.resource_location_directory.full_path)] + \
+                                    [FILE_SYSTEM.listing(path) for path in siblings
+                                     if 'textures' in os.path.basename(path)] + \
+                                    [FILE_SYSTEM.listing(path) for path in siblings
+                                     if 'textures' not in os.path.basename(path)]
+        return self._m_check_folders
+
+    def _search_(self, texture_name: str):
+        for listing in self.check_folders:
+            texture = self._find_(listing, texture_name)
+            if texture is not None:
+                return texture
+        return None
+
+    def _refresh_(self) -> bool:
+        """
+        reads the listings of the folders that changed again
+        :return: True if any did
+        """
+        parent = FILE_SYSTEM.listing(os.path.join(self.resource_location_directory.full_path, os.pardir))
+        if parent.refresh():
+            self._m_check_folders = None  # folders were added or removed
+        changed = False
+        for listing in self.check_folders:
+            try:
+                changed = listing.refresh() or changed
+            except FileNotFoundError:
+                self._m_check_folders = None
+                changed = True
+        return changed
+
+    def locate(self, texture_name: str):
+
+        texture = self._search_(texture_name)
+        if texture is None and self._refresh_():
+            texture = self._search_(texture_name)
+        return texture
+
+
+@picklable
+class TextureConversionResult:
+
+    def __init__(self, converted_texture_path: str):
+
+        self.converted_texture_file = None
+
+        try:
+            self.converted_texture_file = File(converted_texture_path)
+        except Exception:
+            pass
+
+    def successful(self):
+        return self.converted_texture_file is not None
+
+
+class MaterialExportHandler(IgniApplicationEntity):
+
+    def __init__(self,
+                 texture_locator_service: TextureLocatorService):
+        super().__init__()
+
+        self.texture_locator_service = texture_locator_service
+        self.handled_texture_names = set()
+
+    def handle(self,
+               material: Material,
+               source_file: str,
+               target_destination: Directory,
+               target_format: str) -> list:
+        """
+        reads the material file of the material if needed
+        :return: the texture conversion jobs of the material, see texture_export_jobs
+        """
+
+        self.logger.extra['source_mdb'] = source_file
+        self.logger.extra['node'] = material.host_node.node_name.string
+
+        # materials of a conversion context come with their material file read
+        if len(material.material_file_pointer) > 0 and not material.material_file_read:
+            material_resource = Application().resource_manager.get(material.material_file_pointer,
+                                                                   ResourceTypes.MAT)
+            if material_resource is None:
+                self.logger.error('material is pointing to a material file {} but could locate none'.format(
+                            material.material_file_pointer))
+            else:
+                self.logger.debug('reading from material file {}'.format(material.material_file_pointer))
+                material.read_material_file(material_resource)
+
+        return self.texture_export_jobs(material,
+                                        target_destination,
+                                        target_format)
+
+    def texture_export_jobs(self,
+                            material: Material,
+                            target_destination: Directory,
+                            target_format: str) -> list:
+        """
+        :return: a conversion job for every texture of the material this handler has not seen before
+        """
+
+        jobs = []
+        for texture_name in material.get_all_texture_names():
+
+            if texture_name in self.handled_texture_names:
+                continue
+            else:
+                self.handled_texture_names.add(texture_name)
+
+            texture_file = self.texture_locator_service.locate(texture_name)
+            if texture_file is None:
+                continue
+
+            jobs.append(
+                TextureConverterJob().
+                    input(texture_file).
+                    target_fname(texture_name).
+                    target_format(target_format).
+                    target_dir(target_destination).
+                    execution_id('texture_export_' + texture_name)
+            )
+        return jobs
+
+
+@picklable
+class TextureConverterJob(IgniApplicationEntity):
+
+    """
+    this class handles the logic of conversion of textures from arbitrary formats into arbitrary formats
+    """
+
+    LEAVE_AS_IS = 'leave-as-is'
+
+    def __init__(self):
+
+        super().__init__()
+
+        self.input_ = None
+        self.target_location_: Directory = None
+        self.target_fname_ = ''
+        self.target_format_ = ''
+        self.encoder_options_ = {}
+        self.deduplicate_ = True
+        self.invalid = False
+
+    def input(self, input_path):
+        if isinstance(input_path, Resource):
+            inp = input_path.file.full_path
+        elif isinstance(input_path, File):
+            inp = input_path.full_path
+        self.input_ = inp
+        return self
+
+    def target_dir(self, location: Directory):
+        self.target_location_ = location
+        return self
+
+    def target_fname(self, fname):
+        self.target_fname_ = fname
+        return self
+
+    def target_format(self, format_: str):
+        self.target_format_ = format_
+        return self
+
+    def encoder_options(self, options: dict):
+        """
+        :param options: keyword arguments of the textureio encoder of the target format, see texture_encoder_options
+        """
+        self.encoder_options_ = options
+        return self
+
+    def deduplicate(self, deduplicate: bool):
+        """
+        :param deduplicate: False to convert even if a texture with the same content was converted in this batch
+        """
+        self.deduplicate_ = deduplicate
+        return self
+
+    def __call__(self):
+        self.run()
+
+    def output_extension(self) -> str:
+        """
+        the extension of the converted texture, the one of the input if the format is left as is
+        """
+        if self.target_format_ == self.LEAVE_AS_IS:
+            return os.path.splitext(self.input_)[1][1:]
+        return self.target_format_
+
+    def passes_through(self) -> bool:
+        """
+        whether the input is placed at the destination as it is, without decoding it
+        """
+        return self.target_format_ == self.LEAVE_AS_IS or \
+            os.path.splitext(self.input_)[1][1:].lower() == self.target_format_.lower()
+
+    def converts_natively(self) -> bool:
+        """
+        whether textureio reads the input and writes the target format, without wand
+        """
+        extension = os.path.splitext(self.input_)[1][1:].lower()
+        return extension in textureio.READERS and self.target_format_ in textureio.ENCODERS
+
+    def _convert_natively_(self, output_path: str):
+        try:
+            pixels = textureio.read_texture(self.input_)
+        except Exception as e:
+            self.logger.error('could not load input image "{}", error message: {}'.format(self.input_, e))
+            self.invalid = True
+            return
+
+        try:
+            textureio.write_texture(output_path, pixels, self.target_format_, **self.encoder_options_)
+        except Exception as e:
+            self.logger.error('could not write image: {}'.format(e))
+            self.invalid = True
+
+    def _place_(self, output_path: str):
+        try:
+            method = place_file(self.input_, output_path)
+            self.logger.debug('placed {} at {} ({})'.format(self.input_, output_path, method))
+        except Exception as e:
+            self.logger.error('could not place "{}" at "{}": {}'.format(self.input_, output_path, e))
+            self.invalid = True
+
+    def _convert_with_wand_(self, output_path: str):
+        image = wand_image()
+        if image is None:
+            self.logger.error("can't convert {} because wand is not properly installed".format(self.input_))
+            self.invalid = True
+            return
+
+        try:
+            loaded = image.Image(filename=self.input_)
+        except Exception as e:
+            self.logger.error('could not load input image "{}", error message: {}'.format(self.input_, e))
+            self.invalid = True
+            return
+
+        try:
+            loaded.save(filename=output_path)
+        except Exception as e:
+            self.logger.error('could not write image: {}'.format(e))
+            self.invalid = True
+
+    def _convert_(self, output_path: str):
+        if self.converts_natively():
+            self._convert_natively_(output_path)
+        else:
+            self._convert_with_wand_(output_path)
+
+    def _convert_deduplicated_(self, output_path: str, claims: TextureClaimRegistry):
+        """
+        converts the input if its content was not converted to the target format in this batch yet, links the
+        output to the earlier conversion otherwise
+        """
+
+        try:
+            content_hash = texture_content_hash(self.input_)
+        except Exception as e:
+            self.logger.error('could not read "{}": {}'.format(self.input_, e))
+            self.invalid = True
+            return
+
+        converted = None
+        claimed = claims.claim_content(content_hash, self.target_format_, output_path)
+        if not claimed:
+            converted = claims.wait_for_content(content_hash, self.target_format_)
+            if converted is None:
+                # the other task gave up its claim, or it is still converting after the timeout
+                claimed = claims.claim_content(content_hash, self.target_format_, output_path)
+                if not claimed:
+                    self.logger.warning('conversion of the content of "{}" did not finish in time'.format(
+                        self.input_))
+                    self._convert_(output_path)
+                    return
+
+        if claimed:
+            start = time.perf_counter()
+            self._convert_(output_path)
+            if self.invalid:
+                claims.release_content(content_hash, self.target_format_)
+            else:
+                claims.complete_content(content_hash, self.target_format_, time.perf_counter() - start,
+                                        os.path.getsize(output_path))
+            return
+
+        shared_output_path, conversion_seconds, output_bytes = converted
+        try:
+            method = place_file(shared_output_path, output_path, symlink=True)
+        except Exception as e:
+            self.logger.error('could not link "{}" to "{}": {}'.format(output_path, shared_output_path, e))
+            self.invalid = True
+            return
+        self.logger.debug('{} has the content of {}, {}'.format(output_path, shared_output_path, method))
+        claims.record_duplicate(self.target_fname_, content_hash, self.target_format_, output_path,
+                                conversion_seconds, output_bytes if method in {HARDLINK, SYMLINK, REFLINK} else 0)
+
+    def run(self):
+
+        if self.input_ is None or self.target_location_ is None \
+                or self.target_fname_ is None or len(self.target_fname_) == 0\
+                or self.target_format_ is None or len(self.target_format_) == 0:
+            self.logger.error("can't execute texture conversion job with incomplete description")
+            self.invalid = True
+
+        if self.invalid:
+            return
+
+        output_path = os.path.join(self.target_location_.full_path, self.target_fname_ + '.' + self.output_extension())
+
+        # the first task of the batch to claim the conversion does it, the others skip it
+        claims = texture_claims()
+        if claims is not None and not claims.claim(self.target_fname_, self.target_format_,
+                                                   self.target_location_.full_path):
+            self.logger.debug('texture {} is converted by another task'.format(output_path))
+            return TextureConversionResult(output_path)
+
+        # only if not already exists...
+        if not File.exists(output_path):
+            if self.passes_through():
+                self._place_(output_path)  # nothing to gain from hashing, placing is as cheap as linking
+            elif claims is not None and self.deduplicate_:
+                self._convert_deduplicated_(output_path, claims)
+            else:
+                self._convert_(output_path)
+
+        if self.invalid and claims is not None:
+            claims.release(self.target_fname_, self.target_format_, self.target_location_.full_path)
+
+        return TextureConversionResult(output_path)
+
+
+@picklable
+class TextureBatchJob(IgniApplicationEntity):
+
+    """
+    runs texture conversion jobs on a thread pool of the process it is executed in
+    """
+
+    def __init__(self, jobs: list, threads: int = 4):
+
+        super().__init__()
+
+        self.jobs = jobs
+        self.threads = threads
+
+    def _run_job_(self, job: TextureConverterJob) -> TextureConversionResult:
+        try:
+            return job.run()
+        except Exception as e:
+            self.logger.error('texture conversion of {} failed: {}'.format(job.input_, e))
+            return None
+
+    def run(self) -> list:
+        """
+        :return: the result of every job, None for the jobs that raised
+        """
+        if self.threads <= 1 or len(self.jobs) <= 1:
+            return [self._run_job_(job) for job in self.jobs]
+        with ThreadPoolExecutor(max_workers=min(self.threads, len(self.jobs))) as executor:
+            return list(executor.map(self._run_job_, self.jobs))
+
+
+def texture_batches(jobs: list, batch_size: int, threads: int) -> list:
+    """
+    :return: the jobs in batches of at most batch_size jobs, each converting on threads threads
+    """
+    batch_size = max(batch_size, 1)
+    return [TextureBatchJob(jobs[start:start + batch_size], threads) for start in range(0, len(jobs), batch_size)]
+
+
+def texture_encoder_options(texture_conversion_settings, target_format: str) -> dict:
+    """
+    :param texture_conversion_settings: the texture-conversion settings of an export job
+    :return: keyword arguments of the textureio encoder of target_format
+    """
+    if target_format == 'png':
+        return {'compression_level': texture_conversion_settings['png']['compression-level'],
+                'filter_type': texture_conversion_settings['png']['filter']}
+    if target_format == 'jpg':
+        return {'quality': texture_conversion_settings['jpg']['quality']}
+    return {}
+
+
+_material_export_handler = None
+
+
+def material_export_handler() -> MaterialExportHandler:
+    """
+    the material export handler of this process, created on first use
+    """
+    global _material_export_handler
+    if _material_export_handler is None:
+        _material_export_handler = MaterialExportHandler(ResourceManagerTextureLocatorService())
+    return _material_export_handler